@@ -1,224 +1,260 @@
 import sqlite3
-import bcrypt
 import customtkinter as ctk
-from tkinter import messagebox, filedialog
+from tkinter import messagebox, filedialog, TclError
 import datetime
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-from collections import Counter
 import os
-import json
 
-# For image support
-from PIL import Image, ImageTk
+import auth
+from database import (
+    SIMULATED_DATE, PAGE_SIZE, create_database, get_users_page, count_users, get_db_connection,
+    username_exists, update_username,
+)
+from quiz_catalogue import QUIZ_DIR, ensure_quiz_dir, index_quiz_file, check_quiz_file
+from tasks import run_in_background, submit, shutdown as shutdown_workers
+from quiz_timer import QuizTimer, format_remaining
+import instrumentation
 
-# Global Simulated Date Setting
-SIMULATED_DATE = datetime.datetime(2025, 3, 18, 22, 31, 15)
+# PIL, matplotlib and bcrypt are imported where they are first needed
+# (question images, dashboard charts, auth.py) to keep start-up fast, and
+# service_client (with asyncio) only in client mode.
+import image_cache
+from dashboard_charts import CHART_BG, DashboardCharts
+
+# Question images are scaled down to at most this width.
+QUESTION_IMAGE_WIDTH = 400
+
+# The user search runs once typing has paused for this long.
+SEARCH_DEBOUNCE_MS = 250
+
+# The time left on a quiz is saved every this many timer ticks (seconds).
+TIMER_CHECKPOINT_TICKS = 5
 
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("blue")
 
-# Define the folder for storing quiz JSON files.
-QUIZ_DIR = "quizzes"
-if not os.path.exists(QUIZ_DIR):
-    os.makedirs(QUIZ_DIR)
-
-def get_db_connection():
-    try:
-        conn = sqlite3.connect("users.db")
-        return conn
-    except sqlite3.Error as e:
-        print("Database connection error:", e)
-        return None
+# -------------------- Reusable widgets --------------------
 
-def create_database():
-    conn = get_db_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    # Creating users table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        account_type TEXT NOT NULL CHECK(account_type IN ('Student', 'Teacher'))
-    );
-    """)
-    # Creating results table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS results (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        attempt_date DATETIME NOT NULL,
-        correct_list TEXT NOT NULL,
-        total_questions INTEGER NOT NULL,
-        FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
-    );
-    """)
-    conn.commit()
-    conn.close()
-
-def record_quiz_result(user_id, correct_list, total_questions):
-    conn = get_db_connection()
-    if conn is None:
-        messagebox.showerror("Error", "Unable to connect to database.")
-        return False
-    cursor = conn.cursor()
-    now = SIMULATED_DATE if SIMULATED_DATE else datetime.datetime.now()
-    attempt_date = now.strftime("%Y-%m-%d %H:%M:%S")
-    cursor.execute("""
-    INSERT INTO results (user_id, attempt_date, correct_list, total_questions)
-    VALUES (?, ?, ?, ?)
-    """, (user_id, attempt_date, correct_list, total_questions))
-    conn.commit()
-    conn.close()
-    return True
-
-def last_five_days_attempts(user_id, current_datetime=None):
-    now = current_datetime if current_datetime else (SIMULATED_DATE if SIMULATED_DATE else datetime.datetime.now())
-    conn = get_db_connection()
-    if conn is None:
-        return []
-    cursor = conn.cursor()
-    # Using '-4 days' so that today + previous 4 days yield 5 days total.
-    query = """
-    SELECT id, user_id, attempt_date, correct_list, total_questions
-    FROM results
-    WHERE user_id = ?
-      AND date(attempt_date) >= date(?, '-4 days')
-    ORDER BY attempt_date DESC;
+class VirtualList(ctk.CTkFrame):
     """
-    cursor.execute(query, (user_id, now.strftime("%Y-%m-%d %H:%M:%S")))
-    rows = cursor.fetchall()
-    conn.close()
-    
-    processed = []
-    for row in rows:
-        try:
-            attempt_dt = datetime.datetime.strptime(row[2], "%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            continue
-        processed.append((row[0], row[1], attempt_dt, row[3], row[4]))
-    return processed
-
-def get_dashboard_data(user_id, current_datetime=None):
-    results = last_five_days_attempts(user_id, current_datetime)
-    if not results:
-        today = (current_datetime.date() if current_datetime else datetime.datetime.today().date())
-        return {today - datetime.timedelta(days=i): {"attempts": 0, "avg_percentage": 0} for i in range(5)}
-    attempts_counter = Counter(r[2].date() for r in results)
-    totals_per_day = {}
-    for (rid, uid, attempt_dt, correct_list, total_q) in results:
-        day = attempt_dt.date()
-        try:
-            correct = len(eval(correct_list))
-        except Exception:
-            correct = 0
-        if day not in totals_per_day:
-            totals_per_day[day] = {"correct": 0, "total": 0}
-        totals_per_day[day]["correct"] += correct
-        totals_per_day[day]["total"] += total_q
-    dashboard_data = {}
-    for day, vals in totals_per_day.items():
-        avg = (vals["correct"] / vals["total"] * 100) if vals["total"] > 0 else 0
-        dashboard_data[day] = {"attempts": attempts_counter[day], "avg_percentage": avg}
-    return dashboard_data
-
-def get_all_results(user_id):
-    conn = get_db_connection()
-    if conn is None:
-        return []
-    cursor = conn.cursor()
-    query = """
-    SELECT id, user_id, attempt_date, correct_list, total_questions
-    FROM results
-    WHERE user_id = ?
-    ORDER BY attempt_date DESC;
+    A scrolling list that only creates widgets for the rows on screen.
+    Rows are fetched a page at a time with fetch_page(last_row, limit) as the user
+    scrolls (last_row is None for the first page), and the same row widgets are
+    re-used for whichever rows are visible. count() gives the total for the
+    scrollbar; without it the list grows as pages arrive. Both run on a worker
+    thread, and the rows on screen are drawn again as each page arrives.
     """
-    cursor.execute(query, (user_id,))
-    rows = cursor.fetchall()
-    conn.close()
-    processed = []
-    for row in rows:
-        try:
-            attempt_dt = datetime.datetime.strptime(row[2], "%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            continue
-        processed.append((row[0], row[1], attempt_dt, row[3], row[4]))
-    return processed
+    def __init__(self, master, fetch_page, format_row, count=None, action_text=None, on_action=None,
+                 visible_rows=10, page_size=PAGE_SIZE, empty_text="No results.", **kwargs):
+        super().__init__(master, **kwargs)
+        self.format_row = format_row
+        self.on_action = on_action
+        self.visible_rows = visible_rows
+        self.page_size = page_size
+        self.generation = 0
 
-def show_dashboard(main_app, name=None):
-    dash_win = ctk.CTkToplevel(main_app)
-    dash_win.title("Dashboard")
-    dash_win.geometry("800x600")
+        body = ctk.CTkFrame(self, fg_color="transparent")
+        body.pack(side="left", fill="both", expand=True)
+        body.grid_columnconfigure(0, weight=1)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        # Fixed pool of row widgets, filled in by render().
+        self.row_widgets = []
+        for i in range(visible_rows):
+            row_frame = ctk.CTkFrame(body)
+            label = ctk.CTkLabel(row_frame, text="", font=("Segoe UI", 12), anchor="w")
+            label.pack(side="left", padx=5, fill="x", expand=True)
+            button = None
+            if action_text:
+                button = ctk.CTkButton(row_frame, text=action_text, width=110)
+                button.pack(side="right", padx=5)
+            row_frame.grid(row=i, column=0, sticky="ew", pady=3, padx=5)
+            self.row_widgets.append((row_frame, label, button))
+        self.empty_label = ctk.CTkLabel(body, text=empty_text, font=("Segoe UI", 14))
+
+        for widget in [self, body] + [w for row in self.row_widgets for w in row if w is not None]:
+            widget.bind("<MouseWheel>", self.on_mousewheel)
+            widget.bind("<Button-4>", self.on_mousewheel)
+            widget.bind("<Button-5>", self.on_mousewheel)
+
+        self.reload(fetch_page, count)
+
+    def reload(self, fetch_page=None, count=None):
+        """
+        Starts again from the first row, optionally with a new data source.
+        """
+        if fetch_page is not None:
+            self.fetch_page = fetch_page
+            self.count = count
+        self.rows = []
+        self.exhausted = False
+        self.top = 0
+        self.wanted_top = 0
+        self.total = None
+        self.loading = False
+        # Pages and counts requested before this reload are dropped when they arrive.
+        self.generation += 1
+        if self.count:
+            generation = self.generation
+            run_in_background(self, self.count, on_done=lambda total: self.counted(generation, total))
+        self.scroll_to(0)
+
+    def counted(self, generation, total):
+        if generation == self.generation:
+            self.total = total
+            self.scroll_to(self.wanted_top)
+
+    def load_rows(self, upto):
+        # One page at a time; when a page arrives the list scrolls to where
+        # it was asked to go, which asks for the next page if that is needed.
+        if self.loading or self.exhausted or len(self.rows) >= upto:
+            return
+        self.loading = True
+        generation = self.generation
+
+        def arrived(page):
+            if generation != self.generation:
+                return
+            self.loading = False
+            self.rows.extend(page)
+            if len(page) < self.page_size:
+                self.exhausted = True
+            self.scroll_to(self.wanted_top)
+
+        def failed(error):
+            if generation != self.generation:
+                return
+            self.loading = False
+            self.exhausted = True
+            print("Could not load rows:", error)
+            self.render()
+
+        run_in_background(self, self.fetch_page, self.rows[-1] if self.rows else None, self.page_size,
+                          on_done=arrived, on_error=failed)
+
+    def total_rows(self):
+        if self.total is not None:
+            return self.total
+        return len(self.rows) if self.exhausted else len(self.rows) + self.page_size
+
+    def scroll_to(self, top):
+        top = max(0, min(int(top), self.total_rows() - self.visible_rows))
+        self.wanted_top = top
+        self.top = max(0, min(top, len(self.rows) - self.visible_rows))
+        self.render()
+        self.load_rows(top + self.visible_rows)
+
+    def render(self):
+        visible = self.rows[self.top:self.top + self.visible_rows]
+        for i, (row_frame, label, button) in enumerate(self.row_widgets):
+            if i >= len(visible):
+                row_frame.grid_remove()
+                continue
+            row = visible[i]
+            label.configure(text=self.format_row(row))
+            if button is not None:
+                button.configure(command=lambda r=row: self.on_action(r))
+            row_frame.grid()
+        if visible or not self.exhausted:
+            self.empty_label.grid_remove()
+        else:
+            self.empty_label.grid(row=0, column=0, pady=5)
+        total = max(self.total_rows(), 1)
+        self.scrollbar.set(self.top / total, min(1.0, (self.top + self.visible_rows) / total))
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(amount) * self.total_rows())
+        else:
+            self.scroll_to(self.top + int(amount) * (self.visible_rows if unit == "pages" else 1))
+
+    def on_mousewheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.top - 1)
+        else:
+            self.scroll_to(self.top + 1)
+
+def format_result_row(row):
+    attempt_dt, correct, total = row[2], row[3], row[4]
+    percentage = (correct / total * 100) if total > 0 else 0
+    date_str = attempt_dt.strftime("%Y-%m-%d %H:%M:%S")
+    return f"Date: {date_str} | Score: {percentage:.0f}% ({correct}/{total})"
+
+def format_user_row(user):
+    return f"Username: {user['username']} | Account Type: {user['account_type']}"
+
+class DashboardWindow(ctk.CTkToplevel):
+    """
+    Created once per MainApp and hidden instead of destroyed when closed, so
+    its charts are reused (and only updated) the next time it is opened.
+    """
+    def __init__(self, main_app):
+        super().__init__(main_app)
+        self.main_app = main_app
+        self.title("Dashboard")
+        self.geometry("800x600")
+        self.protocol("WM_DELETE_WINDOW", self.withdraw)
+        
+        header = ctk.CTkFrame(self)
+        header.pack(fill="x", pady=5)
+        self.header_label = ctk.CTkLabel(header, text="", font=("Segoe UI", 20))
+        self.header_label.pack(side="left", padx=10)
+        self.back_btn = ctk.CTkButton(header, text="Back", command=self.back_to_user_browser)
+        
+        graph_frame = ctk.CTkFrame(self, fg_color=CHART_BG)
+        graph_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        self.message_label = ctk.CTkLabel(graph_frame, text="Loading...", font=("Segoe UI", 16))
+        self.message_label.pack(pady=20)
+        self.charts = DashboardCharts(graph_frame)
+        self.user_id = None
+        
+        footer = ctk.CTkFrame(self)
+        footer.pack(fill="x", pady=5)
+        ctk.CTkLabel(footer, text="Dashboard Module", font=("Segoe UI", 12)).pack()
     
-    header = ctk.CTkFrame(dash_win)
-    header.pack(fill="x", pady=5)
-    if name is not None:
-        header_label = ctk.CTkLabel(header, text=f"Activity report for user {name}!", font=("Segoe UI", 20))
-        header_label.pack(side="left", padx=10)
-        if main_app.current_user and main_app.current_user["account_type"] == "Teacher":
-            back_btn = ctk.CTkButton(header, text="Back", command=lambda: (dash_win.destroy(), main_app.open_user_browser()))
-            back_btn.pack(side="right", padx=10)
-    else:
-        if main_app.current_user:
-            header_label = ctk.CTkLabel(header, text=f"Welcome, {main_app.current_user['username']}!", font=("Segoe UI", 20))
-            header_label.pack(side="left", padx=10)
+    def show(self, name=None):
+        if name is not None:
+            self.header_label.configure(text=f"Activity report for user {name}!")
+        elif self.main_app.current_user:
+            self.header_label.configure(text=f"Welcome, {self.main_app.current_user['username']}!")
+        else:
+            self.header_label.configure(text="Welcome!")
+        if name is not None and self.main_app.current_user and self.main_app.current_user["account_type"] == "Teacher":
+            self.back_btn.pack(side="right", padx=10)
         else:
-            header_label = ctk.CTkLabel(header, text="Welcome!", font=("Segoe UI", 20))
-            header_label.pack(side="left", padx=10)
+            self.back_btn.pack_forget()
+        self.deiconify()
+        self.lift()
+        
+        # The previous charts stay up until the new numbers arrive, unless
+        # they belonged to someone else.
+        user_id = self.main_app.current_user["id"]
+        if user_id != self.user_id:
+            self.user_id = user_id
+            self.charts.hide()
+            self.message_label.configure(text="Loading...")
+            self.message_label.pack(pady=20)
+        current_dt = SIMULATED_DATE if SIMULATED_DATE else datetime.datetime.now()
+        run_in_background(self, self.main_app.backend.get_dashboard_data, user_id, current_dt,
+                          on_done=lambda data: self.show_data(user_id, data))
     
-    graph_frame = ctk.CTkFrame(dash_win, fg_color="#222222")
-    graph_frame.pack(fill="both", expand=True, padx=10, pady=10)
+    def show_data(self, user_id, data):
+        if len(data) < 2:
+            self.charts.hide()
+            self.message_label.configure(text="Not enough data to display charts (min 2 days required).")
+            self.message_label.pack(pady=20)
+        else:
+            self.message_label.pack_forget()
+            self.charts.show(user_id, data)
     
-    current_dt = SIMULATED_DATE if SIMULATED_DATE else datetime.datetime.now()
-    data = get_dashboard_data(main_app.current_user["id"], current_dt)
-    sorted_dates = sorted(data.keys())
-    if len(sorted_dates) < 2:
-        ctk.CTkLabel(graph_frame, text="Not enough data to display charts (min 2 days required).", font=("Segoe UI", 16)).pack(pady=20)
-    else:
-        date_labels = [d.strftime("%m-%d") for d in sorted_dates]
-        attempts = [data[d]["attempts"] for d in sorted_dates]
-        percentages = [data[d]["avg_percentage"] for d in sorted_dates]
-        
-        fig1 = Figure(figsize=(5, 4), dpi=100)
-        ax1 = fig1.add_subplot(111)
-        fig1.patch.set_facecolor("#222222")
-        ax1.set_facecolor("#222222")
-        for spine in ax1.spines.values():
-            spine.set_color("white")
-        ax1.bar(date_labels, attempts, color='royalblue')
-        ax1.set_title("Attempts per Day", fontname="Segoe UI", fontsize=14, color="white")
-        ax1.set_xlabel("Date", fontname="Segoe UI", fontsize=12, color="white")
-        ax1.set_ylabel("Attempts", fontname="Segoe UI", fontsize=12, color="white")
-        ax1.tick_params(axis='x', colors='white')
-        ax1.tick_params(axis='y', colors='white')
-        fig1.tight_layout()
-        canvas1 = FigureCanvasTkAgg(fig1, master=graph_frame)
-        canvas1.draw()
-        canvas1.get_tk_widget().pack(side="left", fill="both", expand=True, padx=5, pady=5)
-        
-        fig2 = Figure(figsize=(5, 4), dpi=100)
-        ax2 = fig2.add_subplot(111)
-        fig2.patch.set_facecolor("#222222")
-        ax2.set_facecolor("#222222")
-        for spine in ax2.spines.values():
-            spine.set_color("white")
-        ax2.plot(date_labels, percentages, marker='o', color='darkgreen')
-        ax2.set_title("Average Score (%) per Day", fontname="Segoe UI", fontsize=14, color="white")
-        ax2.set_xlabel("Date", fontname="Segoe UI", fontsize=12, color="white")
-        ax2.set_ylabel("Avg %", fontname="Segoe UI", fontsize=12, color="white")
-        ax2.tick_params(axis='x', colors='white')
-        ax2.tick_params(axis='y', colors='white')
-        fig2.tight_layout()
-        canvas2 = FigureCanvasTkAgg(fig2, master=graph_frame)
-        canvas2.draw()
-        canvas2.get_tk_widget().pack(side="right", fill="both", expand=True, padx=5, pady=5)
-    
-    footer = ctk.CTkFrame(dash_win)
-    footer.pack(fill="x", pady=5)
-    ctk.CTkLabel(footer, text="Dashboard Module", font=("Segoe UI", 12)).pack()
+    def back_to_user_browser(self):
+        self.withdraw()
+        self.main_app.open_user_browser()
+
+def show_dashboard(main_app, name=None):
+    if main_app.dashboard_window is None or not main_app.dashboard_window.winfo_exists():
+        main_app.dashboard_window = DashboardWindow(main_app)
+    main_app.dashboard_window.show(name)
 
 def show_past_results(main_app):
     past_win = ctk.CTkToplevel(main_app)
@@ -229,40 +265,17 @@ def show_past_results(main_app):
     header.pack(fill="x", pady=5)
     ctk.CTkLabel(header, text=f"Past Results for {main_app.current_user['username']}", font=("Segoe UI", 18)).pack(side="left", padx=10)
     
-    scroll_frame = ctk.CTkScrollableFrame(past_win, width=500, height=250)
-    scroll_frame.pack(padx=10, pady=10, fill="both", expand=True)
-    
-    results = get_all_results(main_app.current_user["id"])
-    for row in results:
-        attempt_dt = row[2]
-        try:
-            result_data = json.loads(row[3])
-            correct = result_data.get("correct_count", 0)
-        except Exception:
-            correct = 0
-        total = row[4]
-        percentage = (correct / total * 100) if total > 0 else 0
-        date_str = attempt_dt.strftime("%Y-%m-%d %H:%M:%S")
-        text = f"Date: {date_str} | Score: {percentage:.0f}% ({correct}/{total})"
-        ctk.CTkLabel(scroll_frame, text=text, font=("Segoe UI", 14)).pack(pady=5)
+    user_id = main_app.current_user["id"]
+    backend = main_app.backend
+    results_list = VirtualList(past_win, lambda after, limit: backend.get_results_page(user_id, after, limit),
+                               format_result_row, count=lambda: backend.count_results(user_id),
+                               empty_text="No results yet.")
+    results_list.pack(padx=10, pady=10, fill="both", expand=True)
     
     footer = ctk.CTkFrame(past_win)
     footer.pack(fill="x", pady=10)
     ctk.CTkButton(footer, text="Close", command=past_win.destroy).pack(fill="x")
 
-def get_all_users(search_query=None):
-    conn = get_db_connection()
-    if conn is None:
-        return []
-    cursor = conn.cursor()
-    if search_query:
-        cursor.execute("SELECT id, username, account_type FROM users WHERE username LIKE ?", (f"%{search_query}%",))
-    else:
-        cursor.execute("SELECT id, username, account_type FROM users")
-    users = cursor.fetchall()
-    conn.close()
-    return [{"id": user[0], "username": user[1], "account_type": user[2]} for user in users]
-
 def show_user_results(main_app, user):
     results_win = ctk.CTkToplevel(main_app)
     results_win.title(f"Past Results for {user['username']}")
@@ -272,22 +285,11 @@ def show_user_results(main_app, user):
     header.pack(fill="x", pady=5)
     ctk.CTkLabel(header, text=f"Past Results for {user['username']}", font=("Segoe UI", 18)).pack(side="left", padx=10)
     
-    scroll_frame = ctk.CTkScrollableFrame(results_win, width=500, height=250)
-    scroll_frame.pack(padx=10, pady=10, fill="both", expand=True)
-    
-    results = get_all_results(user["id"])
-    for row in results:
-        attempt_dt = row[2]
-        try:
-            result_data = json.loads(row[3])
-            correct = result_data.get("correct_count", 0)
-        except Exception:
-            correct = 0
-        total = row[4]
-        percentage = (correct / total * 100) if total > 0 else 0
-        date_str = attempt_dt.strftime("%Y-%m-%d %H:%M:%S")
-        text = f"Date: {date_str} | Score: {percentage:.0f}% ({correct}/{total})"
-        ctk.CTkLabel(scroll_frame, text=text, font=("Segoe UI", 14)).pack(pady=5)
+    backend = main_app.backend
+    results_list = VirtualList(results_win, lambda after, limit: backend.get_results_page(user["id"], after, limit),
+                               format_result_row, count=lambda: backend.count_results(user["id"]),
+                               empty_text="No results yet.")
+    results_list.pack(padx=10, pady=10, fill="both", expand=True)
     
     footer = ctk.CTkFrame(results_win)
     footer.pack(fill="x", pady=10)
@@ -301,72 +303,236 @@ def show_user_browser(main_app):
     search_frame = ctk.CTkFrame(browser_win)
     search_frame.pack(fill="x", pady=5, padx=10)
     ctk.CTkLabel(search_frame, text="Search Users:", font=("Segoe UI", 14)).pack(side="left", padx=5)
-    search_entry = ctk.CTkEntry(search_frame, placeholder_text="Enter username")
+    search_entry = ctk.CTkEntry(search_frame, placeholder_text="Start of a username")
     search_entry.pack(side="left", padx=5, fill="x", expand=True)
     
-    results_frame = ctk.CTkScrollableFrame(browser_win, width=580, height=350)
-    results_frame.pack(padx=10, pady=10, fill="both", expand=True)
+    def users_source(query):
+        return (lambda after, limit: get_users_page(query, after, limit)), (lambda: count_users(query))
+    
+    pending_search = [None]  # after() id of the scheduled type-ahead search
+    shown_query = [""]
     
     def perform_search():
-        for widget in results_frame.winfo_children():
-            widget.destroy()
+        if pending_search[0] is not None:
+            browser_win.after_cancel(pending_search[0])
+            pending_search[0] = None
         query = search_entry.get().strip()
-        users = get_all_users(query)
-        if not users:
-            ctk.CTkLabel(results_frame, text="No users found.", font=("Segoe UI", 14)).pack(pady=5)
-        for user in users:
-            user_frame = ctk.CTkFrame(results_frame)
-            user_frame.pack(fill="x", pady=3, padx=5)
-            info_text = f"Username: {user['username']} | Account Type: {user['account_type']}"
-            ctk.CTkLabel(user_frame, text=info_text, font=("Segoe UI", 12)).pack(side="left", padx=5)
-            ctk.CTkButton(user_frame, text="View Results", command=lambda u=user: show_user_results(main_app, u)).pack(side="right", padx=5)
+        if query == shown_query[0]:
+            return
+        shown_query[0] = query
+        users_list.reload(*users_source(query))
     
+    def schedule_search(event=None):
+        if pending_search[0] is not None:
+            browser_win.after_cancel(pending_search[0])
+        pending_search[0] = browser_win.after(SEARCH_DEBOUNCE_MS, perform_search)
+    
+    search_entry.bind("<KeyRelease>", schedule_search)
+    search_entry.bind("<Return>", lambda event: perform_search())
     ctk.CTkButton(search_frame, text="Search", command=perform_search).pack(side="left", padx=5)
     
-    def list_all_users():
-        for widget in results_frame.winfo_children():
-            widget.destroy()
-        users = get_all_users()
-        if not users:
-            ctk.CTkLabel(results_frame, text="No users found.", font=("Segoe UI", 14)).pack(pady=5)
-        for user in users:
-            user_frame = ctk.CTkFrame(results_frame)
-            user_frame.pack(fill="x", pady=3, padx=5)
-            info_text = f"Username: {user['username']} | Account Type: {user['account_type']}"
-            ctk.CTkLabel(user_frame, text=info_text, font=("Segoe UI", 12)).pack(side="left", padx=5)
-            ctk.CTkButton(user_frame, text="View Results", command=lambda u=user: show_user_results(main_app, u)).pack(side="right", padx=5)
-    
-    list_all_users()
+    fetch_users, count_all_users = users_source(None)
+    users_list = VirtualList(browser_win, fetch_users, format_user_row, count=count_all_users,
+                             action_text="View Results", on_action=lambda u: show_user_results(main_app, u),
+                             empty_text="No users found.")
+    users_list.pack(padx=10, pady=10, fill="both", expand=True)
+    
+    add_export_controls(browser_win)
     
     footer = ctk.CTkFrame(browser_win)
     footer.pack(fill="x", pady=5)
-    ctk.CTkButton(footer, text="Close", command=browser_win.destroy).pack(pady=5)
+    ctk.CTkButton(footer, text="Class Overview", command=lambda: show_class_overview(main_app)).pack(side="left", padx=10, pady=5)
+    ctk.CTkButton(footer, text="Close", command=browser_win.destroy).pack(side="right", padx=10, pady=5)
 
-# -------------------- Quiz Module --------------------
+def format_student_row(student):
+    rate = f"{student['success_rate']:.0f}%" if student["success_rate"] is not None else "-"
+    trend = f"{student['trend']:+.1f}%/day" if student["trend"] is not None else "-"
+    return f"{student['username']} | Attempts: {student['attempts']} | Success: {rate} | Trend: {trend}"
 
-def get_all_quizzes():
+def format_quiz_difficulty_row(quiz):
+    return (f"{quiz['difficulty_rank']}. {quiz['name']} | Avg Score: {quiz['avg_score']:.0f}% | "
+            f"Attempts: {quiz['attempts']} | Students: {quiz['students']}")
+
+def list_source(rows):
+    # VirtualList data source over rows that carry their 1-based "position".
+    fetch_page = lambda after, limit: rows[(after["position"] if after else 0):][:limit]
+    return fetch_page, lambda: len(rows)
+
+def show_class_overview(main_app):
     """
-    Reads all quiz JSON files from the QUIZ_DIR and returns a list of quiz dictionaries.
+    Success rate, attempts and trend for every student, and quizzes from
+    hardest to easiest, computed in one go by analytics.get_cohort_overview().
     """
-    quizzes = []
-    for filename in os.listdir(QUIZ_DIR):
-        if filename.endswith(".json"):
-            filepath = os.path.join(QUIZ_DIR, filename)
+    from analytics import TREND_DAYS, get_cohort_overview
+    overview_win = ctk.CTkToplevel(main_app)
+    overview_win.title("Class Overview")
+    overview_win.geometry("700x650")
+    
+    header = ctk.CTkFrame(overview_win)
+    header.pack(fill="x", pady=5)
+    ctk.CTkLabel(header, text="Class Overview", font=("Segoe UI", 20)).pack(side="left", padx=10)
+    summary_label = ctk.CTkLabel(overview_win, text="Loading...", font=("Segoe UI", 14), justify="left")
+    summary_label.pack(fill="x", padx=10, pady=5)
+    
+    ctk.CTkLabel(overview_win, text="Students", font=("Segoe UI", 16)).pack(anchor="w", padx=10)
+    students_list = VirtualList(overview_win, lambda after, limit: [], format_student_row, visible_rows=8,
+                                action_text="View Results", on_action=lambda s: show_user_results(main_app, s),
+                                empty_text="No students yet.")
+    students_list.pack(padx=10, pady=5, fill="both", expand=True)
+    
+    ctk.CTkLabel(overview_win, text="Quizzes (hardest first)", font=("Segoe UI", 16)).pack(anchor="w", padx=10)
+    quizzes_list = VirtualList(overview_win, lambda after, limit: [], format_quiz_difficulty_row, visible_rows=5,
+                               action_text="Questions",
+                               on_action=lambda q: show_item_analysis(main_app, q["quiz_file"], q["name"]),
+                               empty_text="No quiz attempts yet.")
+    quizzes_list.pack(padx=10, pady=5, fill="both", expand=True)
+    
+    def show_overview(overview):
+        summary = overview["summary"]
+        if not summary:
+            summary_label.configure(text="Unable to connect to database.")
+            return
+        average = f"{summary['avg_success_rate']:.0f}%" if summary["avg_success_rate"] is not None else "-"
+        summary_label.configure(text=(
+            f"Students: {summary['students']} ({summary['active_students']} active in the last "
+            f"{TREND_DAYS} days) | Attempts: {summary['attempts']} | Average success: {average}\n"
+            f"Improving: {summary['improving']} | Declining: {summary['declining']}"))
+        students_list.reload(*list_source(overview["students"]))
+        quizzes_list.reload(*list_source(overview["quizzes"]))
+    
+    run_in_background(overview_win, get_cohort_overview, on_done=show_overview)
+    
+    footer = ctk.CTkFrame(overview_win)
+    footer.pack(fill="x", pady=5)
+    ctk.CTkButton(footer, text="Item Analysis", command=lambda: show_item_analysis(main_app)).pack(side="left", padx=10, pady=5)
+    ctk.CTkButton(footer, text="Close", command=overview_win.destroy).pack(side="right", padx=10, pady=5)
+
+def format_item_row(item):
+    facility = f"{item['facility'] * 100:.0f}%" if item["facility"] is not None else "-"
+    discrimination = f"{item['discrimination']:.2f}" if item["discrimination"] is not None else "-"
+    question = item["question"] if len(item["question"]) <= 60 else item["question"][:57] + "..."
+    text = (f"{item['quiz_name']} Q{item['question_index'] + 1}: {question}\n"
+            f"Facility: {facility} | Discrimination: {discrimination} | Attempts: {item['attempts']}")
+    if item["flag"]:
+        text += f" | {item['flag']}"
+    if item["answers"]:
+        text += "\n" + " | ".join(f"{option}: {chosen}" for option, chosen in item["answers"])
+    return text
+
+def show_item_analysis(main_app, quiz_file=None, quiz_name=None):
+    """
+    Facility and discrimination of every answered question, for one quiz or the
+    whole catalogue, from analytics.get_item_analysis().
+    """
+    from analytics import get_item_analysis
+    title = f"Item Analysis - {quiz_name}" if quiz_name else "Item Analysis"
+    items_win = ctk.CTkToplevel(main_app)
+    items_win.title(title)
+    items_win.geometry("750x600")
+    
+    ctk.CTkLabel(items_win, text=title, font=("Segoe UI", 20)).pack(pady=10)
+    ctk.CTkLabel(items_win, text=("Facility is the share of attempts answering correctly; discrimination is how "
+                                  "well the question separates stronger and weaker attempts (-1 to 1)."),
+                 font=("Segoe UI", 12), wraplength=700).pack(padx=10)
+    items_list = VirtualList(items_win, lambda after, limit: [], format_item_row, visible_rows=6,
+                             empty_text="Loading...")
+    items_list.pack(padx=10, pady=10, fill="both", expand=True)
+    
+    def show_items(items):
+        items_list.empty_label.configure(text="No answers recorded yet.")
+        items_list.reload(*list_source(items))
+    
+    run_in_background(items_win, get_item_analysis, quiz_file, on_done=show_items)
+    
+    ctk.CTkButton(items_win, text="Close", command=items_win.destroy).pack(pady=10)
+
+def add_export_controls(window):
+    """
+    Adds an "Export Results" row to `window`: an optional date range, and a
+    progress bar shown while every user's results are written to CSV or Parquet.
+    """
+    export_frame = ctk.CTkFrame(window)
+    export_frame.pack(fill="x", padx=10, pady=5)
+    from_entry = ctk.CTkEntry(export_frame, placeholder_text="From (YYYY-MM-DD)", width=140)
+    from_entry.pack(side="left", padx=5)
+    to_entry = ctk.CTkEntry(export_frame, placeholder_text="To (YYYY-MM-DD)", width=140)
+    to_entry.pack(side="left", padx=5)
+    progress_bar = ctk.CTkProgressBar(export_frame)
+    progress_label = ctk.CTkLabel(export_frame, text="", font=("Segoe UI", 12))
+    
+    def parse_date(entry):
+        text = entry.get().strip()
+        return datetime.date.fromisoformat(text) if text else None
+    
+    def start_export():
+        try:
+            start, end = parse_date(from_entry), parse_date(to_entry)
+        except ValueError:
+            messagebox.showerror("Error", "Dates must be in the format YYYY-MM-DD.")
+            return
+        path = filedialog.asksaveasfilename(parent=window, title="Export Results", defaultextension=".csv",
+                                            filetypes=[("CSV Files", "*.csv"), ("Parquet Files", "*.parquet")])
+        if not path:
+            return
+        from export import export_results
+        progress = [0, 0]  # done, total; written by the worker, read by show_progress
+        
+        def report(done, total):
+            progress[0], progress[1] = done, total
+        
+        def show_progress():
             try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    quiz_data = json.load(f)
-                quiz_data["file_path"] = filepath  # Save file path if needed
-                quizzes.append(quiz_data)
-            except json.JSONDecodeError:
-                print(f"Error reading quiz file {filename}")
-    return quizzes
+                if not window.winfo_exists():
+                    return
+            except TclError:
+                return
+            done, total = progress
+            progress_bar.set(done / total if total else 0)
+            progress_label.configure(text=f"{done}/{total} results")
+            if not future.done():
+                window.after(100, show_progress)
+        
+        def finish():
+            export_button.configure(state="normal", text="Export Results")
+            progress_bar.pack_forget()
+            progress_label.pack_forget()
+        
+        def exported(rows):
+            finish()
+            messagebox.showinfo("Export", f"Exported {rows} results to {path}.")
+        
+        def export_failed(error):
+            finish()
+            messagebox.showerror("Error", f"Export failed: {error}")
+        
+        export_button.configure(state="disabled", text="Exporting...")
+        progress_bar.set(0)
+        progress_bar.pack(side="left", padx=5, fill="x", expand=True)
+        progress_label.pack(side="left", padx=5)
+        future = run_in_background(window, export_results, path, None, start, end, None, report,
+                                   on_done=exported, on_error=export_failed)
+        window.after(100, show_progress)
+    
+    export_button = ctk.CTkButton(export_frame, text="Export Results", command=start_export)
+    export_button.pack(side="right", padx=5)
+
+# -------------------- Quiz Module --------------------
 
 def upload_quiz():
     """
-    Opens a file dialog for the user to select a quiz JSON file, and then copies it to QUIZ_DIR.
+    Opens a file dialog for the user to select a quiz JSON file, checks it, and then copies it to QUIZ_DIR.
     """
     file_path = filedialog.askopenfilename(title="Select Quiz JSON", filetypes=[("JSON Files", "*.json")])
     if file_path:
+        try:
+            _, errors = check_quiz_file(file_path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to upload quiz: {e}")
+            return
+        if errors:
+            messagebox.showerror("Invalid Quiz", "This quiz cannot be uploaded:\n" + "\n".join(errors[:10]))
+            return
+        ensure_quiz_dir()
         dest_path = os.path.join(QUIZ_DIR, os.path.basename(file_path))
         if os.path.exists(dest_path):
             messagebox.showerror("Error", "A quiz with this name already exists!")
@@ -376,6 +542,7 @@ def upload_quiz():
                 quiz_data = src.read()
             with open(dest_path, "w", encoding="utf-8") as dst:
                 dst.write(quiz_data)
+            index_quiz_file(dest_path)
             messagebox.showinfo("Upload", "Quiz uploaded successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to upload quiz: {e}")
@@ -384,66 +551,77 @@ def show_quiz_browser(main_app):
     """
     Displays the Quiz Browser window with:
       - 'Upload Quiz' button at the top
-      - A search frame below it for filtering quizzes by name or author
-      - A scrollable frame (fixed height) in the middle
+      - A search frame below it for searching quizzes by name, author, topic or question text
+      - A virtual list (fixed height) in the middle, loaded a page at a time
       - A 'Close' button at the bottom
       - Automatic refresh of the quiz list after uploading or searching
     """
     qb_win = ctk.CTkToplevel(main_app)
     qb_win.title("Quiz Browser")
     qb_win.geometry("600x550")  # Slightly larger to accommodate all widgets
+    backend = main_app.backend
+
+    # Filled in on a worker by refresh_quiz_list(), which runs once the
+    # catalogue has been rescanned.
+    open_attempts = {}
+
+    def format_quiz_row(quiz):
+        row = (
+            f"Name: {quiz.get('name', 'N/A')} | "
+            f"Author: {quiz.get('author', 'N/A')} | "
+            f"Questions: {quiz.get('question_count', 0)} | "
+            f"Time: {quiz.get('time_limit', 'N/A')} mins"
+        )
+        if os.path.basename(quiz["file_path"]) in open_attempts:
+            row += " | In progress"
+        return row
 
     def refresh_quiz_list(search_query=""):
-        for widget in scroll_frame.winfo_children():
-            widget.destroy()
-        quizzes = get_all_quizzes()
-        if search_query:
-            search_query_lower = search_query.lower()
-            quizzes = [q for q in quizzes if search_query_lower in q.get("name", "").lower() or 
-                       search_query_lower in q.get("author", "").lower()]
-        if not quizzes:
-            ctk.CTkLabel(scroll_frame, text="No quizzes available.", font=("Segoe UI", 14)).pack(pady=10)
-        else:
-            for quiz in quizzes:
-                quiz_frame = ctk.CTkFrame(scroll_frame)
-                quiz_frame.pack(fill="x", pady=5, padx=5)
-                info_text = (
-                    f"Name: {quiz.get('name', 'N/A')} | "
-                    f"Author: {quiz.get('author', 'N/A')} | "
-                    f"Questions: {len(quiz.get('questions', []))} | "
-                    f"Time: {quiz.get('time_limit', 'N/A')} mins"
-                )
-                ctk.CTkLabel(quiz_frame, text=info_text, font=("Segoe UI", 12)).pack(side="left", padx=5)
-                ctk.CTkButton(
-                    quiz_frame, text="Launch Quiz",
-                    command=lambda q=quiz: launch_quiz(main_app, q)
-                ).pack(side="right", padx=5)
+        def attempts_loaded(attempts):
+            open_attempts.clear()
+            open_attempts.update(attempts)
+            if search_query:
+                # Ranked results, paged like the full list but without a count.
+                quiz_list.reload(lambda after, limit: backend.search_quizzes(search_query, after, limit))
+            else:
+                quiz_list.reload(backend.get_quizzes_page, backend.count_quizzes)
+        run_in_background(qb_win, backend.get_open_attempts, main_app.current_user["id"], on_done=attempts_loaded)
 
     def upload_and_refresh():
         upload_quiz()
         refresh_quiz_list(search_entry.get().strip())
 
     # Top: Upload Quiz button
-    upload_btn = ctk.CTkButton(qb_win, text="Upload Quiz", command=upload_and_refresh)
-    upload_btn.pack(side="top", pady=5)
+    # Uploads copy into the local QUIZ_DIR, which the data service cannot see.
+    if not backend.is_remote:
+        upload_btn = ctk.CTkButton(qb_win, text="Upload Quiz", command=upload_and_refresh)
+        upload_btn.pack(side="top", pady=5)
 
     # Search frame below upload button.
     search_frame = ctk.CTkFrame(qb_win)
     search_frame.pack(side="top", fill="x", pady=5, padx=10)
-    search_entry = ctk.CTkEntry(search_frame, placeholder_text="Search by quiz name or author")
+    search_entry = ctk.CTkEntry(search_frame, placeholder_text="Search by name, author, topic or question")
     search_entry.pack(side="left", fill="x", expand=True, padx=(0, 5))
     ctk.CTkButton(search_frame, text="Search", command=lambda: refresh_quiz_list(search_entry.get().strip())).pack(side="left")
 
-    # Middle: Fixed-height scrollable frame
-    scroll_frame = ctk.CTkScrollableFrame(qb_win, width=580, height=350)
-    scroll_frame.pack(side="top", fill="x", padx=10, pady=(0,10))
+    # Middle: Fixed-height list that only renders the visible quizzes
+    quiz_list = VirtualList(qb_win, backend.get_quizzes_page, format_quiz_row, count=backend.count_quizzes,
+                            action_text="Launch Quiz", on_action=lambda q: launch_quiz(main_app, q),
+                            visible_rows=8, empty_text="No quizzes available.")
+    quiz_list.pack(side="top", fill="x", padx=10, pady=(0,10))
 
     # Bottom: Footer with only the Close button
     footer = ctk.CTkFrame(qb_win)
     footer.pack(side="bottom", fill="x", pady=5)
     ctk.CTkButton(footer, text="Close", command=qb_win.destroy).pack(side="right", padx=5, pady=5)
 
-    refresh_quiz_list()
+    # The list starts from the cached catalogue; rescan the folder off the Tk
+    # thread and refresh once any new or changed files have been read. A data
+    # service rescans its own folder and only lets teachers ask for it.
+    if backend.is_remote and main_app.current_user["account_type"] != "Teacher":
+        refresh_quiz_list()
+    else:
+        run_in_background(qb_win, backend.refresh_catalogue, on_done=lambda _: refresh_quiz_list(search_entry.get().strip()))
 
 def launch_quiz(main_app, quiz):
     launch_win = ctk.CTkToplevel(main_app)
@@ -451,41 +629,120 @@ def launch_quiz(main_app, quiz):
     launch_win.geometry("400x300")
     info_text = (f"Quiz: {quiz.get('name', 'N/A')}\n"
                  f"Author: {quiz.get('author', 'N/A')}\n"
-                 f"Questions: {len(quiz.get('questions', []))}\n"
+                 f"Questions: {quiz.get('question_count', 0)}\n"
                  f"Time Limit: {quiz.get('time_limit', 'N/A')} mins")
-    ctk.CTkLabel(launch_win, text=info_text, font=("Segoe UI", 14)).pack(pady=20)
-    ctk.CTkButton(launch_win, text="Start Quiz", command=lambda: [launch_win.destroy(), execute_quiz(main_app, quiz)]).pack(pady=10)
+    info_label = ctk.CTkLabel(launch_win, text=info_text, font=("Segoe UI", 14))
+    info_label.pack(pady=20)
+    buttons = ctk.CTkFrame(launch_win, fg_color="transparent")
+    buttons.pack()
     ctk.CTkButton(launch_win, text="Cancel", command=launch_win.destroy).pack(pady=10)
 
+    def start_again(attempt_id):
+        launch_win.destroy()
+        run_in_background(main_app, main_app.backend.finish_attempt, attempt_id, on_done=lambda _: execute_quiz(main_app, quiz))
+
+    def attempts_loaded(attempts):
+        attempt = attempts.get(os.path.basename(quiz["file_path"]))
+        if attempt is None:
+            ctk.CTkButton(buttons, text="Start Quiz", command=lambda: [launch_win.destroy(), execute_quiz(main_app, quiz)]).pack(pady=10)
+            return
+        text = info_text + f"\n\nIn progress: {attempt['answered']} of {quiz.get('question_count', 0)} answered"
+        if attempt["remaining_ms"]:
+            text += f", {format_remaining(attempt['remaining_ms'] // 1000)} left"
+        info_label.configure(text=text)
+        # execute_quiz() picks the unfinished attempt up again; starting again
+        # closes it first so a new one is made.
+        ctk.CTkButton(buttons, text="Resume Quiz", command=lambda: [launch_win.destroy(), execute_quiz(main_app, quiz)]).pack(pady=5)
+        ctk.CTkButton(buttons, text="Start Again", command=lambda: start_again(attempt["attempt_id"])).pack(pady=5)
+
+    run_in_background(launch_win, main_app.backend.get_open_attempts, main_app.current_user["id"], on_done=attempts_loaded)
+
+def _mark_and_record(backend, user_id, quiz, user_answers, attempt_id):
+    # Runs on a worker thread; returns (saved, correct_count).
+    import scoring
+    questions = quiz.get("questions", [])
+    correct = scoring.score_answers(quiz, user_answers)
+    answers = [(user_answers.get(i, ""), is_correct) for i, is_correct in enumerate(correct)]
+    correct_count = sum(correct)
+    quiz_file = os.path.basename(quiz["file_path"]) if quiz.get("file_path") else None
+    # Closes the attempt in the same transaction, so a result that was not
+    # saved leaves it, and its journalled answers, open to be resumed, and one
+    # that was cannot be submitted again.
+    ok = backend.record_quiz_result(user_id, correct_count, len(questions), answers, quiz_file, attempt_id)
+    return ok, correct_count
+
+def _open_attempt(backend, user_id, quiz):
+    # Runs on a worker thread; returns (quiz, attempt_id, remaining_ms, answers
+    # so far), or None if the quiz could not be loaded.
+    # The catalogue only holds metadata; read the questions now.
+    quiz = backend.load_quiz(quiz)
+    if quiz is None:
+        return None
+    time_limit_minutes = quiz.get("time_limit", 0)
+    total_time_sec = int(time_limit_minutes * 60) if time_limit_minutes else 0
+    # An unfinished attempt at this quiz carries on with the time it had left,
+    # from the question after the last one answered.
+    attempt_id, remaining_ms = backend.begin_attempt(user_id, os.path.basename(quiz["file_path"]),
+                                                     total_time_sec * 1000 if total_time_sec else None)
+    return quiz, attempt_id, remaining_ms, backend.get_attempt_answers(attempt_id)
+
 def execute_quiz(main_app, quiz):
+    def opened(attempt):
+        if attempt is None:
+            messagebox.showerror("Error", "This quiz could not be loaded. It may have been moved or deleted.")
+            return
+        _run_quiz(main_app, *attempt)
+    run_in_background(main_app, _open_attempt, main_app.backend, main_app.current_user["id"], quiz, on_done=opened)
+
+def _run_quiz(main_app, quiz, attempt_id, remaining_ms, user_answers):
     exec_win = ctk.CTkToplevel(main_app)
     exec_win.title("Quiz Execution")
     exec_win.geometry("600x500")
+    backend = main_app.backend
     
     questions = quiz.get("questions", [])
     total_questions = len(questions)
-    user_answers = {}
-    current_q_index = [0]  # Mutable holder for current index
+    finished = [False]
     
-    time_limit_minutes = quiz.get("time_limit", 0)
-    total_time_sec = int(time_limit_minutes * 60) if time_limit_minutes else 0
-    start_time = datetime.datetime.now()
+    current_q_index = [max(user_answers) + 1 if user_answers else 0]  # Mutable holder for current index
+    # Answers are journalled on a worker as each question is answered. Any the
+    # journal has not confirmed are written again when the window is closed
+    # or the result cannot be saved, so a failed write only delays them.
+    journalled = set(user_answers)
+    
+    def journal(index):
+        def done(ok):
+            if ok:
+                journalled.add(index)
+        run_in_background(exec_win, backend.save_attempt_answer, attempt_id, index, user_answers[index],
+                          on_done=done, on_error=lambda error: print("Could not journal answer:", error))
+    
+    def journal_pending():
+        for index, given in user_answers.items():
+            if index not in journalled:
+                submit(backend.save_attempt_answer, attempt_id, index, given)
     
     timer_label = ctk.CTkLabel(exec_win, text="", font=("Segoe UI", 14))
     timer_label.pack(pady=5)
+    timer = None
+    ticks = [0]
     
-    def update_timer():
-        if total_time_sec > 0:
-            elapsed = (datetime.datetime.now() - start_time).total_seconds()
-            remaining = max(0, total_time_sec - int(elapsed))
-            mins, secs = divmod(remaining, 60)
-            timer_label.configure(text=f"Time Remaining: {int(mins):02d}:{int(secs):02d}")
-            if remaining <= 0:
-                finish_quiz()
-            else:
-                exec_win.after(1000, update_timer)
-    if total_time_sec > 0:
-        update_timer()
+    def show_time(seconds_left):
+        timer_label.configure(text=f"Time Remaining: {format_remaining(seconds_left)}")
+        ticks[0] += 1
+        if ticks[0] % TIMER_CHECKPOINT_TICKS == 0:
+            submit(backend.save_attempt_time, attempt_id, int(timer.remaining() * 1000))
+    
+    def close_quiz():
+        # Closing without finishing keeps the attempt, and its time, for later.
+        if not finished[0]:
+            journal_pending()
+        if timer is not None and timer.running:
+            timer.stop()
+            submit(backend.save_attempt_time, attempt_id, int(timer.remaining() * 1000))
+        exec_win.destroy()
+    
+    exec_win.protocol("WM_DELETE_WINDOW", close_quiz)
     
     content_frame = ctk.CTkFrame(exec_win)
     content_frame.pack(fill="both", expand=True, padx=10, pady=10)
@@ -514,12 +771,10 @@ def execute_quiz(main_app, quiz):
                 widget.destroy()
             if "image" in q and q["image"]:
                 try:
-                    img = Image.open(q["image"])
-                    max_width = 400
-                    if img.width > max_width:
-                        ratio = max_width / img.width
-                        img = img.resize((max_width, int(img.height * ratio)), Image.Resampling.LANCZOS)
-                    photo = ImageTk.PhotoImage(img)
+                    from PIL import ImageTk
+                    with instrumentation.span("quiz.image"):
+                        img = image_cache.get_image(q["image"], QUESTION_IMAGE_WIDTH)
+                        photo = ImageTk.PhotoImage(img)
                     image_label = ctk.CTkLabel(content_frame, image=photo, text="")
                     image_label.image = photo
                     image_label.pack(pady=5)
@@ -534,20 +789,35 @@ def execute_quiz(main_app, quiz):
                 entry = ctk.CTkEntry(options_frame, placeholder_text="Your answer here")
                 entry.pack(fill="x", pady=2)
                 options_frame.entry = entry
+            # Decode the next question's image while this one is being answered.
+            if index + 1 < total_questions and questions[index + 1].get("image"):
+                image_cache.prefetch(questions[index + 1]["image"], QUESTION_IMAGE_WIDTH)
         else:
             finish_quiz()
     
     def next_question():
+        # Past the last question the quiz is already being finished.
+        if finished[0] or current_q_index[0] >= total_questions:
+            return
         index = current_q_index[0]
         q = questions[index]
         if q.get("options", []):
             user_answers[index] = answer_var.get()
         else:
             user_answers[index] = options_frame.entry.get()
+        journal(index)
         current_q_index[0] += 1
         display_question(current_q_index[0])
     
     def finish_quiz():
+        # The timer and the Finish button can both get here while the result saves.
+        if finished[0]:
+            return
+        finished[0] = True
+        next_button.configure(state="disabled")
+        finish_button.configure(state="disabled")
+        if timer is not None:
+            timer.stop()
         # Ensure the answer of the current question is stored, if not already.
         if current_q_index[0] < total_questions:
             q = questions[current_q_index[0]]
@@ -555,72 +825,80 @@ def execute_quiz(main_app, quiz):
                 user_answers[current_q_index[0]] = answer_var.get()
             else:
                 user_answers[current_q_index[0]] = options_frame.entry.get()
-        correct_count = 0
-        for i, q in enumerate(questions):
-            if user_answers.get(i, "").strip().lower() == q.get("answer", "").strip().lower():
-                correct_count += 1
-        result_data = {"correct_count": correct_count, "total_questions": total_questions}
-        record_quiz_result(main_app.current_user["id"], json.dumps(result_data), total_questions)
-        messagebox.showinfo("Quiz Completed", f"You scored {correct_count} out of {total_questions}. Your result has been stored in Past Results.")
-        exec_win.destroy()
+        def not_saved(error=None):
+            journal_pending()
+            if timer is not None:
+                submit(backend.save_attempt_time, attempt_id, int(timer.remaining() * 1000))
+            messagebox.showerror("Error", "Your result could not be saved. Your answers have been kept, "
+                                          "so open the quiz again to submit it.")
+            exec_win.destroy()
+        def saved(outcome):
+            ok, correct_count = outcome
+            if not ok:
+                not_saved()
+                return
+            messagebox.showinfo("Quiz Completed", f"You scored {correct_count} out of {total_questions}. Your result has been stored in Past Results.")
+            exec_win.destroy()
+        run_in_background(exec_win, _mark_and_record, backend, main_app.current_user["id"], quiz, dict(user_answers),
+                          attempt_id, on_done=saved, on_error=not_saved)
     
     nav_frame = ctk.CTkFrame(exec_win)
     nav_frame.pack(fill="x", pady=10)
-    ctk.CTkButton(nav_frame, text="Next", command=next_question).pack(side="right", padx=5)
-    ctk.CTkButton(nav_frame, text="Finish", command=finish_quiz).pack(side="right", padx=5)
+    next_button = ctk.CTkButton(nav_frame, text="Next", command=next_question)
+    next_button.pack(side="right", padx=5)
+    finish_button = ctk.CTkButton(nav_frame, text="Finish", command=finish_quiz)
+    finish_button.pack(side="right", padx=5)
     
-    display_question(0)
+    display_question(current_q_index[0])
+    if remaining_ms and not finished[0]:
+        timer = QuizTimer(exec_win, remaining_ms / 1000, show_time, finish_quiz)
+        timer.start()
 
 # -------------------- End Quiz Module --------------------
 
-def change_username(main_app, new_username):
+def _rename_user(user_id, new_username):
+    # Runs on a worker thread; returns None on success or the error to show.
+    if get_db_connection() is None:
+        return "Database connection error."
+    if username_exists(new_username):
+        return "Username already exists. Please choose another."
+    update_username(user_id, new_username)
+    return None
+
+def _set_busy(button, busy, text):
+    if button is not None:
+        button.configure(state="disabled" if busy else "normal", text="Please wait..." if busy else text)
+
+def change_username(main_app, new_username, button=None):
     if len(new_username) < 5 or len(new_username) > 16:
         messagebox.showerror("Error", "Username must be between 5 and 16 characters.")
         return
-    conn = get_db_connection()
-    if conn is None:
-        messagebox.showerror("Error", "Database connection error.")
-        return
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE username = ?", (new_username,))
-    if cursor.fetchone():
-        messagebox.showerror("Error", "Username already exists. Please choose another.")
-        conn.close()
-        return
-    cursor.execute("UPDATE users SET username = ? WHERE id = ?", (new_username, main_app.current_user["id"]))
-    conn.commit()
-    conn.close()
-    main_app.current_user["username"] = new_username
-    messagebox.showinfo("Success", "Username changed successfully!")
+    def done(error):
+        _set_busy(button, False, "Change Username")
+        if error:
+            messagebox.showerror("Error", error)
+            return
+        main_app.current_user["username"] = new_username
+        messagebox.showinfo("Success", "Username changed successfully!")
+    _set_busy(button, True, "Change Username")
+    run_in_background(main_app, _rename_user, main_app.current_user["id"], new_username, on_done=done)
 
-def change_password(main_app, new_password, confirm_password):
+def change_password(main_app, new_password, confirm_password, button=None):
     if len(new_password) < 6:
         messagebox.showerror("Error", "New password must be at least 6 characters long.")
         return
     if new_password != confirm_password:
         messagebox.showerror("Error", "Password confirmation does not match.")
         return
-    conn = get_db_connection()
-    if conn is None:
-        messagebox.showerror("Error", "Database connection error.")
-        return
-    cursor = conn.cursor()
-    cursor.execute("SELECT password FROM users WHERE id = ?", (main_app.current_user["id"],))
-    row = cursor.fetchone()
-    if not row:
-        messagebox.showerror("Error", "User not found in database.")
-        conn.close()
-        return
-    current_hashed = row[0]
-    if bcrypt.checkpw(new_password.encode('utf-8'), current_hashed if isinstance(current_hashed, bytes) else current_hashed.encode('utf-8')):
-        messagebox.showerror("Error", "New password cannot be the same as the old password.")
-        conn.close()
-        return
-    new_hashed = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
-    cursor.execute("UPDATE users SET password = ? WHERE id = ?", (new_hashed, main_app.current_user["id"]))
-    conn.commit()
-    conn.close()
-    messagebox.showinfo("Success", "Password changed successfully!")
+    def done(error):
+        _set_busy(button, False, "Change Password")
+        if error:
+            messagebox.showerror("Error", error)
+        else:
+            messagebox.showinfo("Success", "Password changed successfully!")
+    # bcrypt takes hundreds of ms by design, so hash on a worker thread.
+    _set_busy(button, True, "Change Password")
+    run_in_background(main_app, auth.change_password, main_app.current_user["id"], new_password, on_done=done)
 
 def show_manage_account(main_app):
     manage_win = ctk.CTkToplevel(main_app)
@@ -632,7 +910,8 @@ def show_manage_account(main_app):
     ctk.CTkLabel(username_frame, text="Change Username", font=("Segoe UI", 16)).pack(pady=5)
     new_username_entry = ctk.CTkEntry(username_frame, placeholder_text="New Username")
     new_username_entry.pack(pady=5, fill="x")
-    ctk.CTkButton(username_frame, text="Change Username", command=lambda: change_username(main_app, new_username_entry.get().strip())).pack(pady=5)
+    username_btn = ctk.CTkButton(username_frame, text="Change Username", command=lambda: change_username(main_app, new_username_entry.get().strip(), username_btn))
+    username_btn.pack(pady=5)
 
     password_frame = ctk.CTkFrame(manage_win)
     password_frame.pack(fill="x", padx=10, pady=10)
@@ -641,20 +920,94 @@ def show_manage_account(main_app):
     new_password_entry.pack(pady=5, fill="x")
     confirm_password_entry = ctk.CTkEntry(password_frame, placeholder_text="Confirm New Password", show="*")
     confirm_password_entry.pack(pady=5, fill="x")
-    ctk.CTkButton(password_frame, text="Change Password", command=lambda: change_password(main_app, new_password_entry.get(), confirm_password_entry.get())).pack(pady=5)
+    password_btn = ctk.CTkButton(password_frame, text="Change Password", command=lambda: change_password(main_app, new_password_entry.get(), confirm_password_entry.get(), password_btn))
+    password_btn.pack(pady=5)
 
     footer = ctk.CTkFrame(manage_win)
     footer.pack(fill="x", pady=10)
     ctk.CTkButton(footer, text="Close", command=manage_win.destroy).pack(pady=5)
 
+# -------------------- Diagnostics --------------------
+
+def show_diagnostics(main_app):
+    """
+    Hidden window (Ctrl+Shift+D) showing the instrumentation histograms, with
+    JSON and Prometheus export and a cProfile capture of the Tk thread.
+    """
+    diag_win = ctk.CTkToplevel(main_app)
+    diag_win.title("Diagnostics")
+    diag_win.geometry("760x560")
+    
+    status_label = ctk.CTkLabel(diag_win, text="", font=("Segoe UI", 12), justify="left", wraplength=720)
+    status_label.pack(fill="x", padx=10, pady=5)
+    output = ctk.CTkTextbox(diag_win, font=("Courier New", 12), wrap="none")
+    output.pack(fill="both", expand=True, padx=10, pady=5)
+    
+    def show_text(text):
+        output.configure(state="normal")
+        output.delete("1.0", "end")
+        output.insert("1.0", text)
+        output.configure(state="disabled")
+    
+    def refresh():
+        if instrumentation.ENABLED:
+            status_label.configure(text="Recording timings. Times are in milliseconds; p50 and p95 are bucket upper bounds.")
+            show_text(instrumentation.format_table())
+        else:
+            status_label.configure(text="Instrumentation is off. Start the app with QUIZ_INSTRUMENT=1 to record timings.")
+            show_text("")
+        profile_button.configure(text="Stop Profile" if instrumentation.profiling() else "Start Profile")
+    
+    def reset():
+        instrumentation.reset()
+        refresh()
+    
+    def save(export, extension):
+        path = filedialog.asksaveasfilename(parent=diag_win, defaultextension=extension,
+                                            filetypes=[(extension.upper().strip("."), "*" + extension)])
+        if not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(export())
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save metrics: {e}")
+    
+    def toggle_profile():
+        if not instrumentation.profiling():
+            instrumentation.start_profile()
+            refresh()
+            return
+        path, report = instrumentation.stop_profile()
+        refresh()
+        status_label.configure(text=f"Profile saved to {path}" if path else "Profile could not be saved.")
+        show_text(report)
+    
+    buttons = ctk.CTkFrame(diag_win)
+    buttons.pack(fill="x", pady=5)
+    ctk.CTkButton(buttons, text="Refresh", width=90, command=refresh).pack(side="left", padx=5, pady=5)
+    ctk.CTkButton(buttons, text="Reset", width=90, command=reset).pack(side="left", padx=5, pady=5)
+    ctk.CTkButton(buttons, text="Save JSON", width=110,
+                  command=lambda: save(instrumentation.to_json, ".json")).pack(side="left", padx=5, pady=5)
+    ctk.CTkButton(buttons, text="Save Prometheus", width=130,
+                  command=lambda: save(instrumentation.to_prometheus, ".prom")).pack(side="left", padx=5, pady=5)
+    profile_button = ctk.CTkButton(buttons, text="Start Profile", width=110, command=toggle_profile)
+    profile_button.pack(side="left", padx=5, pady=5)
+    ctk.CTkButton(buttons, text="Close", width=90, command=diag_win.destroy).pack(side="right", padx=5, pady=5)
+    refresh()
+
 class MainApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, backend):
         super().__init__()
-        self.title("Main Menu")
+        self.title(f"Main Menu ({backend.address[0]}:{backend.address[1]})" if backend.is_remote else "Main Menu")
         self.geometry("400x500")
         self.resizable(False, False)
         
         self.current_user = None
+        self.dashboard_window = None
+        # Everything behind login, the dashboard, past results and the quiz
+        # screens goes through this (see backend.py).
+        self.backend = backend
         
         ctk.CTkLabel(self, text="Main Menu", font=("Arial", 20)).pack(pady=20)
         ctk.CTkButton(self, text="Login / Sign Up", command=self.open_auth).pack(pady=10)
@@ -665,6 +1018,7 @@ class MainApp(ctk.CTk):
         ctk.CTkButton(self, text="Manage Account", command=self.open_manage_account).pack(pady=10)
         ctk.CTkButton(self, text="Sign Out", command=self.sign_out).pack(pady=10)
         ctk.CTkButton(self, text="Simulate Quiz Run", command=self.simulate_quiz_run).pack(pady=10)
+        self.bind("<Control-Shift-D>", lambda event: show_diagnostics(self))
     
     def open_auth(self):
         LoginApp(self)
@@ -687,15 +1041,22 @@ class MainApp(ctk.CTk):
         if self.check_login_status():
             show_quiz_browser(self)
 
+    def check_local_database(self):
+        # Teacher tools and account changes work on the local database only.
+        if self.backend.is_remote:
+            messagebox.showerror("Not Available", "This section is not available when connected to a data service.")
+            return False
+        return True
+
     def open_user_browser(self):
-        if self.check_login_status():
+        if self.check_login_status() and self.check_local_database():
             if self.current_user["account_type"] == "Teacher":
                 show_user_browser(self)
             else:
                 messagebox.showerror("Access Denied", "Only accessible by teachers.")
 
     def open_manage_account(self):
-        if self.check_login_status():
+        if self.check_login_status() and self.check_local_database():
             show_manage_account(self)
 
     def sign_out(self):
@@ -703,6 +1064,9 @@ class MainApp(ctk.CTk):
             messagebox.showerror("Error", "You must be logged in before signing out.")
         else:
             self.current_user = None
+            submit(self.backend.sign_out)
+            if self.dashboard_window is not None and self.dashboard_window.winfo_exists():
+                self.dashboard_window.withdraw()
             messagebox.showinfo("Sign Out", "You have been signed out.")
 
     def simulate_quiz_run(self):
@@ -711,11 +1075,13 @@ class MainApp(ctk.CTk):
         import random
         total_questions = random.randint(3, 10)
         correct_count = random.randint(0, total_questions)
-        result_data = {"correct_count": correct_count, "total_questions": total_questions}
-        if record_quiz_result(self.current_user["id"], json.dumps(result_data), total_questions):
-            messagebox.showinfo("Quiz Recorded", f"Recorded: {correct_count} correct out of {total_questions}")
-        else:
-            messagebox.showerror("Error", "Failed to record test result.")
+        def recorded(ok):
+            if ok:
+                messagebox.showinfo("Quiz Recorded", f"Recorded: {correct_count} correct out of {total_questions}")
+            else:
+                messagebox.showerror("Error", "Failed to record test result.")
+        run_in_background(self, self.backend.record_quiz_result, self.current_user["id"], correct_count, total_questions,
+                          on_done=recorded)
 
 class LoginApp(ctk.CTkToplevel):
     def __init__(self, master):
@@ -754,7 +1120,8 @@ class LoginApp(ctk.CTkToplevel):
             self.account_type_menu.pack(pady=5)
         
         action_text = "Sign Up" if self.is_sign_up_mode else "Login"
-        ctk.CTkButton(self.frame, text=action_text, command=self.handle_authentication).pack(pady=5)
+        self.action_button = ctk.CTkButton(self.frame, text=action_text, command=self.handle_authentication)
+        self.action_button.pack(pady=5)
         
         switch_text = "Already have an account? Login" if self.is_sign_up_mode else "Don't have an account? Sign Up"
         ctk.CTkButton(self.frame, text=switch_text, fg_color="transparent", text_color="blue", command=self.switch_mode).pack(pady=5)
@@ -777,34 +1144,63 @@ class LoginApp(ctk.CTkToplevel):
             messagebox.showerror("Error", "Password must be at least 6 characters long.")
             return
         
-        conn = sqlite3.connect("users.db")
-        cursor = conn.cursor()
-        
+        # bcrypt is slow by design, so hashing and checking happen on a worker
+        # thread while the button shows that something is going on. A password
+        # hashed at an old cost is rehashed in the background after login.
+        self.action_button.configure(state="disabled", text="Please wait...")
         if self.is_sign_up_mode:
             account_type = self.account_type_var.get()
-            hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-            try:
-                cursor.execute("INSERT INTO users (username, password, account_type) VALUES (?, ?, ?)",
-                               (username, hashed_password, account_type))
-                conn.commit()
-                messagebox.showinfo("Success", f"Account Created Successfully as {account_type}!")
-                self.switch_mode()
-            except sqlite3.IntegrityError:
-                messagebox.showerror("Error", "Username already exists.")
+            run_in_background(self, self.master.backend.sign_up, username, password, account_type,
+                              on_done=lambda created: self.sign_up_finished(created, account_type),
+                              on_error=self.sign_up_failed)
         else:
-            cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-            user = cursor.fetchone()
-            if user and bcrypt.checkpw(password.encode('utf-8'),
-                                       user[2] if isinstance(user[2], bytes) else user[2].encode('utf-8')):
-                self.master.current_user = {"username": user[1], "account_type": user[3], "id": user[0]}
-                messagebox.showinfo("Login Successful", f"Welcome back, {user[1]}! Account Type: {user[3]}")
-                self.destroy()
-            else:
-                messagebox.showerror("Error", "Invalid Username or Password")
-        
-        conn.close()
+            run_in_background(self, self.master.backend.authenticate, username, password,
+                              on_done=self.login_finished, on_error=self.login_failed)
+    
+    def reset_action_button(self):
+        self.action_button.configure(state="normal", text="Sign Up" if self.is_sign_up_mode else "Login")
+    
+    def sign_up_finished(self, created, account_type):
+        self.reset_action_button()
+        if not created:
+            messagebox.showerror("Error", "Database connection error.")
+            return
+        messagebox.showinfo("Success", f"Account Created Successfully as {account_type}!")
+        self.switch_mode()
+    
+    def sign_up_failed(self, error):
+        self.reset_action_button()
+        if isinstance(error, sqlite3.IntegrityError):
+            messagebox.showerror("Error", "Username already exists.")
+        else:
+            messagebox.showerror("Error", f"Sign up failed: {error}")
+    
+    def login_finished(self, user):
+        if user is None:
+            self.reset_action_button()
+            messagebox.showerror("Error", "Invalid Username or Password")
+            return
+        self.master.current_user = user
+        messagebox.showinfo("Login Successful", f"Welcome back, {user['username']}! Account Type: {user['account_type']}")
+        self.destroy()
+    
+    def login_failed(self, error):
+        self.reset_action_button()
+        messagebox.showerror("Error", f"Login failed: {error}")
 
 if __name__ == "__main__":
-    create_database()
-    app = MainApp()
+    if instrumentation.PROFILE_ON_START:
+        instrumentation.start_profile()
+    from backend import from_environment
+    data_backend = from_environment()
+    if not data_backend.is_remote:
+        create_database()
+        # Times bcrypt on first start so new passwords get a cost this machine can afford.
+        submit(auth.ensure_calibrated)
+    app = MainApp(data_backend)
     app.mainloop()
+    shutdown_workers()
+    data_backend.close()
+    if instrumentation.profiling():
+        profile_path, _ = instrumentation.stop_profile()
+        print("Profile saved to", profile_path)
@@ -0,0 +1,247 @@
+"""
+Class-wide analytics for teachers.
+
+Everything is computed for all students at once with a few grouped queries
+(over the daily_user_stats rollup where possible) instead of one
+get_dashboard_data() call per student. Item analysis reads the running
+question_stats and answer_stats counters rather than every stored answer.
+Results are cached until database.data_version() changes, i.e. until the next
+result is recorded.
+"""
+import os
+import math
+import datetime
+import threading
+
+import quiz_catalogue
+from database import SIMULATED_DATE, get_db_connection, data_version
+
+# Days used for each student's trend (the slope of their daily score).
+TREND_DAYS = 14
+
+# Item analysis flags questions outside these bounds.
+HARD_FACILITY = 0.3
+EASY_FACILITY = 0.9
+LOW_DISCRIMINATION = 0.2
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _cached(key, compute):
+    # The version is read first, so a write made while computing leaves the
+    # entry stale and it is recomputed on the next call.
+    version = data_version()
+    with _cache_lock:
+        entry = _cache.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    value = compute()
+    with _cache_lock:
+        _cache[key] = (version, value)
+    return value
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+def _student_rows(conn, today):
+    first_day = (today - datetime.timedelta(days=TREND_DAYS - 1)).isoformat()
+    # The trend is the least-squares slope of daily score (%) against day
+    # number, in percentage points per day, from the sums of x, y, x*x and x*y.
+    rows = conn.execute("""
+    WITH totals AS (
+        SELECT u.id, u.username,
+               COALESCE(SUM(s.attempts), 0) AS attempts,
+               COALESCE(SUM(s.correct), 0) AS correct,
+               COALESCE(SUM(s.total_questions), 0) AS total,
+               MAX(s.day) AS last_day
+        FROM users AS u
+        LEFT JOIN daily_user_stats AS s ON s.user_id = u.id
+        WHERE u.account_type = 'Student'
+        GROUP BY u.id
+    ),
+    recent AS (
+        SELECT user_id, COUNT(*) AS n, SUM(x) AS sx, SUM(y) AS sy, SUM(x * x) AS sxx, SUM(x * y) AS sxy
+        FROM (SELECT user_id,
+                     julianday(day) - julianday(:first_day) AS x,
+                     100.0 * correct / total_questions AS y
+              FROM daily_user_stats
+              WHERE day BETWEEN :first_day AND :today
+                AND total_questions > 0)
+        GROUP BY user_id
+    )
+    SELECT t.id, t.username, t.attempts, t.correct, t.total, t.last_day,
+           CASE WHEN r.n >= 2 THEN (r.n * r.sxy - r.sx * r.sy) / (r.n * r.sxx - r.sx * r.sx) END,
+           CASE WHEN t.total > 0 THEN
+               PERCENT_RANK() OVER (PARTITION BY t.total > 0 ORDER BY 1.0 * t.correct / NULLIF(t.total, 0))
+           END
+    FROM totals AS t
+    LEFT JOIN recent AS r ON r.user_id = t.id
+    ORDER BY t.username;
+    """, {"first_day": first_day, "today": today.isoformat()}).fetchall()
+    students = []
+    for position, row in enumerate(rows, start=1):
+        students.append({
+            "position": position,
+            "id": row[0],
+            "username": row[1],
+            "attempts": row[2],
+            "success_rate": (row[3] / row[4] * 100) if row[4] else None,
+            "last_attempt": datetime.date.fromisoformat(row[5]) if row[5] else None,
+            "trend": row[6],
+            "percentile": row[7] * 100 if row[7] is not None else None,
+        })
+    return students
+
+def _quiz_rows(conn):
+    # Hardest first. The quiz name comes from the catalogue where it is known.
+    rows = conn.execute("""
+    WITH per_quiz AS (
+        SELECT r.quiz_file,
+               COUNT(*) AS attempts,
+               COUNT(DISTINCT r.user_id) AS students,
+               AVG(100.0 * r.correct_count / r.total_questions) AS avg_score
+        FROM results AS r
+        JOIN users AS u ON u.id = r.user_id
+        WHERE u.account_type = 'Student'
+          AND r.quiz_file IS NOT NULL
+          AND r.total_questions > 0
+        GROUP BY r.quiz_file
+    )
+    SELECT p.quiz_file, c.name, p.attempts, p.students, p.avg_score,
+           RANK() OVER (ORDER BY p.avg_score)
+    FROM per_quiz AS p
+    LEFT JOIN quiz_catalogue AS c ON c.file_path = :prefix || p.quiz_file
+    ORDER BY p.avg_score, p.quiz_file;
+    """, {"prefix": os.path.join(quiz_catalogue.QUIZ_DIR, "")}).fetchall()
+    return [{"position": position, "quiz_file": row[0], "name": row[1] or row[0], "attempts": row[2],
+             "students": row[3], "avg_score": row[4], "difficulty_rank": row[5]}
+            for position, row in enumerate(rows, start=1)]
+
+def get_cohort_overview(current_datetime=None):
+    """
+    Returns {"summary": {...}, "students": [...], "quizzes": [...]} where
+    students are ordered by username and quizzes from hardest to easiest.
+    """
+    now = current_datetime if current_datetime else (SIMULATED_DATE if SIMULATED_DATE else datetime.datetime.now())
+    today = now.date()
+
+    def compute():
+        conn = get_db_connection()
+        if conn is None:
+            return {"summary": {}, "students": [], "quizzes": []}
+        students = _student_rows(conn, today)
+        quizzes = _quiz_rows(conn)
+        rated = [s["success_rate"] for s in students if s["success_rate"] is not None]
+        trend_start = today - datetime.timedelta(days=TREND_DAYS - 1)
+        summary = {
+            "students": len(students),
+            "active_students": sum(1 for s in students if s["last_attempt"] and s["last_attempt"] >= trend_start),
+            "attempts": sum(s["attempts"] for s in students),
+            "avg_success_rate": sum(rated) / len(rated) if rated else None,
+            "improving": sum(1 for s in students if s["trend"] is not None and s["trend"] > 0),
+            "declining": sum(1 for s in students if s["trend"] is not None and s["trend"] < 0),
+        }
+        return {"summary": summary, "students": students, "quizzes": quizzes}
+
+    return _cached(("overview", today), compute)
+
+def facility(attempts, correct):
+    """
+    The fraction of attempts that answered the question correctly.
+    """
+    return correct / attempts if attempts else None
+
+def discrimination(attempts, correct, score_sum, score_sq_sum, correct_score_sum):
+    """
+    The point-biserial correlation between getting the question right and the
+    attempt's score (fraction correct, this question included), from the
+    running sums in question_stats. None when everyone, or no one, got it right
+    or all scores are equal.
+    """
+    if not 0 < correct < attempts:
+        return None
+    mean = score_sum / attempts
+    variance = score_sq_sum / attempts - mean * mean
+    if variance <= 1e-12:
+        return None
+    mean_right = correct_score_sum / correct
+    mean_wrong = (score_sum - correct_score_sum) / (attempts - correct)
+    p = correct / attempts
+    return (mean_right - mean_wrong) / math.sqrt(variance) * math.sqrt(p * (1 - p))
+
+def item_flag(item):
+    if item["facility"] is not None and item["facility"] < HARD_FACILITY:
+        return "Too hard"
+    if item["facility"] is not None and item["facility"] > EASY_FACILITY:
+        return "Too easy"
+    if item["discrimination"] is not None and item["discrimination"] < 0:
+        return "Misleading"
+    if item["discrimination"] is not None and item["discrimination"] < LOW_DISCRIMINATION:
+        return "Weak"
+    return ""
+
+def _quiz_questions(quiz_files):
+    # {quiz_file: (name, questions)} from the catalogue's compiled quizzes; a
+    # report never reads or recompiles the files themselves.
+    prefix = os.path.join(quiz_catalogue.QUIZ_DIR, "")
+    stored = quiz_catalogue.get_stored_quizzes(prefix + quiz_file for quiz_file in quiz_files)
+    quizzes = {}
+    for quiz_file in quiz_files:
+        quiz = stored.get(prefix + quiz_file)
+        quizzes[quiz_file] = (quiz.get("name", quiz_file), quiz.get("questions", [])) if quiz else (quiz_file, [])
+    return quizzes
+
+def _item_rows(conn, quiz_file):
+    where, params = ("WHERE quiz_file = ?", (quiz_file,)) if quiz_file else ("", ())
+    rows = conn.execute(f"""
+    SELECT quiz_file, question_index, attempts, correct, score_sum, score_sq_sum, correct_score_sum
+    FROM question_stats
+    {where}
+    ORDER BY quiz_file, question_index;
+    """, params).fetchall()
+    # How often each answer was given, for every question at once.
+    answer_counts = {}
+    for row in conn.execute(f"SELECT quiz_file, question_index, given_answer, chosen FROM answer_stats {where}", params):
+        answer_counts.setdefault((row[0], row[1]), {})[row[2]] = row[3]
+    quizzes = _quiz_questions({row[0] for row in rows})
+    items = []
+    for row in rows:
+        name, questions = quizzes[row[0]]
+        question = questions[row[1]] if row[1] < len(questions) else {}
+        item = {
+            "quiz_file": row[0],
+            "quiz_name": name,
+            "question_index": row[1],
+            "question": question.get("question", f"Question {row[1] + 1}"),
+            "attempts": row[2],
+            "facility": facility(row[2], row[3]),
+            "discrimination": discrimination(*row[2:]),
+            "answers": [],
+        }
+        options = question.get("options") or []
+        if options:
+            # How often each option was chosen; a popular wrong option is a
+            # distractor worth looking at.
+            chosen = answer_counts.get((row[0], row[1]), {})
+            item["answers"] = [(option, chosen.get(option, 0)) for option in options]
+        item["flag"] = item_flag(item)
+        items.append(item)
+    items.sort(key=lambda item: (item["quiz_name"].lower(), item["quiz_file"], item["question_index"]))
+    for position, item in enumerate(items, start=1):
+        item["position"] = position
+    return items
+
+def get_item_analysis(quiz_file=None):
+    """
+    Returns one dict per question that has been answered, for one quiz file or
+    the whole catalogue: facility, discrimination, a flag and, for multiple
+    choice questions, how often each option was chosen.
+    """
+    def compute():
+        conn = get_db_connection()
+        if conn is None:
+            return []
+        return _item_rows(conn, quiz_file)
+
+    return _cached(("items", quiz_file), compute)
@@ -0,0 +1,117 @@
+import time
+
+from database import (
+    get_user_by_username, insert_user, get_password_hash, update_password_hash, replace_password_hash,
+    get_setting, set_setting,
+)
+from instrumentation import timed
+from tasks import submit
+
+# How long one bcrypt hash or check should take on this host. calibrate()
+# picks the highest cost that fits; the result is kept in the settings table.
+DEFAULT_LATENCY_BUDGET_MS = 250
+
+# bcrypt's own default, used until calibrate() has run.
+DEFAULT_BCRYPT_COST = 12
+
+# Calibration never goes outside these, however fast or slow the host is.
+MIN_BCRYPT_COST = 10
+MAX_BCRYPT_COST = 16
+
+# Cost timed by calibrate(); each step up doubles the work.
+CALIBRATION_COST = 8
+
+def _as_bytes(hashed):
+    return hashed if isinstance(hashed, bytes) else hashed.encode('utf-8')
+
+def latency_budget_ms():
+    return int(get_setting("bcrypt_budget_ms", DEFAULT_LATENCY_BUDGET_MS))
+
+def target_cost():
+    return int(get_setting("bcrypt_cost", DEFAULT_BCRYPT_COST))
+
+def hash_cost(hashed):
+    # The cost is part of the hash itself: $2b$<cost>$<salt and digest>.
+    try:
+        return int(_as_bytes(hashed).split(b"$")[2])
+    except (IndexError, ValueError):
+        return None
+
+def _time_hash_ms(cost, samples=3):
+    import bcrypt
+    import statistics  # Only needed when calibrating.
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds=cost))
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def calibrate(budget_ms=None):
+    """
+    Times bcrypt on this host and stores the highest cost whose hash is
+    expected to take no longer than budget_ms (the stored budget by default).
+    Returns (cost, expected ms). New and rehashed passwords use the new cost.
+    """
+    budget_ms = budget_ms or latency_budget_ms()
+    base_ms = _time_hash_ms(CALIBRATION_COST)
+    cost = CALIBRATION_COST
+    while cost < MAX_BCRYPT_COST and base_ms * 2 ** (cost + 1 - CALIBRATION_COST) <= budget_ms:
+        cost += 1
+    cost = max(cost, MIN_BCRYPT_COST)
+    set_setting("bcrypt_budget_ms", budget_ms)
+    set_setting("bcrypt_cost", cost)
+    return cost, base_ms * 2 ** (cost - CALIBRATION_COST)
+
+def ensure_calibrated():
+    # Run once per database, in the background, the first time the app starts.
+    if get_setting("bcrypt_cost") is None:
+        calibrate()
+
+@timed("auth.bcrypt_hash")
+def hash_password(password):
+    import bcrypt  # Only loaded once someone signs in or up.
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=target_cost()))
+
+@timed("auth.bcrypt_check")
+def check_password(password, hashed):
+    import bcrypt
+    return bcrypt.checkpw(password.encode('utf-8'), _as_bytes(hashed))
+
+def rehash_password(user_id, password, old_hashed):
+    # Replaces a hash made at another cost; skipped if the password has been
+    # changed since it was read.
+    return replace_password_hash(user_id, old_hashed, hash_password(password))
+
+def authenticate(username, password):
+    """
+    Returns the user as {"username", "account_type", "id"} if the password
+    matches, otherwise None. Slow by design (bcrypt), so call it off the Tk thread.
+    A hash made at a different cost from target_cost() is redone on a worker
+    thread, so the login itself is not made slower.
+    """
+    user = get_user_by_username(username)
+    if user and check_password(password, user[2]):
+        if hash_cost(user[2]) != target_cost():
+            submit(rehash_password, user[0], password, user[2])
+        return {"username": user[1], "account_type": user[3], "id": user[0]}
+    return None
+
+def sign_up(username, password, account_type):
+    """
+    Raises sqlite3.IntegrityError if the username is already taken.
+    """
+    return insert_user(username, hash_password(password), account_type)
+
+def change_password(user_id, new_password):
+    """
+    Returns None on success, otherwise the error message to show.
+    """
+    current_hashed = get_password_hash(user_id)
+    if current_hashed is None:
+        return "User not found in database."
+    if check_password(new_password, current_hashed):
+        return "New password cannot be the same as the old password."
+    if not update_password_hash(user_id, hash_password(new_password)):
+        return "Database connection error."
+    return None
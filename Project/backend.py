@@ -0,0 +1,103 @@
+"""
+Where the app's screens get their data from.
+
+MainApp holds one backend as main_app.backend and the screens call only that.
+LocalBackend runs each operation against the local database and QUIZ_DIR;
+RemoteBackend sends the same operation to a data service (data_service.py)
+through a ServiceClient. Both have the same methods, listed in OPERATIONS, plus
+sign_out() and close(), and every one of them may block, so call them from a
+worker thread.
+
+Teacher tools, account changes and quiz uploads work on the local database
+only; is_remote tells the screens to hide them.
+"""
+import os
+
+import auth
+import database
+import quiz_catalogue
+
+# The operations every backend provides.
+OPERATIONS = (
+    "authenticate", "sign_up", "record_quiz_result", "get_dashboard_data", "get_results_page", "count_results",
+    "get_quizzes_page", "count_quizzes", "search_quizzes", "load_quiz", "refresh_catalogue",
+    "begin_attempt", "save_attempt_time", "save_attempt_answer", "get_attempt_answers", "get_open_attempts",
+    "finish_attempt",
+)
+
+class LocalBackend:
+    is_remote = False
+    address = None
+
+    authenticate = staticmethod(auth.authenticate)
+    sign_up = staticmethod(auth.sign_up)
+    record_quiz_result = staticmethod(database.record_quiz_result)
+    get_dashboard_data = staticmethod(database.get_dashboard_data)
+    get_results_page = staticmethod(database.get_results_page)
+    count_results = staticmethod(database.count_results)
+    get_quizzes_page = staticmethod(quiz_catalogue.get_quizzes_page)
+    count_quizzes = staticmethod(quiz_catalogue.count_quizzes)
+    search_quizzes = staticmethod(quiz_catalogue.search_quizzes)
+    load_quiz = staticmethod(quiz_catalogue.load_quiz)
+    refresh_catalogue = staticmethod(quiz_catalogue.refresh_catalogue)
+    begin_attempt = staticmethod(database.begin_attempt)
+    save_attempt_time = staticmethod(database.save_attempt_time)
+    save_attempt_answer = staticmethod(database.save_attempt_answer)
+    get_attempt_answers = staticmethod(database.get_attempt_answers)
+    get_open_attempts = staticmethod(database.get_open_attempts)
+    finish_attempt = staticmethod(database.finish_attempt)
+
+    def sign_out(self):
+        pass
+
+    def close(self):
+        database.close_all_connections()
+
+def _remote(op):
+    def call(self, *args):
+        return self.client.call(op, *args)
+    call.__name__ = op
+    return call
+
+class RemoteBackend:
+    is_remote = True
+
+    def __init__(self, client):
+        self.client = client
+        self.address = client.address
+
+    authenticate = _remote("authenticate")
+    sign_up = _remote("sign_up")
+    record_quiz_result = _remote("record_quiz_result")
+    get_dashboard_data = _remote("get_dashboard_data")
+    get_results_page = _remote("get_results_page")
+    count_results = _remote("count_results")
+    get_quizzes_page = _remote("get_quizzes_page")
+    count_quizzes = _remote("count_quizzes")
+    search_quizzes = _remote("search_quizzes")
+    load_quiz = _remote("load_quiz")
+    refresh_catalogue = _remote("refresh_catalogue")
+    begin_attempt = _remote("begin_attempt")
+    save_attempt_time = _remote("save_attempt_time")
+    save_attempt_answer = _remote("save_attempt_answer")
+    get_attempt_answers = _remote("get_attempt_answers")
+    get_open_attempts = _remote("get_open_attempts")
+    finish_attempt = _remote("finish_attempt")
+
+    def sign_out(self):
+        self.client.logout()
+
+    def close(self):
+        # The service ends the session once its connections are closed.
+        self.client.close()
+
+def from_environment():
+    """
+    A RemoteBackend for the data service named by QUIZ_SERVER, otherwise a
+    LocalBackend.
+    """
+    if not os.environ.get("QUIZ_SERVER"):
+        return LocalBackend()
+    # Imported only in client mode, as it brings in asyncio.
+    import service_client
+    return RemoteBackend(service_client.connect_from_environment())
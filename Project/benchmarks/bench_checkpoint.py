@@ -0,0 +1,62 @@
+"""
+Quiz checkpoint benchmark.
+
+Fills a temporary database with open attempts and their journalled answers,
+then times database.save_attempt_answer(), the write made every time a student
+moves to the next question, against CHECKPOINT_BUDGET_MS.
+
+Run from the Project folder:
+    python benchmarks/bench_checkpoint.py [checkpoints]
+"""
+import os
+import sys
+import random
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import database
+
+# A checkpoint must not add more than this to moving on to the next question.
+CHECKPOINT_BUDGET_MS = 2.0
+
+USERS = 1000
+QUESTIONS = 20
+
+def build():
+    conn = database.get_db_connection()
+    with conn:
+        conn.executemany("INSERT INTO users (username, password, account_type) VALUES (?, 'x', 'Student')",
+                         [(f"student{i}",) for i in range(USERS)])
+    # Everyone is part-way through a quiz.
+    return [database.begin_attempt(user_id, "bench.json", 600_000)[0] for user_id in range(1, USERS + 1)]
+
+def main():
+    checkpoints = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "bench.db"))
+        database.create_database()
+        attempt_ids = build()
+        answered = dict.fromkeys(attempt_ids, 0)
+        times = []
+        for _ in range(checkpoints):
+            attempt_id = rng.choice(attempt_ids)
+            question = answered[attempt_id] % QUESTIONS
+            answered[attempt_id] += 1
+            start = time.perf_counter()
+            database.save_attempt_answer(attempt_id, question, rng.choice(["Paris", "London", "Berlin"]))
+            times.append((time.perf_counter() - start) * 1000)
+        database.close_all_connections()
+    times.sort()
+    p99 = times[int(len(times) * 0.99) - 1]
+    print(f"{checkpoints} checkpoints: mean {sum(times) / len(times):.3f} ms, "
+          f"median {times[len(times) // 2]:.3f} ms, p99 {p99:.3f} ms, max {times[-1]:.3f} ms")
+    if p99 > CHECKPOINT_BUDGET_MS:
+        print(f"p99 is over the {CHECKPOINT_BUDGET_MS} ms budget")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Micro-benchmark for the data layer connection handling.
+
+Compares the old pattern (open a new sqlite3 connection for every call, then
+close it) with the shared per-thread connection from database.py, for a write
+(record_quiz_result) and a read (get_all_results).
+
+Run from the Project folder:
+    python benchmarks/bench_db_connection.py [calls]
+"""
+import os
+import sys
+import json
+import datetime
+import sqlite3
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import database
+
+
+BENCH_USERS = """
+INSERT INTO users (username, password, account_type) VALUES ('writer', 'x', 'Student');
+INSERT INTO users (username, password, account_type) VALUES ('reader', 'x', 'Student');
+"""
+
+# Schema as it was when every call opened its own connection.
+LEGACY_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    account_type TEXT NOT NULL CHECK(account_type IN ('Student', 'Teacher'))
+);
+CREATE TABLE results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    attempt_date DATETIME NOT NULL,
+    correct_list TEXT NOT NULL,
+    total_questions INTEGER NOT NULL,
+    FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+""" + BENCH_USERS
+
+
+def legacy_record(db_path, user_id):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+    INSERT INTO results (user_id, attempt_date, correct_list, total_questions)
+    VALUES (?, ?, ?, ?)
+    """, (user_id, "2025-03-18 22:31:15", json.dumps({"correct_count": 1, "total_questions": 2}), 2))
+    conn.commit()
+    conn.close()
+
+
+def legacy_read(db_path, user_id):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+    SELECT id, user_id, attempt_date, correct_list, total_questions
+    FROM results
+    WHERE user_id = ?
+    ORDER BY attempt_date DESC;
+    """, (user_id,))
+    rows = cursor.fetchall()
+    conn.close()
+    processed = []
+    for row in rows:
+        try:
+            attempt_dt = datetime.datetime.strptime(row[2], "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+        processed.append((row[0], row[1], attempt_dt, row[3], row[4]))
+    return processed
+
+
+def time_per_call(func, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        pooled_path = os.path.join(tmp, "pooled.db")
+
+        # The legacy file is built with the original schema and the default
+        # rollback journal; the pooled one goes through create_database().
+        conn = sqlite3.connect(legacy_path)
+        conn.executescript(LEGACY_SCHEMA)
+        conn.close()
+        database.set_database_path(pooled_path)
+        database.create_database()
+        with database.get_db_connection() as conn:
+            conn.executescript(BENCH_USERS)
+
+        # Both get a reader with 20 results; writes go to the other user.
+        for _ in range(20):
+            legacy_record(legacy_path, 2)
+            database.record_quiz_result(2, 1, 2)
+
+        database.set_database_path(pooled_path)
+
+        rows = [
+            ("record_quiz_result", time_per_call(lambda: legacy_record(legacy_path, 1), calls),
+             time_per_call(lambda: database.record_quiz_result(1, 1, 2), calls)),
+            ("get_all_results", time_per_call(lambda: legacy_read(legacy_path, 2), calls),
+             time_per_call(lambda: database.get_all_results(2), calls)),
+        ]
+        database.close_all_connections()
+
+    print(f"{'operation':<22}{'per-call (us)':>16}{'pooled (us)':>14}{'speed-up':>10}")
+    for name, before, after in rows:
+        print(f"{name:<22}{before:>16.1f}{after:>14.1f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
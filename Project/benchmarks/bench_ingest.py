@@ -0,0 +1,62 @@
+"""
+Bulk ingestion benchmark.
+
+Writes a CSV of synthetic results, ingests it with ingest.ingest_results() into
+a temporary database and reports rows per second, next to the rate of calling
+record_quiz_result() once per row.
+
+Run from the Project folder:
+    python benchmarks/bench_ingest.py [rows]
+"""
+import os
+import sys
+import csv
+import random
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import database
+import ingest
+
+USERS = 500
+
+def write_csv(path, rows):
+    rng = random.Random(0)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(("username", "attempt_date", "correct_count", "total_questions"))
+        for i in range(rows):
+            total = rng.randint(5, 20)
+            writer.writerow((f"student{rng.randrange(USERS)}", f"2025-03-{rng.randint(1, 18):02d} 10:{i % 60:02d}:00",
+                             rng.randint(0, total), total))
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "results.csv")
+        write_csv(csv_path, rows)
+        database.set_database_path(os.path.join(tmp, "bench.db"))
+        database.create_database()
+        conn = database.get_db_connection()
+        with conn:
+            conn.executemany("INSERT INTO users (username, password, account_type) VALUES (?, 'x', 'Student')",
+                             [(f"student{i}",) for i in range(USERS)])
+
+        start = time.perf_counter()
+        report = ingest.ingest_results(ingest.read_results_file(csv_path))
+        bulk_rate = report["inserted"] / (time.perf_counter() - start)
+
+        calls = 2000
+        start = time.perf_counter()
+        for _ in range(calls):
+            database.record_quiz_result(1, 3, 5)
+        single_rate = calls / (time.perf_counter() - start)
+        database.close_all_connections()
+
+    print(f"ingest_results:      {bulk_rate:>10,.0f} rows/s ({report['inserted']} rows, {report['rejected']} rejected)")
+    print(f"record_quiz_result:  {single_rate:>10,.0f} rows/s")
+
+if __name__ == "__main__":
+    main()
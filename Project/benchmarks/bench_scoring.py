@@ -0,0 +1,62 @@
+"""
+Re-marking benchmark.
+
+Fills a temporary database with stored answers for one quiz, changes the
+answer key of some questions and times scoring.remark_quiz() over all of them.
+
+Run from the Project folder:
+    python benchmarks/bench_scoring.py [answers]
+"""
+import os
+import sys
+import random
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import database
+import scoring
+
+QUESTIONS = 20
+OPTIONS = ["Paris", "London", "Berlin", "Madrid"]
+
+def build(answers):
+    rng = random.Random(0)
+    quiz = {"questions": [{"question": f"Q{i}", "options": OPTIONS, "answer": rng.choice(OPTIONS)}
+                          for i in range(QUESTIONS)]}
+    conn = database.get_db_connection()
+    with conn:
+        conn.execute("INSERT INTO users (username, password, account_type) VALUES ('bench', 'x', 'Student')")
+        attempts = answers // QUESTIONS
+        for attempt in range(attempts):
+            given = [rng.choice(OPTIONS) + rng.choice(["", " "]) for _ in range(QUESTIONS)]
+            correct = scoring.score_answers(quiz, given)
+            cursor = conn.execute("""
+            INSERT INTO results (user_id, attempt_ts, correct_count, total_questions, quiz_file)
+            VALUES (1, ?, ?, ?, 'bench.json')
+            """, (1742336475 + attempt * 60, sum(correct), QUESTIONS))
+            conn.executemany("""
+            INSERT INTO result_answers (result_id, question_index, given_answer, is_correct)
+            VALUES (?, ?, ?, ?)
+            """, [(cursor.lastrowid, i, g, int(c)) for i, (g, c) in enumerate(zip(given, correct))])
+    return quiz
+
+def main():
+    answers = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "bench.db"))
+        database.create_database()
+        quiz = build(answers)
+        # Correct the key of every fourth question.
+        for q in quiz["questions"][::4]:
+            q["answer"] = OPTIONS[(OPTIONS.index(q["answer"]) + 1) % len(OPTIONS)]
+        start = time.perf_counter()
+        changed, results = scoring.remark_quiz("bench.json", quiz)
+        elapsed = time.perf_counter() - start
+        database.close_all_connections()
+    print(f"re-marked {answers} answers in {elapsed:.2f} s "
+          f"({changed} answers and {results} results changed)")
+
+if __name__ == "__main__":
+    main()
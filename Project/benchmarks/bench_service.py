@@ -0,0 +1,146 @@
+"""
+Data service load test.
+
+Starts data_service.DataService on a temporary database and quiz folder, then
+runs many simulated lab clients against it at once, each on its own thread
+with its own connection. Every client logs in; once all have, they
+repeatedly list quizzes, take one (journalling each answer), submit the result
+and open their dashboard. Reports per-operation latency, throughput after
+login, and how the server batched the result writes.
+
+Run from the Project folder:
+    python benchmarks/bench_service.py [--clients N] [--rounds M]
+"""
+import os
+import sys
+import random
+import argparse
+import asyncio
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import database
+import quiz_catalogue
+import synthetic_data
+from data_service import DataService
+from service_client import ServiceClient
+
+def start_service():
+    # The service runs its event loop on a thread of its own, as it would in
+    # its own process.
+    ready = threading.Event()
+    holder = {}
+
+    def run():
+        async def main():
+            holder["service"] = await DataService(port=0).start()
+            holder["loop"] = asyncio.get_running_loop()
+            ready.set()
+            await holder["service"].serve_forever()
+        try:
+            asyncio.run(main())
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    ready.wait()
+    return holder["service"], holder["loop"], thread
+
+def run_client(port, user_id, username, rounds, seed, timings, errors, logged_in):
+    rng = random.Random(seed)
+    client = ServiceClient("127.0.0.1", port)
+
+    def timed(op, *args):
+        start = time.perf_counter()
+        result = client.call(op, *args)
+        timings.setdefault(op, []).append(time.perf_counter() - start)
+        return result
+
+    try:
+        if timed("authenticate", username, synthetic_data.SYNTHETIC_PASSWORD) is None:
+            raise RuntimeError(f"login failed for {username}")
+        logged_in.wait()
+        for _ in range(rounds):
+            quizzes = timed("get_quizzes_page", None, 20)
+            quiz = timed("load_quiz", rng.choice(quizzes))
+            quiz_file = os.path.basename(quiz["file_path"])
+            attempt_id, _ = timed("begin_attempt", user_id, quiz_file, 600_000)
+            answers = []
+            for index, question in enumerate(quiz["questions"]):
+                given = question["answer"] if rng.random() < 0.7 else rng.choice(question["options"] or ["?"])
+                timed("save_attempt_answer", attempt_id, index, given)
+                answers.append((given, given == question["answer"]))
+            timed("record_quiz_result", user_id, sum(c for _, c in answers), len(answers), answers, quiz_file)
+            timed("finish_attempt", attempt_id)
+            timed("get_dashboard_data", user_id)
+    except Exception as e:
+        logged_in.abort()
+        errors.append(f"{username}: {e!r}")
+    finally:
+        client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=30)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "bench.db"))
+        quiz_catalogue.QUIZ_DIR = os.path.join(tmp, "quizzes")
+        database.create_database()
+        data = synthetic_data.generate(users=args.clients, quizzes=10, results=0)
+        conn = database.get_db_connection()
+        users = [(user_id, conn.execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()[0])
+                 for user_id in data["users"]]
+        database.close_all_connections()
+
+        service, loop, thread = start_service()
+        per_client = [{} for _ in users]
+        errors = []
+        logged_in = threading.Barrier(len(users) + 1)
+        clients = [threading.Thread(target=run_client, args=(service.port, user_id, username, args.rounds, i,
+                                                             per_client[i], errors, logged_in))
+                   for i, (user_id, username) in enumerate(users)]
+        start = time.perf_counter()
+        for client in clients:
+            client.start()
+        try:
+            logged_in.wait()
+        except threading.BrokenBarrierError:
+            pass
+        login_elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - start
+        stats = dict(service.stats)
+        asyncio.run_coroutine_threadsafe(service.stop(), loop).result()
+        thread.join(timeout=5)
+
+    timings = {}
+    for client_timings in per_client:
+        for op, values in client_timings.items():
+            timings.setdefault(op, []).extend(values)
+    requests = sum(len(values) for op, values in timings.items() if op != "authenticate")
+    print(f"{len(users)} clients logged in in {login_elapsed:.2f} s (bcrypt)")
+    print(f"{len(users)} clients x {args.rounds} rounds: {requests} requests in {elapsed:.2f} s "
+          f"({requests / elapsed:.0f} requests/s), {len(errors)} failed clients")
+    print(f"  {'operation':<22}{'count':>7}{'p50 ms':>10}{'p99 ms':>10}")
+    for op, values in sorted(timings.items()):
+        values.sort()
+        print(f"  {op:<22}{len(values):>7}{values[len(values) // 2] * 1000:>10.2f}"
+              f"{values[max(0, int(len(values) * 0.99) - 1)] * 1000:>10.2f}")
+    batches = stats["write_batches"]
+    print(f"results written: {stats['results_written']} in {batches} transactions "
+          f"(average {stats['results_written'] / max(batches, 1):.1f}, largest {stats['largest_batch']})")
+    for error in errors[:10]:
+        print("  " + error)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Start-up time benchmark.
+
+Measures, in fresh interpreters:
+  - the cumulative import time of Finalisedcode (python -X importtime) and
+    the slowest modules it pulls in, and
+  - time to first window: from launching the process until MainApp has been
+    created and drawn once (skipped when there is no display).
+
+Results are compared with benchmarks/results/startup.json; pass --save to
+record the current run as the new baseline.
+
+Run from the Project folder:
+    python benchmarks/bench_startup.py [--runs N] [--save]
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BASELINE_PATH = os.path.join(PROJECT_DIR, "benchmarks", "results", "startup.json")
+
+# A measurement this much slower than the baseline is reported as a regression.
+REGRESSION_TOLERANCE = 1.2
+
+FIRST_WINDOW_SCRIPT = """
+import time, tkinter
+import Finalisedcode
+try:
+    app = Finalisedcode.MainApp()
+except tkinter.TclError:
+    print("no-display")
+else:
+    app.update()
+    print(time.time())
+    app.destroy()
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def measure_imports():
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import Finalisedcode"],
+                            cwd=PROJECT_DIR, capture_output=True, text=True, check=True)
+    modules = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, name = int(match.group(2)), match.group(4)
+        modules[name] = cumulative
+        if name == "Finalisedcode":
+            total = cumulative
+    return total / 1000, modules
+
+def measure_first_window():
+    start = time.time()
+    result = subprocess.run([sys.executable, "-c", FIRST_WINDOW_SCRIPT],
+                            cwd=PROJECT_DIR, capture_output=True, text=True)
+    output = result.stdout.strip()
+    if result.returncode != 0 or not output or output == "no-display":
+        return None
+    return (float(output.splitlines()[-1]) - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--save", action="store_true", help="store this run as the baseline")
+    args = parser.parse_args()
+
+    import_times = []
+    modules = {}
+    for _ in range(args.runs):
+        total, modules = measure_imports()
+        import_times.append(total)
+    window_times = [t for t in (measure_first_window() for _ in range(args.runs)) if t is not None]
+
+    current = {"import_ms": statistics.median(import_times)}
+    if window_times:
+        current["first_window_ms"] = statistics.median(window_times)
+
+    print(f"import Finalisedcode: {current['import_ms']:.1f} ms (median of {args.runs})")
+    print("slowest imports (cumulative):")
+    top_level = {name: us for name, us in modules.items() if "." not in name and name != "Finalisedcode"}
+    for name, us in sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:8]:
+        print(f"  {name:<24}{us / 1000:>8.1f} ms")
+    if "first_window_ms" in current:
+        print(f"time to first window: {current['first_window_ms']:.1f} ms")
+    else:
+        print("time to first window: skipped (no display)")
+
+    if args.save:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"baseline saved to {BASELINE_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINE_PATH):
+        print("no baseline yet (run with --save to create one)")
+        return 0
+    with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressed = False
+    for key, value in current.items():
+        if key in baseline and value > baseline[key] * REGRESSION_TOLERANCE:
+            print(f"REGRESSION: {key} {value:.1f} ms vs baseline {baseline[key]:.1f} ms")
+            regressed = True
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
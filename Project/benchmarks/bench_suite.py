@@ -0,0 +1,132 @@
+"""
+Data layer and quiz catalogue benchmark suite.
+
+For each scale (number of results) a temporary database and quiz folder are
+filled by synthetic_data.generate() with a fixed seed, then these calls are
+timed:
+    record_quiz_result, last_five_days_attempts, get_dashboard_data,
+    get_all_results, get_all_users, get_all_quizzes
+
+Results are compared with benchmarks/results/suite.json; pass --save to record
+the current run as the new baseline.
+
+Run from the Project folder:
+    python benchmarks/bench_suite.py [--scales 1000 10000 100000 1000000] [--save]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import database
+import quiz_catalogue
+import synthetic_data
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BASELINE_PATH = os.path.join(PROJECT_DIR, "benchmarks", "results", "suite.json")
+
+DEFAULT_SCALES = (1_000, 10_000, 100_000)
+
+# A measurement this much slower than the baseline is reported as a regression.
+REGRESSION_TOLERANCE = 1.2
+
+# Each call is repeated until a batch takes at least this long, and the
+# median of REPEATS batches is reported.
+MIN_BATCH_SECONDS = 0.05
+REPEATS = 5
+
+def dataset_size(scale):
+    # Users, quizzes: about 50 results per user, quiz folder capped at 2000 files.
+    return max(10, scale // 50), min(max(10, scale // 100), 2_000)
+
+def time_call(func):
+    """
+    Milliseconds per call of func().
+    """
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        if time.perf_counter() - start >= MIN_BATCH_SECONDS or calls >= 10_000:
+            break
+        calls *= 2
+    batches = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        batches.append((time.perf_counter() - start) / calls * 1000)
+    return statistics.median(batches)
+
+def run_scale(scale, tmp):
+    database.set_database_path(os.path.join(tmp, f"suite_{scale}.db"))
+    quiz_catalogue.QUIZ_DIR = os.path.join(tmp, f"quizzes_{scale}")
+    database.create_database()
+    users, quizzes = dataset_size(scale)
+    start = time.perf_counter()
+    data = synthetic_data.generate(users, quizzes, scale, seed=scale, answers=False)
+    print(f"  generated {users} users, {quizzes} quizzes, {scale} results "
+          f"in {time.perf_counter() - start:.1f} s")
+
+    user_id = data["users"][len(data["users"]) // 2]
+    timings = {
+        "last_five_days_attempts": time_call(lambda: database.last_five_days_attempts(user_id)),
+        "get_dashboard_data": time_call(lambda: database.get_dashboard_data(user_id)),
+        "get_all_results": time_call(lambda: database.get_all_results(user_id)),
+        "get_all_users": time_call(database.get_all_users),
+        "get_all_quizzes": time_call(quiz_catalogue.get_all_quizzes),
+        # Last, so the rows it adds do not change what the reads see.
+        "record_quiz_result": time_call(lambda: database.record_quiz_result(user_id, 7, 10)),
+    }
+    database.close_all_connections()
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--save", action="store_true", help="store this run as the baseline")
+    args = parser.parse_args()
+
+    current = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            print(f"scale {scale}:")
+            timings = run_scale(scale, tmp)
+            for name, ms in timings.items():
+                print(f"  {name:<26}{ms:>10.3f} ms/call")
+            current[str(scale)] = timings
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(current)
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"baseline saved to {BASELINE_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINE_PATH):
+        print("no baseline yet (run with --save to create one)")
+        return 0
+    with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressed = False
+    for scale, timings in current.items():
+        for name, ms in timings.items():
+            before = baseline.get(scale, {}).get(name)
+            if before is not None and ms > before * REGRESSION_TOLERANCE:
+                print(f"REGRESSION at {scale}: {name} {ms:.3f} ms vs baseline {before:.3f} ms")
+                regressed = True
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
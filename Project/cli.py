@@ -0,0 +1,304 @@
+"""
+Command-line entry point for running the data layer without a display.
+
+Run from the Project folder:
+    python -m cli stats [--user NAME]
+    python -m cli import-quizzes PATH [PATH ...] [--replace]
+    python -m cli export-results [--user NAME] [--from DATE] [--to DATE] [--output FILE]
+    python -m cli remark QUIZ_FILE
+    python -m cli item-analysis [QUIZ_FILE] [--flagged]
+    python -m cli bench [--results N]
+    python -m cli generate --users N --quizzes M --results K [--seed S]
+    python -m cli ingest-results FILE [--format csv|jsonl]
+    python -m cli serve [--host HOST] [--port PORT]
+    python -m cli calibrate-bcrypt [--budget-ms MS]
+
+Every command accepts --db PATH to use another database file. Nothing here
+imports Tk, so it runs on machines without an X server.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import datetime
+
+import database
+import quiz_catalogue
+from database import create_database, record_quiz_result, get_dashboard_data, get_all_results
+from quiz_catalogue import (QUIZ_DIR, QUARANTINE_DIR, ensure_quiz_dir, get_all_quizzes, index_quiz_file, load_quiz,
+                            check_quiz_file, refresh_catalogue, count_quizzes)
+
+def _find_user(username):
+    row = database.get_user_by_username(username)
+    if row is None:
+        print(f"No user called {username!r}.", file=sys.stderr)
+    return row
+
+def cmd_stats(args):
+    conn = database.get_db_connection()
+    users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    results = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    print(f"users:   {users}")
+    print(f"results: {results}")
+    # Invalid quiz files are skipped but left in place: stats only reads.
+    refresh_catalogue(quarantine=False)
+    print(f"quizzes: {count_quizzes()}")
+    if args.user:
+        user = _find_user(args.user)
+        if user is None:
+            return 1
+        data = get_dashboard_data(user[0])
+        print(f"\nlast {database.DASHBOARD_DAYS} days for {user[1]}:")
+        # Every day is present, with zeros when nothing was attempted.
+        if not sum(day["attempts"] for day in data.values()):
+            print("  no attempts")
+            return 0
+        for day in sorted(data):
+            print(f"  {day.isoformat()}  {data[day]['attempts']:>4} attempts  {data[day]['avg_percentage']:6.1f}%")
+    return 0
+
+def _quiz_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(".json"):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+def cmd_import_quizzes(args):
+    ensure_quiz_dir()
+    imported = skipped = 0
+    for path in _quiz_files(args.paths):
+        dest_path = os.path.join(QUIZ_DIR, os.path.basename(path))
+        if os.path.exists(dest_path) and not args.replace:
+            print(f"skipped {path}: a quiz with this name already exists")
+            skipped += 1
+            continue
+        try:
+            _, errors = check_quiz_file(path)
+            if not errors:
+                shutil.copyfile(path, dest_path)
+        except OSError as e:
+            errors = [str(e)]
+        if errors:
+            print(f"skipped {path}: {'; '.join(errors)}")
+            skipped += 1
+            continue
+        index_quiz_file(dest_path)
+        imported += 1
+    print(f"imported {imported} quizzes, skipped {skipped}")
+    return 0 if imported or not skipped else 1
+
+def _date(text):
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {text!r}")
+
+def cmd_export_results(args):
+    from export import export_results
+    user_id = None
+    if args.user:
+        user = _find_user(args.user)
+        if user is None:
+            return 1
+        user_id = user[0]
+    output = args.output or "-"
+    if args.format == "parquet" and output == "-":
+        print("Parquet export needs --output.", file=sys.stderr)
+        return 1
+
+    def progress(done, total):
+        if output != "-":
+            print(f"\r{done}/{total} results", end="", file=sys.stderr, flush=True)
+
+    try:
+        rows = export_results(output, args.format, args.start, args.end, user_id, progress)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if output != "-":
+        print(f"\nexported {rows} results to {output}", file=sys.stderr)
+    return 0
+
+def cmd_remark(args):
+    import scoring
+    quiz_file = os.path.basename(args.quiz_file)
+    quiz = load_quiz({"file_path": os.path.join(QUIZ_DIR, quiz_file)})
+    if quiz is None:
+        return 1
+    changed, results = scoring.remark_quiz(quiz_file, quiz)
+    print(f"{changed} answers changed across {results} results")
+    return 0
+
+def cmd_item_analysis(args):
+    from analytics import get_item_analysis
+    items = get_item_analysis(os.path.basename(args.quiz_file) if args.quiz_file else None)
+    if args.flagged:
+        items = [item for item in items if item["flag"]]
+    print(f"{'quiz':<30} {'q':>3} {'attempts':>8} {'facility':>8} {'discr.':>6}  flag")
+    for item in items:
+        facility = f"{item['facility'] * 100:.0f}%" if item["facility"] is not None else "-"
+        discrimination = f"{item['discrimination']:.2f}" if item["discrimination"] is not None else "-"
+        print(f"{item['quiz_name'][:30]:<30} {item['question_index'] + 1:>3} {item['attempts']:>8} "
+              f"{facility:>8} {discrimination:>6}  {item['flag']}")
+        for option, chosen in item["answers"]:
+            print(f"{'':<34}{chosen:>8}  {option}")
+    return 0
+
+def _time_ms(func, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1000
+
+def _positive_int(text):
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive whole number, got {text!r}")
+    return value
+
+def cmd_bench(args):
+    # Runs against a throwaway database and a copy of the quiz folder, so the
+    # real ones are never touched (refreshing the catalogue quarantines files).
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "bench.db"))
+        quiz_catalogue.QUIZ_DIR = os.path.join(tmp, "quizzes")
+        if os.path.isdir(QUIZ_DIR):
+            shutil.copytree(QUIZ_DIR, quiz_catalogue.QUIZ_DIR, ignore=shutil.ignore_patterns(QUARANTINE_DIR))
+        create_database()
+        conn = database.get_db_connection()
+        with conn:
+            conn.execute("INSERT INTO users (username, password, account_type) VALUES ('bench', 'x', 'Student')")
+        user_id = conn.execute("SELECT id FROM users WHERE username = 'bench'").fetchone()[0]
+        start = time.perf_counter()
+        for i in range(args.results):
+            record_quiz_result(user_id, i % 11, 10)
+        record_ms = (time.perf_counter() - start) / args.results * 1000
+        timings = [
+            ("record_quiz_result", record_ms),
+            ("get_dashboard_data", _time_ms(lambda: get_dashboard_data(user_id), 100)),
+            ("get_all_results", _time_ms(lambda: get_all_results(user_id), 10)),
+            ("get_all_quizzes", _time_ms(get_all_quizzes, 10)),
+        ]
+        quizzes = len(get_all_quizzes())
+        database.close_all_connections()
+        quiz_catalogue.QUIZ_DIR = QUIZ_DIR
+    print(f"{args.results} results, {quizzes} quizzes in {QUIZ_DIR}")
+    for name, ms in timings:
+        print(f"  {name:<22}{ms:>10.3f} ms/call")
+    return 0
+
+def cmd_generate(args):
+    import synthetic_data
+    start = time.perf_counter()
+    data = synthetic_data.generate(args.users, args.quizzes, args.results, seed=args.seed, days=args.days,
+                                   answers=not args.no_answers)
+    print(f"created {len(data['users'])} users, {len(data['quizzes'])} quizzes and {args.results} results "
+          f"in {time.perf_counter() - start:.1f} s")
+    return 0
+
+def cmd_ingest_results(args):
+    from ingest import read_results_file, ingest_results
+    start = time.perf_counter()
+    report = ingest_results(read_results_file(args.file, args.format))
+    elapsed = time.perf_counter() - start
+    for row_number, reason in report["errors"]:
+        print(f"row {row_number}: {reason}", file=sys.stderr)
+    print(f"inserted {report['inserted']} results, rejected {report['rejected']} "
+          f"({report['inserted'] / max(elapsed, 1e-9):,.0f} rows/s)")
+    return 1 if report["rejected"] else 0
+
+def cmd_serve(args):
+    import data_service
+    data_service.serve(args.host, args.port)
+    return 0
+
+def cmd_calibrate_bcrypt(args):
+    import auth
+    cost, expected_ms = auth.calibrate(args.budget_ms)
+    print(f"bcrypt cost {cost} (about {expected_ms:.0f} ms per hash, budget {auth.latency_budget_ms()} ms)")
+    conn = database.get_db_connection()
+    outdated = sum(1 for (hashed,) in conn.execute("SELECT password FROM users") if auth.hash_cost(hashed) != cost)
+    print(f"{outdated} password hashes use another cost and will be rehashed at their next login")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Quiz platform tools that need no display.")
+    parser.add_argument("--db", help=f"database file (default {database.DB_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    stats = commands.add_parser("stats", help="counts, and a user's dashboard figures")
+    stats.add_argument("--user", help="username to show dashboard data for")
+    stats.set_defaults(func=cmd_stats)
+
+    import_quizzes = commands.add_parser("import-quizzes", help=f"copy quiz JSON files into {QUIZ_DIR}")
+    import_quizzes.add_argument("paths", nargs="+", help="quiz files or folders of them")
+    import_quizzes.add_argument("--replace", action="store_true", help="overwrite quizzes with the same name")
+    import_quizzes.set_defaults(func=cmd_import_quizzes)
+
+    export_results = commands.add_parser("export-results", help="write results as CSV or Parquet")
+    export_results.add_argument("--user", help="only this user's results")
+    export_results.add_argument("--from", dest="start", type=_date, help="first day to include (YYYY-MM-DD)")
+    export_results.add_argument("--to", dest="end", type=_date, help="last day to include (YYYY-MM-DD)")
+    export_results.add_argument("--format", choices=("csv", "parquet"), help="default: from the file extension")
+    export_results.add_argument("--output", "-o", help="file to write (default stdout, CSV only)")
+    export_results.set_defaults(func=cmd_export_results)
+
+    remark = commands.add_parser("remark", help="re-mark stored answers after a quiz's answers changed")
+    remark.add_argument("quiz_file", help=f"quiz file name in {QUIZ_DIR}")
+    remark.set_defaults(func=cmd_remark)
+
+    item_analysis = commands.add_parser("item-analysis", help="facility and discrimination of each question")
+    item_analysis.add_argument("quiz_file", nargs="?", help=f"quiz file name in {QUIZ_DIR} (default: all quizzes)")
+    item_analysis.add_argument("--flagged", action="store_true", help="only questions flagged as a problem")
+    item_analysis.set_defaults(func=cmd_item_analysis)
+
+    bench = commands.add_parser("bench", help="time the main data layer calls on a temporary database")
+    bench.add_argument("--results", type=_positive_int, default=1000, help="results to insert first")
+    bench.set_defaults(func=cmd_bench)
+
+    generate = commands.add_parser("generate", help="add seeded synthetic users, quizzes and results")
+    generate.add_argument("--users", type=int, default=100)
+    generate.add_argument("--quizzes", type=int, default=20)
+    generate.add_argument("--results", type=int, default=5000)
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--days", type=int, default=30, help="spread results over this many days")
+    generate.add_argument("--no-answers", action="store_true", help="do not store per-question answers")
+    generate.set_defaults(func=cmd_generate)
+
+    ingest_results = commands.add_parser("ingest-results", help="bulk insert results from CSV or JSON lines")
+    ingest_results.add_argument("file", help="results file, or - for stdin")
+    ingest_results.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension")
+    ingest_results.set_defaults(func=cmd_ingest_results)
+
+    serve = commands.add_parser("serve", help="run the data service for lab clients (QUIZ_SERVER=HOST:PORT)")
+    serve.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 for every interface; "
+                       "trusted school network only, traffic is not encrypted)")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.set_defaults(func=cmd_serve)
+
+    calibrate = commands.add_parser("calibrate-bcrypt", help="pick the bcrypt cost that fits a login time budget")
+    calibrate.add_argument("--budget-ms", type=int, help="time one hash may take (default: the stored budget)")
+    calibrate.set_defaults(func=cmd_calibrate_bcrypt)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.db:
+        database.set_database_path(args.db)
+    if args.command != "bench":
+        create_database()
+    try:
+        return args.func(args)
+    finally:
+        database.close_all_connections()
+
+if __name__ == "__main__":
+    sys.exit(main())
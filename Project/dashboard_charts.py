@@ -0,0 +1,180 @@
+import os
+import hashlib
+
+import customtkinter as ctk
+
+from instrumentation import timed
+from tasks import submit
+
+CHART_BG = "#222222"
+
+# PNG copies of the last charts drawn for each user. When a user's daily stats
+# have not changed, a cold open shows these instead of starting matplotlib.
+SNAPSHOT_DIR = os.path.join(".cache", "charts")
+
+# How often, and how many times, save_snapshot() looks again for charts that
+# have not been drawn yet.
+SNAPSHOT_RETRY_MS = 200
+SNAPSHOT_RETRIES = 10
+
+def _style_axes(fig, ax, title, ylabel):
+    fig.patch.set_facecolor(CHART_BG)
+    ax.set_facecolor(CHART_BG)
+    for spine in ax.spines.values():
+        spine.set_color("white")
+    ax.set_title(title, fontname="Segoe UI", fontsize=14, color="white")
+    ax.set_xlabel("Date", fontname="Segoe UI", fontsize=12, color="white")
+    ax.set_ylabel(ylabel, fontname="Segoe UI", fontsize=12, color="white")
+    ax.tick_params(axis='x', colors='white')
+    ax.tick_params(axis='y', colors='white')
+
+def _write_snapshot(key, paths, images):
+    # Runs on a worker thread. images holds ((width, height), RGBA bytes) per chart.
+    from PIL import Image
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        # Only the latest snapshot per user is kept.
+        for name in os.listdir(SNAPSHOT_DIR):
+            if name.startswith(f"{key}_"):
+                os.remove(os.path.join(SNAPSHOT_DIR, name))
+        for path, (size, pixels) in zip(paths, images):
+            Image.frombuffer("RGBA", size, pixels, "raw", "RGBA", 0, 1).save(path)
+    except OSError as e:
+        print(f"Could not save dashboard snapshot: {e}")
+
+class DashboardCharts:
+    """
+    The "Attempts per Day" and "Average Score (%) per Day" charts. The figures
+    are built once and later updates only change the bar heights and line data,
+    then redraw with draw_idle().
+    """
+    def __init__(self, master):
+        self.master = master
+        self.canvases = None
+        self.snapshot_labels = []
+        self.shown = None  # (key, signature) of what is on screen
+
+    @staticmethod
+    def signature(data):
+        return repr([(day.isoformat(), data[day]["attempts"], round(data[day]["avg_percentage"], 4))
+                     for day in sorted(data)])
+
+    def snapshot_paths(self, key, signature):
+        digest = hashlib.sha1(signature.encode("utf-8")).hexdigest()[:16]
+        return [os.path.join(SNAPSHOT_DIR, f"{key}_{digest}_{name}.png") for name in ("attempts", "scores")]
+
+    def show(self, key, data):
+        """
+        Displays the charts for `data` ({date: {"attempts", "avg_percentage"}}).
+        `key` identifies whose data it is (the user id).
+        """
+        signature = self.signature(data)
+        if self.shown == (key, signature):
+            return  # Already on screen, nothing to redraw.
+        self.shown = (key, signature)
+        if self.canvases is None and self.show_snapshot(key, signature):
+            return
+        self.draw(data)
+        self.master.after_idle(lambda: self.save_snapshot(key, signature))
+
+    def hide(self):
+        self.shown = None
+        for label in self.snapshot_labels:
+            label.pack_forget()
+        if self.canvases is not None:
+            for canvas in self.canvases:
+                canvas.get_tk_widget().pack_forget()
+
+    def show_snapshot(self, key, signature):
+        paths = self.snapshot_paths(key, signature)
+        if not all(os.path.exists(path) for path in paths):
+            return False
+        from PIL import Image
+        for label in self.snapshot_labels:
+            label.destroy()
+        self.snapshot_labels = []
+        for path, side in zip(paths, ("left", "right")):
+            with Image.open(path) as img:
+                img.load()
+                image = ctk.CTkImage(light_image=img.copy(), size=img.size)
+            label = ctk.CTkLabel(self.master, image=image, text="")
+            label.pack(side=side, fill="both", expand=True, padx=5, pady=5)
+            self.snapshot_labels.append(label)
+        return True
+
+    def build(self):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+
+        self.attempts_fig = Figure(figsize=(5, 4), dpi=100)
+        self.attempts_ax = self.attempts_fig.add_subplot(111)
+        _style_axes(self.attempts_fig, self.attempts_ax, "Attempts per Day", "Attempts")
+        self.bars = None
+
+        self.scores_fig = Figure(figsize=(5, 4), dpi=100)
+        self.scores_ax = self.scores_fig.add_subplot(111)
+        _style_axes(self.scores_fig, self.scores_ax, "Average Score (%) per Day", "Avg %")
+        self.score_line, = self.scores_ax.plot([], [], marker='o', color='darkgreen')
+
+        self.canvases = [FigureCanvasTkAgg(self.attempts_fig, master=self.master),
+                         FigureCanvasTkAgg(self.scores_fig, master=self.master)]
+        # draw_idle() renders later through canvas.draw(), so time that too.
+        for canvas in self.canvases:
+            canvas.draw = timed("dashboard.render")(canvas.draw)
+
+    @timed("dashboard.update")
+    def draw(self, data):
+        if self.canvases is None:
+            self.build()
+            first_draw = True
+        else:
+            first_draw = False
+        for label in self.snapshot_labels:
+            label.destroy()
+        self.snapshot_labels = []
+
+        sorted_dates = sorted(data)
+        positions = list(range(len(sorted_dates)))
+        date_labels = [d.strftime("%m-%d") for d in sorted_dates]
+        attempts = [data[d]["attempts"] for d in sorted_dates]
+        percentages = [data[d]["avg_percentage"] for d in sorted_dates]
+
+        # Bars are only recreated when the number of days changes.
+        if self.bars is not None and len(self.bars) == len(attempts):
+            for bar, height in zip(self.bars, attempts):
+                bar.set_height(height)
+        else:
+            if self.bars is not None:
+                self.bars.remove()
+            self.bars = self.attempts_ax.bar(positions, attempts, color='royalblue')
+        self.score_line.set_data(positions, percentages)
+
+        for ax in (self.attempts_ax, self.scores_ax):
+            ax.set_xticks(positions, date_labels)
+            ax.relim()
+            ax.autoscale_view()
+        if first_draw:
+            self.attempts_fig.tight_layout()
+            self.scores_fig.tight_layout()
+
+        for canvas, side in zip(self.canvases, ("left", "right")):
+            widget = canvas.get_tk_widget()
+            if not widget.winfo_ismapped():
+                widget.pack(side=side, fill="both", expand=True, padx=5, pady=5)
+            canvas.draw_idle()
+
+    def save_snapshot(self, key, signature, retries=SNAPSHOT_RETRIES):
+        # Copies the pixels the canvases have already rendered rather than
+        # rendering the figures again with savefig(); the PNGs are encoded
+        # and written on a worker thread.
+        if self.canvases is None or self.shown != (key, signature):
+            return
+        if any(canvas.figure.stale for canvas in self.canvases):
+            if retries:
+                self.master.after(SNAPSHOT_RETRY_MS, lambda: self.save_snapshot(key, signature, retries - 1))
+            return
+        images = []
+        for canvas in self.canvases:
+            renderer = canvas.get_renderer()
+            images.append(((int(renderer.width), int(renderer.height)), bytes(renderer.buffer_rgba())))
+        submit(_write_snapshot, key, self.snapshot_paths(key, signature), images)
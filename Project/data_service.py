@@ -0,0 +1,379 @@
+"""
+Local data service: one process owns users.db and the quiz catalogue and the
+desktop clients talk to it over a socket, instead of every lab PC opening the
+database file on a shared drive.
+
+The protocol is JSON lines over TCP. A request is
+    {"id": n, "op": "get_dashboard_data", "args": [...]}
+and its response
+    {"id": n, "ok": true, "result": ...}  or  {"id": n, "ok": false, "error": "...", "type": "..."}.
+Dates, datetimes and dicts with non-string keys are tagged by encode() so
+they arrive as the same Python values.
+
+A successful authenticate response also carries "session", a token the
+client sends with every later request as {"session": ...}. Apart from logging
+in and signing up, requests need a session, and a user id or attempt id in
+their arguments must belong to the user who logged in. A session ends on
+"logout", once every connection that used it has closed, or after
+SESSION_TTL seconds without a request. Quizzes are only read from QUIZ_DIR,
+which the service rescans itself; only teachers may ask for a rescan. Traffic is not encrypted, so run the service on the school's
+own network, not one open to the internet.
+
+Reads run on a pool of threads, each with its own database connection, and
+logins on a separate pool so slow bcrypt checks never hold up the other
+reads. Writes go through a single writer thread; record_quiz_result requests that arrive
+while a write is in progress are committed together in one transaction.
+
+Start it from the Project folder with
+    python -m cli serve [--host HOST] [--port PORT]
+and point the app at it with QUIZ_SERVER=HOST:PORT (see service_client.py).
+"""
+import os
+import time
+import asyncio
+import secrets
+import sqlite3
+import datetime
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import auth
+import database
+import quiz_catalogue
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Threads serving read requests, and login requests (bcrypt).
+READ_WORKERS = 8
+AUTH_WORKERS = 4
+
+# Most results committed in one transaction.
+MAX_WRITE_BATCH = 500
+
+# Requests longer than this are refused rather than buffered.
+MAX_REQUEST_BYTES = 1024 * 1024
+
+# Seconds a session may go without a request before it has to log in again.
+SESSION_TTL = 8 * 60 * 60
+
+# Seconds between the service's own rescans of QUIZ_DIR.
+CATALOGUE_REFRESH_INTERVAL = 5 * 60
+
+def load_quiz(quiz):
+    # Clients name a quiz by its file; only files in QUIZ_DIR are opened.
+    name = os.path.basename(str(quiz.get("file_path", "")))
+    if not name.endswith(".json"):
+        return None
+    return quiz_catalogue.load_quiz({"file_path": os.path.join(quiz_catalogue.QUIZ_DIR, name)})
+
+AUTH_OPERATIONS = {
+    "authenticate": auth.authenticate,
+}
+
+READ_OPERATIONS = {
+    "get_dashboard_data": database.get_dashboard_data,
+    "get_results_page": database.get_results_page,
+    "count_results": database.count_results,
+    "get_quizzes_page": quiz_catalogue.get_quizzes_page,
+    "count_quizzes": quiz_catalogue.count_quizzes,
+    "search_quizzes": quiz_catalogue.search_quizzes,
+    "load_quiz": load_quiz,
+    "get_attempt_answers": database.get_attempt_answers,
+    "get_open_attempts": database.get_open_attempts,
+}
+
+# Run one at a time on the writer thread. record_quiz_result is batched
+# separately. sign_up hashes the password first, on the auth pool.
+WRITE_OPERATIONS = {
+    "refresh_catalogue": quiz_catalogue.refresh_catalogue,
+    "begin_attempt": database.begin_attempt,
+    "save_attempt_time": database.save_attempt_time,
+    "save_attempt_answer": database.save_attempt_answer,
+    "finish_attempt": database.finish_attempt,
+}
+
+# Operations that can be called before logging in.
+PUBLIC_OPERATIONS = {"authenticate", "sign_up", "logout"}
+
+# Operations only a teacher's session may call. refresh_catalogue quarantines
+# invalid quiz files.
+TEACHER_OPERATIONS = {"refresh_catalogue"}
+
+# Operations whose first argument is a user id, or an attempt id, that must
+# belong to the logged-in user.
+USER_OPERATIONS = {"get_dashboard_data", "get_results_page", "count_results", "get_open_attempts",
+                   "begin_attempt", "record_quiz_result"}
+ATTEMPT_OPERATIONS = {"save_attempt_time", "save_attempt_answer", "finish_attempt", "get_attempt_answers"}
+
+# -------------------- Encoding --------------------
+
+def encode(value):
+    if isinstance(value, datetime.datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"$date": value.isoformat()}
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: encode(item) for key, item in value.items()}
+        return {"$map": [[encode(key), encode(item)] for key, item in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    return value
+
+def decode(value):
+    if isinstance(value, dict):
+        if "$datetime" in value:
+            return datetime.datetime.fromisoformat(value["$datetime"])
+        if "$date" in value:
+            return datetime.date.fromisoformat(value["$date"])
+        if "$map" in value:
+            return {decode(key): decode(item) for key, item in value["$map"]}
+        return {key: decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    return value
+
+def dump_message(message):
+    return (json.dumps(encode(message), separators=(",", ":")) + "\n").encode("utf-8")
+
+def load_message(line):
+    return decode(json.loads(line))
+
+# -------------------- Server --------------------
+
+def _record_batch(batch):
+    """
+    Writes a batch of record_quiz_result argument lists. Returns one
+    (ok, result or exception) per entry. If the shared transaction fails, the
+    entries are retried one by one so a single bad submission only fails itself.
+    """
+    try:
+        ok = database.record_quiz_results(batch)
+        return [(True, ok)] * len(batch)
+    except sqlite3.Error:
+        outcomes = []
+        for args in batch:
+            try:
+                outcomes.append((True, database.record_quiz_results([args])))
+            except sqlite3.Error as e:
+                outcomes.append((False, e))
+        return outcomes
+
+class DataService:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self.readers = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="service-read")
+        self.authenticators = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="service-auth")
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="service-write")
+        self.pending_results = None
+        self.server = None
+        self.sessions = {}
+        self.stats = {"requests": 0, "errors": 0, "write_batches": 0, "results_written": 0, "largest_batch": 0}
+
+    async def start(self):
+        self.pending_results = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        # The catalogue is scanned once up front so the first clients do not wait for it.
+        await loop.run_in_executor(self.writer, quiz_catalogue.refresh_catalogue)
+        # Logins are hashed here, so the bcrypt cost is calibrated for this host.
+        await loop.run_in_executor(self.writer, auth.ensure_calibrated)
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port, limit=MAX_REQUEST_BYTES)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.batcher = asyncio.create_task(self.write_results())
+        self.refresher = asyncio.create_task(self.rescan_catalogue())
+        return self
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.batcher.cancel()
+        self.refresher.cancel()
+        self.readers.shutdown(wait=True)
+        self.authenticators.shutdown(wait=True)
+        self.writer.submit(database.close_all_connections)
+        self.writer.shutdown(wait=True)
+
+    async def handle_client(self, reader, writer):
+        # Requests from one client are answered as they finish, possibly out of
+        # order; the id says which request a response belongs to. The sessions
+        # used on this connection are released when it closes.
+        tasks = set()
+        tokens = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break  # Over the size limit, or the client went away.
+                if not line:
+                    break
+                task = asyncio.create_task(self.answer(line, writer, tokens))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+            for token in tokens:
+                self.release_session(token)
+
+    async def answer(self, line, writer, tokens):
+        request_id = None
+        try:
+            request = load_message(line)
+            request_id = request.get("id")
+            op, args = request["op"], request.get("args", [])
+            token = request.get("session")
+            session = self.get_session(token)
+            if session is not None:
+                self.attach_session(token, tokens)
+            await self.check_access(op, args, session)
+            if op == "logout":
+                result = self.end_session(token)
+            else:
+                result = await self.call(op, args)
+            response = {"id": request_id, "ok": True, "result": result}
+            if op == "authenticate" and result is not None:
+                response["session"] = self.start_session(result, tokens)
+        except Exception as e:
+            self.stats["errors"] += 1
+            response = {"id": request_id, "ok": False, "error": str(e), "type": type(e).__name__}
+        self.stats["requests"] += 1
+        try:
+            writer.write(dump_message(response))
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    def start_session(self, user, tokens):
+        now = time.monotonic()
+        for token in [token for token, session in self.sessions.items() if session["expires"] <= now]:
+            del self.sessions[token]
+        token = secrets.token_urlsafe(24)
+        self.sessions[token] = {"user_id": user["id"], "account_type": user["account_type"],
+                                "expires": now + SESSION_TTL, "connections": 0}
+        self.attach_session(token, tokens)
+        return token
+
+    def get_session(self, token):
+        # The session for a token, if it has not expired; using it extends it.
+        session = self.sessions.get(token)
+        if session is None:
+            return None
+        now = time.monotonic()
+        if session["expires"] <= now:
+            del self.sessions[token]
+            return None
+        session["expires"] = now + SESSION_TTL
+        return session
+
+    def attach_session(self, token, tokens):
+        # Counts each connection that uses the session once.
+        if token not in tokens:
+            tokens.add(token)
+            self.sessions[token]["connections"] += 1
+
+    def release_session(self, token):
+        session = self.sessions.get(token)
+        if session is not None:
+            session["connections"] -= 1
+            if session["connections"] <= 0:
+                del self.sessions[token]
+
+    def end_session(self, token):
+        return self.sessions.pop(token, None) is not None
+
+    async def check_access(self, op, args, session):
+        """
+        Raises PermissionError unless the session's user may make this request.
+        """
+        if op in PUBLIC_OPERATIONS:
+            return
+        if session is None:
+            raise PermissionError("Log in first.")
+        if op in TEACHER_OPERATIONS and session["account_type"] != "Teacher":
+            raise PermissionError(f"{op} is only allowed for teachers.")
+        user_id = session["user_id"]
+        if op in USER_OPERATIONS:
+            owner = args[0] if args else None
+        elif op in ATTEMPT_OPERATIONS:
+            loop = asyncio.get_running_loop()
+            owner = await loop.run_in_executor(self.readers, database.get_attempt_user, args[0] if args else None)
+        else:
+            return
+        if owner != user_id:
+            raise PermissionError(f"{op} is only allowed for your own account.")
+
+    async def call(self, op, args):
+        loop = asyncio.get_running_loop()
+        if op == "record_quiz_result":
+            future = loop.create_future()
+            await self.pending_results.put((args, future))
+            return await future
+        if op == "sign_up":
+            username, password, account_type = args
+            hashed = await loop.run_in_executor(self.authenticators, auth.hash_password, password)
+            return await loop.run_in_executor(self.writer, database.insert_user, username, hashed, account_type)
+        if op in AUTH_OPERATIONS:
+            return await loop.run_in_executor(self.authenticators, AUTH_OPERATIONS[op], *args)
+        if op in READ_OPERATIONS:
+            return await loop.run_in_executor(self.readers, READ_OPERATIONS[op], *args)
+        if op in WRITE_OPERATIONS:
+            return await loop.run_in_executor(self.writer, WRITE_OPERATIONS[op], *args)
+        if op == "stats":
+            return dict(self.stats)
+        raise ValueError(f"Unknown operation {op!r}")
+
+    async def rescan_catalogue(self):
+        # Picks up quiz files added to QUIZ_DIR on the server while it runs.
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(CATALOGUE_REFRESH_INTERVAL)
+            try:
+                await loop.run_in_executor(self.writer, quiz_catalogue.refresh_catalogue)
+            except Exception as e:
+                print("Catalogue refresh failed:", e)
+
+    async def write_results(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.pending_results.get()]
+            # Everything that queued up while the previous batch was being
+            # written goes into this one.
+            while len(batch) < MAX_WRITE_BATCH and not self.pending_results.empty():
+                batch.append(self.pending_results.get_nowait())
+            try:
+                outcomes = await loop.run_in_executor(self.writer, _record_batch,
+                                                      [tuple(args) + (None,) * (6 - len(args)) for args, _ in batch])
+            except Exception as e:
+                outcomes = [(False, e)] * len(batch)
+            self.stats["write_batches"] += 1
+            self.stats["results_written"] += sum(1 for ok, _ in outcomes if ok)
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            for (_, future), (ok, value) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    async def main():
+        service = await DataService(host, port).start()
+        print(f"Serving {database.DB_PATH} on {service.host}:{service.port}")
+        try:
+            await service.serve_forever()
+        finally:
+            await service.stop()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,882 @@
+import sqlite3
+import threading
+import itertools
+import datetime
+import json
+
+from instrumentation import timed, connection_factory
+
+# Global Simulated Date Setting
+SIMULATED_DATE = datetime.datetime(2025, 3, 18, 22, 31, 15)
+
+# Number of days (including today) shown on the dashboard.
+DASHBOARD_DAYS = 5
+
+# Attempt times are stored as integer seconds since this (naive) epoch.
+EPOCH = datetime.datetime(1970, 1, 1)
+ONE_SECOND = datetime.timedelta(seconds=1)
+
+# Path of the SQLite database, relative to the working directory.
+DB_PATH = "users.db"
+
+# Prepared statements kept per connection. The same SQL strings are used on every
+# call, so sqlite3 can reuse the compiled statement instead of re-parsing it.
+STATEMENT_CACHE_SIZE = 256
+
+# Applied once to every new connection.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",      # readers no longer block the writer
+    "PRAGMA synchronous = NORMAL",    # safe with WAL, one fsync per checkpoint
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",     # wait for a lock instead of failing straight away
+    "PRAGMA cache_size = -8000",      # 8 MB page cache
+    "PRAGMA temp_store = MEMORY",
+)
+
+# One connection per thread, reused for the lifetime of that thread.
+_pool = {}
+_pool_lock = threading.Lock()
+
+def _open_connection():
+    # check_same_thread is off only so close_all_connections() can close the
+    # connections of other threads; each connection is still used by one thread.
+    conn = sqlite3.connect(DB_PATH, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False,
+                           factory=connection_factory())
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+@timed("db.get_connection")
+def get_db_connection():
+    """
+    Returns the shared connection for the calling thread, opening it on first use.
+    Callers must not close it; use close_all_connections() on shutdown instead.
+    """
+    thread_id = threading.get_ident()
+    conn = _pool.get(thread_id)
+    if conn is not None:
+        return conn
+    try:
+        conn = _open_connection()
+    except sqlite3.Error as e:
+        print("Database connection error:", e)
+        return None
+    with _pool_lock:
+        # Drop connections left behind by threads that have finished.
+        live_threads = {t.ident for t in threading.enumerate()}
+        for dead_id in [tid for tid in _pool if tid not in live_threads]:
+            _pool.pop(dead_id).close()
+        _pool[thread_id] = conn
+    return conn
+
+def close_all_connections():
+    with _pool_lock:
+        for conn in _pool.values():
+            conn.close()
+        _pool.clear()
+
+def set_database_path(path):
+    """
+    Points the data layer at another database file (used by tools and benchmarks).
+    """
+    global DB_PATH
+    close_all_connections()
+    DB_PATH = path
+
+# -------------------- Data version --------------------
+# Increased after every committed change to results, so caches of derived data
+# (see analytics.py) know when to recompute. Only writes made by this process
+# are seen.
+
+_data_versions = itertools.count(1)
+_data_version = [0]
+
+def data_version():
+    return _data_version[0]
+
+def bump_data_version():
+    # Call after the change has been committed.
+    _data_version[0] = next(_data_versions)
+
+# -------------------- Schema migrations --------------------
+# Each migration upgrades the schema by one version and runs in its own
+# transaction. The current version is kept in PRAGMA user_version, so existing
+# users.db files are upgraded in place the next time create_database() runs.
+
+def _migration_1_base_tables(conn):
+    # Creating users table
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        account_type TEXT NOT NULL CHECK(account_type IN ('Student', 'Teacher'))
+    );
+    """)
+    # Creating results table
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        attempt_date DATETIME NOT NULL,
+        correct_list TEXT NOT NULL,
+        total_questions INTEGER NOT NULL,
+        FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+    );
+    """)
+
+def _migration_2_epoch_timestamps(conn):
+    # Replace the text attempt_date with integer epoch seconds so date ranges
+    # can be answered from an index instead of calling date() on every row.
+    conn.execute("""
+    CREATE TABLE results_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        attempt_ts INTEGER NOT NULL,
+        correct_list TEXT NOT NULL,
+        total_questions INTEGER NOT NULL,
+        FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+    );
+    """)
+    # Rows whose date cannot be parsed were already skipped by every reader.
+    conn.execute("""
+    INSERT INTO results_new (id, user_id, attempt_ts, correct_list, total_questions)
+    SELECT id, user_id, CAST(strftime('%s', attempt_date) AS INTEGER), correct_list, total_questions
+    FROM results
+    WHERE strftime('%s', attempt_date) IS NOT NULL;
+    """)
+    conn.execute("DROP TABLE results")
+    conn.execute("ALTER TABLE results_new RENAME TO results")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_results_user_ts ON results(user_id, attempt_ts)")
+
+def _legacy_correct_count(correct_list):
+    # correct_list held a JSON object such as {"correct_count": 2, "total_questions": 3}.
+    try:
+        return int(json.loads(correct_list).get("correct_count", 0))
+    except Exception:
+        return 0
+
+def _migration_3_typed_results(conn):
+    # Store the score as an integer column and each answer as its own row, so
+    # nothing has to parse the old JSON correct_list when reading results.
+    conn.execute("""
+    CREATE TABLE results_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        attempt_ts INTEGER NOT NULL,
+        correct_count INTEGER NOT NULL,
+        total_questions INTEGER NOT NULL,
+        quiz_file TEXT,
+        FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+    );
+    """)
+    # One-off backfill of the existing rows.
+    conn.create_function("legacy_correct_count", 1, _legacy_correct_count)
+    conn.execute("""
+    INSERT INTO results_new (id, user_id, attempt_ts, correct_count, total_questions)
+    SELECT id, user_id, attempt_ts, legacy_correct_count(correct_list), total_questions
+    FROM results;
+    """)
+    conn.execute("DROP TABLE results")
+    conn.execute("ALTER TABLE results_new RENAME TO results")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_results_user_ts ON results(user_id, attempt_ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_results_quiz ON results(quiz_file)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS result_answers (
+        result_id INTEGER NOT NULL,
+        question_index INTEGER NOT NULL,
+        given_answer TEXT NOT NULL,
+        is_correct INTEGER NOT NULL CHECK(is_correct IN (0, 1)),
+        PRIMARY KEY(result_id, question_index),
+        FOREIGN KEY(result_id) REFERENCES results(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    """)
+
+def _migration_4_daily_stats(conn):
+    # Per-user, per-day totals kept up to date by record_quiz_result(), so the
+    # dashboard reads one row per day instead of every attempt.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS daily_user_stats (
+        user_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        attempts INTEGER NOT NULL,
+        correct INTEGER NOT NULL,
+        total_questions INTEGER NOT NULL,
+        PRIMARY KEY(user_id, day),
+        FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    """)
+    conn.execute("""
+    INSERT INTO daily_user_stats (user_id, day, attempts, correct, total_questions)
+    SELECT user_id, date(attempt_ts, 'unixepoch'), COUNT(*), SUM(correct_count), SUM(total_questions)
+    FROM results
+    GROUP BY user_id, date(attempt_ts, 'unixepoch');
+    """)
+
+def _migration_5_quiz_catalogue(conn):
+    # Metadata of every quiz file in QUIZ_DIR, keyed by path. mtime_ns and size
+    # tell quiz_catalogue.refresh_catalogue() which files need re-reading.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS quiz_catalogue (
+        file_path TEXT PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        valid INTEGER NOT NULL CHECK(valid IN (0, 1)),
+        quiz_id TEXT,
+        name TEXT,
+        author TEXT,
+        question_count INTEGER,
+        time_limit NUMERIC
+    );
+    """)
+
+def _migration_6_quiz_search(conn):
+    # Full-text index over the catalogue; rowids match quiz_catalogue's rowids.
+    # Builds of SQLite without FTS5 skip it and search falls back to LIKE.
+    try:
+        conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS quiz_search USING fts5(
+            name, author, topic, questions,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        );
+        """)
+    except sqlite3.OperationalError as e:
+        print("Full-text search unavailable:", e)
+        return
+    # Existing catalogue rows have no indexed text yet; re-read them on next refresh.
+    conn.execute("DELETE FROM quiz_catalogue")
+
+def _migration_7_quiz_covering_index(conn):
+    # Per-quiz analytics (analytics.py) read these columns for every result of
+    # a quiz; with them in the index the table itself is never visited.
+    conn.execute("DROP INDEX IF EXISTS idx_results_quiz")
+    conn.execute("""
+    CREATE INDEX idx_results_quiz
+    ON results(quiz_file, user_id, correct_count, total_questions);
+    """)
+
+def _migration_8_username_search_index(conn):
+    # User search matches a case-insensitive prefix as a range on this index
+    # (see _username_prefix_range) instead of scanning with LIKE '%q%'.
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_users_username_nocase
+    ON users(username COLLATE NOCASE, id);
+    """)
+
+def _migration_9_compiled_quizzes(conn):
+    # Validated quizzes are kept compiled next to their metadata, so launching a
+    # quiz does not read and check the quiz file again (see quiz_catalogue.py).
+    conn.execute("ALTER TABLE quiz_catalogue ADD COLUMN compiled BLOB")
+    # Existing entries were never validated; re-read every file on next refresh.
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'quiz_search'").fetchone():
+        conn.execute("DELETE FROM quiz_search")
+    conn.execute("DELETE FROM quiz_catalogue")
+
+def _migration_10_quiz_attempts(conn):
+    # Quizzes in progress. remaining_ms is the time left when the attempt was
+    # last saved, so an attempt resumed later keeps the time it had; it is NULL
+    # for quizzes without a time limit.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS quiz_attempts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        quiz_file TEXT NOT NULL,
+        started_ts INTEGER NOT NULL,
+        updated_ts INTEGER NOT NULL,
+        remaining_ms INTEGER,
+        finished INTEGER NOT NULL DEFAULT 0 CHECK(finished IN (0, 1)),
+        FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+    );
+    """)
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_quiz_attempts_open
+    ON quiz_attempts(user_id, quiz_file) WHERE finished = 0;
+    """)
+
+# Running sums per question, from which item_analysis works out facility and
+# discrimination without rescanning result_answers. score is an attempt's
+# fraction correct (correct_count / total_questions).
+ITEM_STATS_SELECT = """
+SELECT r.quiz_file, a.question_index, COUNT(*), SUM(a.is_correct),
+       SUM(r.score), SUM(r.score * r.score), SUM(a.is_correct * r.score)
+FROM (SELECT id, quiz_file, 1.0 * correct_count / total_questions AS score
+      FROM results
+      WHERE quiz_file IS NOT NULL AND total_questions > 0{where}) AS r
+JOIN result_answers AS a ON a.result_id = r.id
+GROUP BY r.quiz_file, a.question_index
+"""
+
+ANSWER_STATS_SELECT = """
+SELECT r.quiz_file, a.question_index, a.given_answer, COUNT(*)
+FROM (SELECT id, quiz_file
+      FROM results
+      WHERE quiz_file IS NOT NULL AND total_questions > 0{where}) AS r
+JOIN result_answers AS a ON a.result_id = r.id
+GROUP BY r.quiz_file, a.question_index, a.given_answer
+"""
+
+def _migration_11_item_stats(conn):
+    # Per-question and per-answer counters, kept up to date by
+    # record_quiz_result() and rebuilt by rebuild_item_stats() after bulk changes.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS question_stats (
+        quiz_file TEXT NOT NULL,
+        question_index INTEGER NOT NULL,
+        attempts INTEGER NOT NULL,
+        correct INTEGER NOT NULL,
+        score_sum REAL NOT NULL,
+        score_sq_sum REAL NOT NULL,
+        correct_score_sum REAL NOT NULL,
+        PRIMARY KEY(quiz_file, question_index)
+    ) WITHOUT ROWID;
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS answer_stats (
+        quiz_file TEXT NOT NULL,
+        question_index INTEGER NOT NULL,
+        given_answer TEXT NOT NULL,
+        chosen INTEGER NOT NULL,
+        PRIMARY KEY(quiz_file, question_index, given_answer)
+    ) WITHOUT ROWID;
+    """)
+    conn.execute("INSERT INTO question_stats " + ITEM_STATS_SELECT.format(where=""))
+    conn.execute("INSERT INTO answer_stats " + ANSWER_STATS_SELECT.format(where=""))
+
+def _migration_12_attempt_answers(conn):
+    # Journal of the answers given so far in each unfinished attempt, one row
+    # per question written as the student moves on, so a closed window or a
+    # crash loses nothing. Cleared when the attempt finishes.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS attempt_answers (
+        attempt_id INTEGER NOT NULL,
+        question_index INTEGER NOT NULL,
+        given_answer TEXT NOT NULL,
+        PRIMARY KEY(attempt_id, question_index),
+        FOREIGN KEY(attempt_id) REFERENCES quiz_attempts(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    """)
+
+def _migration_13_settings(conn):
+    # Site-wide settings as text key/value pairs, e.g. the calibrated bcrypt cost.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS settings (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    ) WITHOUT ROWID;
+    """)
+
+def _migration_14_result_source_ids(conn):
+    # The id an ingested result had in the database it was exported from, so
+    # ingesting the same export again can skip the rows already stored.
+    conn.execute("ALTER TABLE results ADD COLUMN source_result_id INTEGER")
+
+MIGRATIONS = [
+    _migration_1_base_tables,
+    _migration_2_epoch_timestamps,
+    _migration_3_typed_results,
+    _migration_4_daily_stats,
+    _migration_5_quiz_catalogue,
+    _migration_6_quiz_search,
+    _migration_7_quiz_covering_index,
+    _migration_8_username_search_index,
+    _migration_9_compiled_quizzes,
+    _migration_10_quiz_attempts,
+    _migration_11_item_stats,
+    _migration_12_attempt_answers,
+    _migration_13_settings,
+    _migration_14_result_source_ids,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate_database(conn):
+    """
+    Applies every migration newer than the database's user_version.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    # Table rebuilds copy rows whose user may no longer exist, so foreign keys
+    # are switched off while migrating (this cannot be done inside a transaction).
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for number in range(version + 1, SCHEMA_VERSION + 1):
+            conn.execute("BEGIN")
+            try:
+                MIGRATIONS[number - 1](conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+
+def create_database():
+    conn = get_db_connection()
+    if conn is None:
+        return
+    try:
+        migrate_database(conn)
+    except sqlite3.Error as e:
+        print("Database migration error:", e)
+
+# -------------------- Results queries --------------------
+
+def to_timestamp(dt):
+    # Naive datetimes are stored as if they were UTC, matching strftime('%s').
+    return (dt.replace(tzinfo=None) - EPOCH) // ONE_SECOND
+
+def from_timestamp(ts):
+    return EPOCH + datetime.timedelta(seconds=ts)
+
+def record_quiz_result(user_id, correct_count, total_questions, answers=None, quiz_file=None, attempt_id=None):
+    """
+    Stores one attempt. answers is an optional list of (given_answer, is_correct)
+    pairs in question order; quiz_file is the quiz's file name in QUIZ_DIR.
+    attempt_id, the user's quiz_attempts row, is closed in the same
+    transaction; if it is already closed the result was stored before and is
+    not stored again.
+    """
+    return record_quiz_results([(user_id, correct_count, total_questions, answers, quiz_file, attempt_id)])
+
+def record_quiz_results(results):
+    """
+    Stores several attempts, each a tuple of record_quiz_result()'s arguments,
+    in one transaction (the data service batches concurrent submissions this way).
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return False
+    now = SIMULATED_DATE if SIMULATED_DATE else datetime.datetime.now()
+    with conn:
+        for user_id, correct_count, total_questions, answers, quiz_file, attempt_id in results:
+            if attempt_id is not None and not _close_attempt(conn, attempt_id, to_timestamp(now), user_id):
+                continue
+            _insert_result(conn, now, user_id, correct_count, total_questions, answers, quiz_file)
+    bump_data_version()
+    return True
+
+def _insert_result(conn, now, user_id, correct_count, total_questions, answers, quiz_file):
+    cursor = conn.execute("""
+    INSERT INTO results (user_id, attempt_ts, correct_count, total_questions, quiz_file)
+    VALUES (?, ?, ?, ?, ?)
+    """, (user_id, to_timestamp(now), correct_count, total_questions, quiz_file))
+    if answers:
+        result_id = cursor.lastrowid
+        conn.executemany("""
+        INSERT INTO result_answers (result_id, question_index, given_answer, is_correct)
+        VALUES (?, ?, ?, ?)
+        """, [(result_id, i, given, int(bool(correct))) for i, (given, correct) in enumerate(answers)])
+    conn.execute("""
+    INSERT INTO daily_user_stats (user_id, day, attempts, correct, total_questions)
+    VALUES (?, ?, 1, ?, ?)
+    ON CONFLICT(user_id, day) DO UPDATE SET
+        attempts = attempts + 1,
+        correct = correct + excluded.correct,
+        total_questions = total_questions + excluded.total_questions
+    """, (user_id, now.date().isoformat(), correct_count, total_questions))
+    if answers and quiz_file and total_questions > 0:
+        _add_item_stats(conn, quiz_file, correct_count / total_questions, answers)
+
+def _add_item_stats(conn, quiz_file, score, answers):
+    conn.executemany("""
+    INSERT INTO question_stats (quiz_file, question_index, attempts, correct, score_sum, score_sq_sum, correct_score_sum)
+    VALUES (?, ?, 1, ?, ?, ?, ?)
+    ON CONFLICT(quiz_file, question_index) DO UPDATE SET
+        attempts = attempts + 1,
+        correct = correct + excluded.correct,
+        score_sum = score_sum + excluded.score_sum,
+        score_sq_sum = score_sq_sum + excluded.score_sq_sum,
+        correct_score_sum = correct_score_sum + excluded.correct_score_sum
+    """, [(quiz_file, i, int(bool(correct)), score, score * score, score if correct else 0.0)
+          for i, (given, correct) in enumerate(answers)])
+    conn.executemany("""
+    INSERT INTO answer_stats (quiz_file, question_index, given_answer, chosen)
+    VALUES (?, ?, ?, 1)
+    ON CONFLICT(quiz_file, question_index, given_answer) DO UPDATE SET chosen = chosen + 1
+    """, [(quiz_file, i, given) for i, (given, correct) in enumerate(answers)])
+
+def last_five_days_attempts(user_id, current_datetime=None):
+    now = current_datetime if current_datetime else (SIMULATED_DATE if SIMULATED_DATE else datetime.datetime.now())
+    conn = get_db_connection()
+    if conn is None:
+        return []
+    # Today + previous 4 days yield 5 days total. The bound is computed here so
+    # the query is a seek on idx_results_user_ts.
+    start = datetime.datetime.combine(now.date() - datetime.timedelta(days=4), datetime.time.min)
+    query = """
+    SELECT id, user_id, attempt_ts, correct_count, total_questions
+    FROM results
+    WHERE user_id = ?
+      AND attempt_ts >= ?
+    ORDER BY attempt_ts DESC;
+    """
+    rows = conn.execute(query, (user_id, to_timestamp(start))).fetchall()
+    return [(row[0], row[1], from_timestamp(row[2]), row[3], row[4]) for row in rows]
+
+def get_dashboard_data(user_id, current_datetime=None, days=DASHBOARD_DAYS):
+    """
+    Returns {date: {"attempts": n, "avg_percentage": p}} for the last `days` days
+    that have attempts, read from the daily_user_stats rollup.
+    """
+    now = current_datetime if current_datetime else (SIMULATED_DATE if SIMULATED_DATE else datetime.datetime.now())
+    conn = get_db_connection()
+    rows = []
+    if conn is not None:
+        first_day = now.date() - datetime.timedelta(days=days - 1)
+        rows = conn.execute("""
+        SELECT day, attempts, correct, total_questions
+        FROM daily_user_stats
+        WHERE user_id = ?
+          AND day >= ?
+        ORDER BY day;
+        """, (user_id, first_day.isoformat())).fetchall()
+    if not rows:
+        today = (current_datetime.date() if current_datetime else datetime.datetime.today().date())
+        return {today - datetime.timedelta(days=i): {"attempts": 0, "avg_percentage": 0} for i in range(days)}
+    dashboard_data = {}
+    for day, attempts, correct, total in rows:
+        avg = (correct / total * 100) if total > 0 else 0
+        dashboard_data[datetime.date.fromisoformat(day)] = {"attempts": attempts, "avg_percentage": avg}
+    return dashboard_data
+
+def get_all_results(user_id):
+    conn = get_db_connection()
+    if conn is None:
+        return []
+    query = """
+    SELECT id, user_id, attempt_ts, correct_count, total_questions
+    FROM results
+    WHERE user_id = ?
+    ORDER BY attempt_ts DESC;
+    """
+    rows = conn.execute(query, (user_id,)).fetchall()
+    return [(row[0], row[1], from_timestamp(row[2]), row[3], row[4]) for row in rows]
+
+def rebuild_daily_stats(conn, user_ids):
+    """
+    Recomputes the daily_user_stats rows of the given users from results, for
+    changes that bypass record_quiz_result(). Call inside a transaction, and
+    bump_data_version() once it has been committed.
+    """
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), 500):
+        chunk = user_ids[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        conn.execute(f"DELETE FROM daily_user_stats WHERE user_id IN ({placeholders})", chunk)
+        conn.execute(f"""
+        INSERT INTO daily_user_stats (user_id, day, attempts, correct, total_questions)
+        SELECT user_id, date(attempt_ts, 'unixepoch'), COUNT(*), SUM(correct_count), SUM(total_questions)
+        FROM results
+        WHERE user_id IN ({placeholders})
+        GROUP BY user_id, date(attempt_ts, 'unixepoch');
+        """, chunk)
+
+def rebuild_item_stats(conn, quiz_files):
+    """
+    Recomputes question_stats and answer_stats for the given quiz files from
+    result_answers, for changes that bypass record_quiz_result(). Call inside a
+    transaction, like rebuild_daily_stats().
+    """
+    quiz_files = [quiz_file for quiz_file in quiz_files if quiz_file]
+    for start in range(0, len(quiz_files), 500):
+        chunk = quiz_files[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        where = f" AND quiz_file IN ({placeholders})"
+        conn.execute(f"DELETE FROM question_stats WHERE quiz_file IN ({placeholders})", chunk)
+        conn.execute(f"DELETE FROM answer_stats WHERE quiz_file IN ({placeholders})", chunk)
+        conn.execute("INSERT INTO question_stats " + ITEM_STATS_SELECT.format(where=where), chunk)
+        conn.execute("INSERT INTO answer_stats " + ANSWER_STATS_SELECT.format(where=where), chunk)
+
+# Sorts after every character, so prefix + USERNAME_RANGE_END bounds all names
+# starting with prefix.
+USERNAME_RANGE_END = "\U0010ffff"
+
+def _username_prefix_range(search_query):
+    """
+    Returns (SQL condition, params) matching usernames that start with
+    search_query, ignoring ASCII case. Both bounds use NOCASE so the search is
+    a range scan on idx_users_username_nocase.
+    """
+    if not search_query:
+        return "1", []
+    return ("username >= ? COLLATE NOCASE AND username < ? COLLATE NOCASE",
+            [search_query, search_query + USERNAME_RANGE_END])
+
+def get_all_users(search_query=None):
+    """
+    Users whose username starts with search_query (any case), or all users.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return []
+    condition, params = _username_prefix_range(search_query)
+    users = conn.execute(f"""
+    SELECT id, username, account_type FROM users
+    WHERE {condition}
+    ORDER BY username COLLATE NOCASE, id;
+    """, params).fetchall()
+    return [{"id": user[0], "username": user[1], "account_type": user[2]} for user in users]
+
+# -------------------- Paged queries --------------------
+# Used by the list screens, which only fetch the rows they are about to show.
+# Each function takes the last row of the previous page (or None for the first
+# page) and continues from it with a keyset condition instead of OFFSET.
+
+PAGE_SIZE = 50
+
+def count_results(user_id):
+    conn = get_db_connection()
+    if conn is None:
+        return 0
+    return conn.execute("SELECT COUNT(*) FROM results WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+def get_results_page(user_id, after=None, limit=PAGE_SIZE):
+    """
+    Same rows as get_all_results(), newest first, `limit` at a time.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return []
+    if after is None:
+        rows = conn.execute("""
+        SELECT id, user_id, attempt_ts, correct_count, total_questions
+        FROM results
+        WHERE user_id = ?
+        ORDER BY attempt_ts DESC, id DESC
+        LIMIT ?;
+        """, (user_id, limit)).fetchall()
+    else:
+        rows = conn.execute("""
+        SELECT id, user_id, attempt_ts, correct_count, total_questions
+        FROM results
+        WHERE user_id = ?
+          AND (attempt_ts, id) < (?, ?)
+        ORDER BY attempt_ts DESC, id DESC
+        LIMIT ?;
+        """, (user_id, to_timestamp(after[2]), after[0], limit)).fetchall()
+    return [(row[0], row[1], from_timestamp(row[2]), row[3], row[4]) for row in rows]
+
+def count_users(search_query=None):
+    conn = get_db_connection()
+    if conn is None:
+        return 0
+    condition, params = _username_prefix_range(search_query)
+    return conn.execute(f"SELECT COUNT(*) FROM users WHERE {condition}", params).fetchone()[0]
+
+def get_users_page(search_query=None, after=None, limit=PAGE_SIZE):
+    """
+    Users ordered by username (ignoring case), `limit` at a time, as dicts like
+    get_all_users(). search_query matches the start of the username.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return []
+    condition, params = _username_prefix_range(search_query)
+    last = (after["username"], after["id"]) if after else ("", 0)
+    users = conn.execute(f"""
+    SELECT id, username, account_type FROM users
+    WHERE {condition}
+      AND (username COLLATE NOCASE, id) > (?, ?)
+    ORDER BY username COLLATE NOCASE, id
+    LIMIT ?;
+    """, params + [*last, limit]).fetchall()
+    return [{"id": user[0], "username": user[1], "account_type": user[2]} for user in users]
+
+# -------------------- Account queries --------------------
+
+def get_user_by_username(username):
+    """
+    Returns (id, username, password_hash, account_type) or None.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    return conn.execute("SELECT id, username, password, account_type FROM users WHERE username = ?",
+                        (username,)).fetchone()
+
+def insert_user(username, hashed_password, account_type):
+    """
+    Raises sqlite3.IntegrityError if the username is already taken.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return False
+    with conn:
+        conn.execute("INSERT INTO users (username, password, account_type) VALUES (?, ?, ?)",
+                     (username, hashed_password, account_type))
+    return True
+
+def username_exists(username):
+    conn = get_db_connection()
+    if conn is None:
+        return False
+    return conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone() is not None
+
+def update_username(user_id, new_username):
+    conn = get_db_connection()
+    if conn is None:
+        return False
+    with conn:
+        conn.execute("UPDATE users SET username = ? WHERE id = ?", (new_username, user_id))
+    return True
+
+def get_password_hash(user_id):
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    row = conn.execute("SELECT password FROM users WHERE id = ?", (user_id,)).fetchone()
+    return row[0] if row else None
+
+def update_password_hash(user_id, new_hashed):
+    conn = get_db_connection()
+    if conn is None:
+        return False
+    with conn:
+        conn.execute("UPDATE users SET password = ? WHERE id = ?", (new_hashed, user_id))
+    return True
+
+def replace_password_hash(user_id, old_hashed, new_hashed):
+    """
+    Swaps the hash only if it is still old_hashed, so a rehash finishing late
+    cannot undo a password change made in the meantime. Returns True if replaced.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return False
+    with conn:
+        cursor = conn.execute("UPDATE users SET password = ? WHERE id = ? AND password = ?",
+                              (new_hashed, user_id, old_hashed))
+    return cursor.rowcount == 1
+
+# -------------------- Settings --------------------
+
+def get_setting(key, default=None):
+    conn = get_db_connection()
+    if conn is None:
+        return default
+    row = conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+def set_setting(key, value):
+    conn = get_db_connection()
+    if conn is None:
+        return False
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value)))
+    return True
+
+# -------------------- Quiz attempts --------------------
+
+def begin_attempt(user_id, quiz_file, time_limit_ms):
+    """
+    Returns (attempt_id, remaining_ms) for the user's unfinished attempt at
+    quiz_file, or for a new attempt with the full time limit if there is none.
+    remaining_ms is None for untimed quizzes.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None, time_limit_ms
+    row = conn.execute("""
+    SELECT id, remaining_ms FROM quiz_attempts
+    WHERE user_id = ? AND quiz_file = ? AND finished = 0
+    ORDER BY id DESC
+    LIMIT 1;
+    """, (user_id, quiz_file)).fetchone()
+    if row is not None and (row[1] is None or row[1] > 0):
+        return row[0], row[1]
+    now = to_timestamp(SIMULATED_DATE if SIMULATED_DATE else datetime.datetime.now())
+    with conn:
+        if row is not None:
+            # Its time ran out while it was closed.
+            _close_attempt(conn, row[0], now)
+        cursor = conn.execute("""
+        INSERT INTO quiz_attempts (user_id, quiz_file, started_ts, updated_ts, remaining_ms)
+        VALUES (?, ?, ?, ?, ?)
+        """, (user_id, quiz_file, now, now, time_limit_ms))
+    return cursor.lastrowid, time_limit_ms
+
+def save_attempt_time(attempt_id, remaining_ms):
+    conn = get_db_connection()
+    if conn is None or attempt_id is None:
+        return False
+    now = SIMULATED_DATE if SIMULATED_DATE else datetime.datetime.now()
+    with conn:
+        conn.execute("UPDATE quiz_attempts SET remaining_ms = ?, updated_ts = ? WHERE id = ? AND finished = 0",
+                     (remaining_ms, to_timestamp(now), attempt_id))
+    return True
+
+def _close_attempt(conn, attempt_id, now, user_id=None):
+    # Returns whether the attempt was open (and, given user_id, that user's).
+    cursor = conn.execute("UPDATE quiz_attempts SET finished = 1, updated_ts = ? WHERE id = ? AND finished = 0"
+                          + (" AND user_id = ?" if user_id is not None else ""),
+                          (now, attempt_id) + ((user_id,) if user_id is not None else ()))
+    conn.execute("DELETE FROM attempt_answers WHERE attempt_id = ?", (attempt_id,))
+    return cursor.rowcount > 0
+
+def finish_attempt(attempt_id):
+    """
+    Closes an attempt, whether it was submitted or abandoned to start again.
+    """
+    conn = get_db_connection()
+    if conn is None or attempt_id is None:
+        return False
+    now = SIMULATED_DATE if SIMULATED_DATE else datetime.datetime.now()
+    with conn:
+        _close_attempt(conn, attempt_id, to_timestamp(now))
+    return True
+
+def save_attempt_answer(attempt_id, question_index, given_answer):
+    """
+    Journals one answer of an unfinished attempt, as each question is
+    answered. A single-row write, but a round trip in client mode, so the quiz
+    window makes it on a worker. Answers arriving after the attempt has been
+    closed are dropped.
+    """
+    conn = get_db_connection()
+    if conn is None or attempt_id is None:
+        return False
+    with conn:
+        conn.execute("""
+        INSERT OR REPLACE INTO attempt_answers (attempt_id, question_index, given_answer)
+        SELECT ?, ?, ?
+        WHERE EXISTS (SELECT 1 FROM quiz_attempts WHERE id = ? AND finished = 0)
+        """, (attempt_id, question_index, given_answer, attempt_id))
+    return True
+
+def get_attempt_answers(attempt_id):
+    """
+    Returns {question_index: given_answer} for the answers journalled so far.
+    """
+    conn = get_db_connection()
+    if conn is None or attempt_id is None:
+        return {}
+    return dict(conn.execute("SELECT question_index, given_answer FROM attempt_answers WHERE attempt_id = ?",
+                             (attempt_id,)))
+
+def get_attempt_user(attempt_id):
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    row = conn.execute("SELECT user_id FROM quiz_attempts WHERE id = ?", (attempt_id,)).fetchone()
+    return row[0] if row else None
+
+def get_open_attempts(user_id):
+    """
+    Returns {quiz_file: {"attempt_id", "remaining_ms", "answered"}} for the
+    user's unfinished attempts that can still be resumed.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return {}
+    rows = conn.execute("""
+    SELECT a.quiz_file, a.id, a.remaining_ms,
+           (SELECT COUNT(*) FROM attempt_answers WHERE attempt_id = a.id)
+    FROM quiz_attempts AS a
+    WHERE a.user_id = ? AND a.finished = 0
+      AND (a.remaining_ms IS NULL OR a.remaining_ms > 0)
+    ORDER BY a.id;
+    """, (user_id,)).fetchall()
+    return {row[0]: {"attempt_id": row[1], "remaining_ms": row[2], "answered": row[3]} for row in rows}
@@ -0,0 +1,126 @@
+"""
+Streaming export of results to CSV or Parquet.
+
+Rows are read through one cursor with fetchmany() and written batch by batch,
+so memory use stays the same however large the results table is. Parquet
+needs the optional pyarrow package; CSV needs nothing extra.
+"""
+import sys
+import csv
+import datetime
+
+from database import get_db_connection, from_timestamp, to_timestamp
+
+# Rows fetched from the cursor (and written) at a time.
+EXPORT_BATCH_SIZE = 10_000
+
+# Same first columns as the ingest format, so an export can be ingested again.
+EXPORT_COLUMNS = ("result_id", "user_id", "username", "account_type", "attempt_date",
+                  "correct_count", "total_questions", "quiz_file")
+
+FORMATS = ("csv", "parquet")
+
+def detect_format(path):
+    return "parquet" if path.lower().endswith((".parquet", ".pq")) else "csv"
+
+def _filters(start=None, end=None, user_id=None):
+    # start and end are dates, both inclusive.
+    clauses, params = [], []
+    if user_id is not None:
+        clauses.append("r.user_id = ?")
+        params.append(user_id)
+    if start is not None:
+        clauses.append("r.attempt_ts >= ?")
+        params.append(to_timestamp(datetime.datetime.combine(start, datetime.time.min)))
+    if end is not None:
+        clauses.append("r.attempt_ts < ?")
+        params.append(to_timestamp(datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min)))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def count_export_rows(start=None, end=None, user_id=None):
+    conn = get_db_connection()
+    if conn is None:
+        return 0
+    where, params = _filters(start, end, user_id)
+    return conn.execute(f"SELECT COUNT(*) FROM results AS r{where}", params).fetchone()[0]
+
+def iter_result_batches(start=None, end=None, user_id=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields lists of rows (in EXPORT_COLUMNS order, attempt_ts still in epoch
+    seconds) in result id order.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return
+    where, params = _filters(start, end, user_id)
+    cursor = conn.execute(f"""
+    SELECT r.id, r.user_id, u.username, u.account_type, r.attempt_ts,
+           r.correct_count, r.total_questions, r.quiz_file
+    FROM results AS r
+    JOIN users AS u ON u.id = r.user_id{where}
+    ORDER BY r.id;
+    """, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+def _write_csv(path, batches, progress):
+    # "-" writes to stdout.
+    f = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+    done = 0
+    progress(done)
+    try:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in batches:
+            writer.writerows((row[0], row[1], row[2], row[3], from_timestamp(row[4]).strftime("%Y-%m-%d %H:%M:%S"),
+                              row[5], row[6], row[7]) for row in rows)
+            done += len(rows)
+            progress(done)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    return done
+
+def _write_parquet(path, batches, progress):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs the pyarrow package (pip install pyarrow).")
+    schema = pa.schema([
+        ("result_id", pa.int64()), ("user_id", pa.int64()), ("username", pa.string()),
+        ("account_type", pa.string()), ("attempt_date", pa.timestamp("s")),
+        ("correct_count", pa.int32()), ("total_questions", pa.int32()), ("quiz_file", pa.string()),
+    ])
+    done = 0
+    progress(done)
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema))
+            done += len(rows)
+            progress(done)
+    return done
+
+def export_results(path, file_format=None, start=None, end=None, user_id=None, progress=None):
+    """
+    Writes the results (optionally one user's, or between the dates start and
+    end inclusive) to `path` as CSV or Parquet and returns the number of rows.
+    progress(done, total) is called after every batch, on the calling thread.
+    """
+    file_format = file_format or detect_format(path)
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown export format {file_format!r}")
+    total = count_export_rows(start, end, user_id)
+    report = (lambda done: progress(done, total)) if progress else (lambda done: None)
+    batches = iter_result_batches(start, end, user_id)
+    if file_format == "parquet":
+        return _write_parquet(path, batches, report)
+    return _write_csv(path, batches, report)
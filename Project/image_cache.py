@@ -0,0 +1,89 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from tasks import submit
+
+# Decoded, resized question images are kept in memory up to this many bytes.
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+# Resized copies of large images are also written here so the next run can
+# skip decoding and resizing the original.
+THUMBNAIL_DIR = os.path.join(".cache", "thumbnails")
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_lock = threading.Lock()
+
+def _image_bytes(img):
+    return img.width * img.height * len(img.getbands())
+
+def _thumbnail_path(key):
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(THUMBNAIL_DIR, digest + ".png")
+
+def _decode(path, max_width, key):
+    from PIL import Image  # Deferred so importing this module stays cheap.
+    thumbnail = _thumbnail_path(key)
+    if os.path.exists(thumbnail):
+        try:
+            with Image.open(thumbnail) as img:
+                img.load()
+                return img.copy()
+        except OSError:
+            pass  # Corrupt thumbnail; rebuild it below.
+    with Image.open(path) as img:
+        img.load()
+        if img.width <= max_width:
+            return img.copy()
+        ratio = max_width / img.width
+        resized = img.resize((max_width, int(img.height * ratio)), Image.Resampling.LANCZOS)
+    try:
+        os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+        resized.save(thumbnail, "PNG")
+    except OSError as e:
+        print(f"Could not write thumbnail for {path}: {e}")
+    return resized
+
+def get_image(path, max_width):
+    """
+    Returns the image at `path` scaled down to at most `max_width` pixels wide,
+    from memory or the thumbnail folder when possible. The key includes the
+    file's mtime, so an edited image is decoded again. Raises OSError if the
+    image cannot be read.
+    """
+    global _cache_bytes
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns, max_width)
+    with _lock:
+        img = _cache.get(key)
+        if img is not None:
+            _cache.move_to_end(key)
+            return img
+    img = _decode(path, max_width, key)
+    with _lock:
+        if key not in _cache:
+            _cache[key] = img
+            _cache_bytes += _image_bytes(img)
+            # Evict least recently used images until we are back under budget.
+            while _cache_bytes > MAX_CACHE_BYTES and len(_cache) > 1:
+                _, evicted = _cache.popitem(last=False)
+                _cache_bytes -= _image_bytes(evicted)
+    return img
+
+def prefetch(path, max_width):
+    """
+    Decodes an image on a worker thread so a later get_image() is a cache hit.
+    """
+    def load():
+        try:
+            get_image(path, max_width)
+        except OSError:
+            pass  # Reported when the question is actually shown.
+    submit(load)
+
+def clear():
+    global _cache_bytes
+    with _lock:
+        _cache.clear()
+        _cache_bytes = 0
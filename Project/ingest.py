@@ -0,0 +1,220 @@
+"""
+Bulk result ingestion, e.g. a cohort's paper-test marks or an offline lab's
+attempts.
+
+ingest_results() takes any iterable of result dicts and inserts them with
+executemany() in chunked transactions instead of committing every row. Users
+are looked up once at the start, and the daily stats of the users touched (and
+the item stats of the quizzes touched) are rebuilt once at the end.
+
+Each result needs:
+    username or user_id (username wins when both are given, as ids differ
+    between databases)
+    attempt_date ("YYYY-MM-DD HH:MM:SS", a datetime) or attempt_ts (epoch seconds)
+    correct_count, total_questions
+and may have quiz_file, answers ([[given, is_correct], ...], JSON lines only) and
+result_id, its id in the database it came from. A result whose result_id was
+already ingested (or is the stored row itself) for the same user and time is
+rejected, so replaying a file does not insert it twice.
+CSV files written by `python -m cli export-results` can be ingested as they are.
+"""
+import io
+import sys
+import csv
+import json
+import datetime
+
+from database import (get_db_connection, rebuild_daily_stats, rebuild_item_stats, bump_data_version, to_timestamp,
+                      EPOCH, ONE_SECOND)
+
+# Results inserted per transaction.
+INGEST_CHUNK_SIZE = 20_000
+
+# Rejected rows reported back in full; later ones are only counted.
+MAX_REPORTED_ERRORS = 100
+
+# The readers yield a ValueError in place of a line they cannot parse, so it
+# is rejected like any other bad row instead of stopping the ingest.
+
+def read_csv(f):
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    while True:
+        try:
+            values = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield ValueError(f"unreadable CSV line: {e}")
+            continue
+        if values:
+            yield dict(zip(header, values))
+
+def read_jsonl(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield ValueError(f"invalid JSON: {e}")
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+def detect_format(path):
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+def read_results_file(path, file_format=None):
+    """
+    Yields result dicts from a CSV or JSON lines file ("-" reads stdin).
+    """
+    file_format = file_format or detect_format(path)
+    if path == "-":
+        yield from READERS[file_format](io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline=""))
+        return
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        yield from READERS[file_format](f)
+
+def _attempt_ts(result):
+    if result.get("attempt_ts") not in (None, ""):
+        return int(result["attempt_ts"])
+    attempt_date = result["attempt_date"]
+    if isinstance(attempt_date, datetime.datetime):
+        return to_timestamp(attempt_date)
+    attempt_date = datetime.datetime.fromisoformat(str(attempt_date))
+    if attempt_date.tzinfo is None:
+        return (attempt_date - EPOCH) // ONE_SECOND
+    return to_timestamp(attempt_date)
+
+def _validate(result, user_ids, usernames):
+    """
+    Returns (user_id, attempt_ts, correct_count, total_questions, quiz_file, answers,
+    result_id) or raises ValueError with the reason the row is rejected.
+    """
+    if isinstance(result, ValueError):
+        raise result
+    if not isinstance(result, dict):
+        raise ValueError("not a result object")
+    try:
+        if result.get("username") not in (None, ""):
+            user_id = usernames.get(result["username"])
+            if user_id is None:
+                raise ValueError(f"unknown username {result['username']!r}")
+        elif result.get("user_id") not in (None, ""):
+            user_id = int(result["user_id"])
+            if user_id not in user_ids:
+                raise ValueError(f"unknown user_id {user_id}")
+        else:
+            raise ValueError("missing username")
+        correct_count = int(result["correct_count"])
+        total_questions = int(result["total_questions"])
+        attempt_ts = _attempt_ts(result)
+        result_id = int(result["result_id"]) if result.get("result_id") not in (None, "") else None
+    except KeyError as e:
+        raise ValueError(f"missing {e.args[0]}")
+    except TypeError as e:
+        raise ValueError(str(e))
+    if total_questions < 0 or not 0 <= correct_count <= total_questions:
+        raise ValueError(f"correct_count {correct_count} out of range for {total_questions} questions")
+    answers = result.get("answers") or None
+    if answers is not None:
+        try:
+            answers = [(str(given), bool(correct)) for given, correct in answers]
+        except (TypeError, ValueError):
+            raise ValueError("answers must be a list of [given, is_correct] pairs")
+        if len(answers) != total_questions:
+            raise ValueError("answers does not match total_questions")
+        if sum(correct for _, correct in answers) != correct_count:
+            raise ValueError("answers does not match correct_count")
+    return user_id, attempt_ts, correct_count, total_questions, result.get("quiz_file") or None, answers, result_id
+
+def _already_ingested(conn, row):
+    # On idx_results_user_ts; the same export ingested back into its own
+    # database matches on id, one ingested before on source_result_id.
+    return conn.execute("""
+    SELECT 1 FROM results WHERE user_id = ? AND attempt_ts = ? AND ? IN (id, source_result_id)
+    """, (row[0], row[1], row[6])).fetchone() is not None
+
+def _insert_chunk(conn, chunk):
+    # In index order, so idx_results_user_ts is appended to rather than split.
+    chunk.sort(key=lambda row: (row[0], row[1]))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany("""
+        INSERT INTO results (user_id, attempt_ts, correct_count, total_questions, quiz_file, source_result_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """, [row[:5] + row[6:] for row in chunk])
+        # Holding the write lock, SQLite numbers the rows one after another, so
+        # the chunk's ids end at the last one inserted.
+        first_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0] - len(chunk) + 1
+        answer_rows = [(first_id + i, q, str(given), int(bool(correct)))
+                       for i, row in enumerate(chunk) if row[5]
+                       for q, (given, correct) in enumerate(row[5])]
+        if answer_rows:
+            conn.executemany("""
+            INSERT INTO result_answers (result_id, question_index, given_answer, is_correct)
+            VALUES (?, ?, ?, ?)
+            """, answer_rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def ingest_results(results, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Inserts every valid result from the iterable `results` and returns
+    {"inserted": n, "rejected": n, "errors": [(row number, reason), ...]}.
+    Rows already committed stay if a later chunk fails, and the stats are
+    rebuilt for them either way.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        raise RuntimeError("Unable to connect to database.")
+    usernames = dict(conn.execute("SELECT username, id FROM users"))
+    user_ids = set(usernames.values())
+    report = {"inserted": 0, "rejected": 0, "errors": []}
+    touched = set()
+    touched_quizzes = set()
+    chunk = []
+    # (user_id, attempt_ts, result_id) of the chunk not yet committed; earlier
+    # ones are found by _already_ingested().
+    pending = set()
+
+    def flush():
+        _insert_chunk(conn, chunk)
+        report["inserted"] += len(chunk)
+        for row in chunk:
+            touched.add(row[0])
+            if row[5]:
+                touched_quizzes.add(row[4])
+        chunk.clear()
+        pending.clear()
+
+    try:
+        for row_number, result in enumerate(results, start=1):
+            try:
+                row = _validate(result, user_ids, usernames)
+                if row[6] is not None:
+                    key = (row[0], row[1], row[6])
+                    if key in pending or _already_ingested(conn, row):
+                        raise ValueError(f"result_id {row[6]} already ingested")
+                    pending.add(key)
+            except ValueError as e:
+                report["rejected"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append((row_number, str(e)))
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+    finally:
+        if touched:
+            with conn:
+                rebuild_daily_stats(conn, touched)
+                rebuild_item_stats(conn, touched_quizzes)
+            bump_data_version()
+    return report
@@ -0,0 +1,236 @@
+"""
+Latency histograms for the hot paths: database connections and queries, the
+quiz catalogue, question images, bcrypt and the dashboard charts.
+
+Off unless the QUIZ_INSTRUMENT environment variable is set when the app
+starts. While off, timed() hands back the function it was given and span()
+returns one shared no-op context manager, so the instrumented code runs as if
+nothing had been added. Recorded timings can be read with snapshot(), or
+exported as JSON or Prometheus text; Ctrl+Shift+D in the main window opens the
+diagnostics window, which also starts and stops cProfile captures.
+
+QUIZ_PROFILE=1 profiles the whole session from start-up; the capture is
+written to PROFILE_DIR when the app closes.
+"""
+import os
+import io
+import re
+import json
+import time
+import sqlite3
+import datetime
+import threading
+import functools
+from bisect import bisect_left
+from contextlib import nullcontext
+
+ENABLED = bool(os.environ.get("QUIZ_INSTRUMENT"))
+PROFILE_ON_START = bool(os.environ.get("QUIZ_PROFILE"))
+
+# Upper bounds of the histogram buckets, in seconds. Anything slower goes in
+# the final +Inf bucket.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Profiles saved by stop_profile() go here.
+PROFILE_DIR = os.path.join(".cache", "profiles")
+
+METRIC_NAME = "quiz_app_latency_seconds"
+
+_metrics = {}
+_lock = threading.Lock()
+_NO_SPAN = nullcontext()
+
+def record(name, seconds):
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = {"count": 0, "sum": 0.0, "min": seconds, "max": seconds,
+                                       "buckets": [0] * (len(BUCKETS) + 1)}
+        metric["count"] += 1
+        metric["sum"] += seconds
+        metric["min"] = min(metric["min"], seconds)
+        metric["max"] = max(metric["max"], seconds)
+        metric["buckets"][bisect_left(BUCKETS, seconds)] += 1
+
+def timed(name):
+    """
+    Decorator recording every call's duration under `name`. Returns the
+    function unchanged when instrumentation is off.
+    """
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+def span(name):
+    """
+    Context manager timing the block under `name`.
+    """
+    return _Span(name) if ENABLED else _NO_SPAN
+
+# -------------------- SQL --------------------
+
+_SQL_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE|ON)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?([A-Za-z_]\w*)",
+                        re.IGNORECASE)
+
+def sql_label(sql):
+    # "sql SELECT results": the statement's verb and first table, so queries
+    # built with a varying number of placeholders share one histogram.
+    words = sql.split(None, 1)
+    if not words:
+        return "sql"
+    verb = words[0].upper()
+    if verb == "WITH":
+        verb = "SELECT"
+    table = _SQL_TABLE.search(sql)
+    return f"sql {verb} {table.group(1)}" if table else f"sql {verb}"
+
+class TimedConnection(sqlite3.Connection):
+    """
+    sqlite3 connection factory timing execute() and executemany(). For a
+    SELECT this covers preparing the statement and finding the first row,
+    not fetching the rest.
+    """
+    def execute(self, sql, *args):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            record(sql_label(sql), time.perf_counter() - start)
+
+    def executemany(self, sql, *args):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            record(sql_label(sql), time.perf_counter() - start)
+
+def connection_factory():
+    return TimedConnection if ENABLED else sqlite3.Connection
+
+# -------------------- Reading and exporting --------------------
+
+def quantile(metric, q):
+    """
+    The upper bound of the bucket holding the q-th quantile, or the slowest
+    time recorded if that is lower.
+    """
+    target = q * metric["count"]
+    seen = 0
+    for bound, count in zip(BUCKETS + (None,), metric["buckets"]):
+        seen += count
+        if seen >= target:
+            return min(bound, metric["max"]) if bound is not None else metric["max"]
+    return metric["max"]
+
+def snapshot():
+    """
+    Returns {name: {"count", "sum", "min", "max", "mean", "p50", "p95", "buckets"}}
+    with times in seconds.
+    """
+    with _lock:
+        metrics = {name: dict(metric, buckets=list(metric["buckets"])) for name, metric in _metrics.items()}
+    for metric in metrics.values():
+        metric["mean"] = metric["sum"] / metric["count"]
+        metric["p50"] = quantile(metric, 0.5)
+        metric["p95"] = quantile(metric, 0.95)
+    return metrics
+
+def reset():
+    with _lock:
+        _metrics.clear()
+
+def to_json():
+    return json.dumps({"enabled": ENABLED, "bucket_bounds": list(BUCKETS), "metrics": snapshot()}, indent=2)
+
+def _label_value(text):
+    return text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def to_prometheus():
+    """
+    All metrics as one Prometheus histogram family, labelled by name.
+    """
+    lines = [f"# HELP {METRIC_NAME} Latency of instrumented quiz app operations.",
+             f"# TYPE {METRIC_NAME} histogram"]
+    for name, metric in sorted(snapshot().items()):
+        label = f'name="{_label_value(name)}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (None,), metric["buckets"]):
+            cumulative += count
+            le = "+Inf" if bound is None else repr(bound)
+            lines.append(f'{METRIC_NAME}_bucket{{{label},le="{le}"}} {cumulative}')
+        lines.append(f"{METRIC_NAME}_sum{{{label}}} {metric['sum']!r}")
+        lines.append(f"{METRIC_NAME}_count{{{label}}} {metric['count']}")
+    return "\n".join(lines) + "\n"
+
+def format_table(metrics=None):
+    metrics = snapshot() if metrics is None else metrics
+    lines = [f"{'name':<36} {'count':>7} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>9}"]
+    for name, metric in sorted(metrics.items(), key=lambda item: -item[1]["sum"]):
+        lines.append(f"{name[:36]:<36} {metric['count']:>7} {metric['mean'] * 1000:>9.3f} "
+                     f"{metric['p50'] * 1000:>8.3f} {metric['p95'] * 1000:>8.3f} {metric['max'] * 1000:>9.3f}")
+    return "\n".join(lines)
+
+# -------------------- Profiling --------------------
+
+_profiler = [None]
+
+def profiling():
+    return _profiler[0] is not None
+
+def start_profile():
+    """
+    Starts a cProfile capture of the calling thread (the Tk thread when started
+    from the diagnostics window). Work on the background workers is not
+    included; the histograms above cover it.
+    """
+    # cProfile and pstats are only imported once a capture is asked for.
+    import cProfile
+    if _profiler[0] is None:
+        _profiler[0] = cProfile.Profile()
+        _profiler[0].enable()
+
+def stop_profile(limit=30):
+    """
+    Stops the capture, saves it to PROFILE_DIR (for snakeviz or pstats) and
+    returns (path, the top `limit` functions by cumulative time as text).
+    """
+    profiler = _profiler[0]
+    if profiler is None:
+        return None, ""
+    profiler.disable()
+    _profiler[0] = None
+    path = os.path.join(PROFILE_DIR, datetime.datetime.now().strftime("session-%Y%m%d-%H%M%S.prof"))
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(path)
+    except OSError as e:
+        print("Could not save profile:", e)
+        path = None
+    import pstats
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return path, out.getvalue()
@@ -0,0 +1,416 @@
+import os
+import re
+import json
+import shutil
+import datetime
+
+from database import PAGE_SIZE, get_db_connection
+from instrumentation import timed
+
+# Define the folder for storing quiz JSON files.
+QUIZ_DIR = "quizzes"
+
+# Columns returned for each quiz, in the order of the SELECTs below.
+CATALOGUE_FIELDS = ("file_path", "id", "name", "author", "question_count", "time_limit")
+
+# bm25() weights for the quiz_search columns: name, author, topic, questions.
+SEARCH_WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+
+# Invalid quiz files are moved into this subfolder of QUIZ_DIR, each with a
+# "<file>.report.txt" saying what is wrong with it.
+QUARANTINE_DIR = "quarantine"
+
+# Longest time limit, in minutes, a quiz may set.
+MAX_TIME_LIMIT = 180
+
+# Stored with every compiled quiz. Bump it when the compiled form changes so
+# older entries are rebuilt from the quiz file instead of being used.
+COMPILED_VERSION = 2
+
+def ensure_quiz_dir():
+    # Created on first use rather than at import time.
+    os.makedirs(QUIZ_DIR, exist_ok=True)
+
+def _read_quiz_file(filepath):
+    with open(filepath, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def validate_quiz(quiz_data):
+    """
+    Checks a parsed quiz against the format execute_quiz() relies on and
+    returns a list of problems, empty if the quiz is valid.
+    """
+    if not isinstance(quiz_data, dict):
+        return ["The file must contain a JSON object."]
+    errors = []
+    name = quiz_data.get("name")
+    if not isinstance(name, str) or not name.strip():
+        errors.append('"name" must be non-empty text.')
+    for key in ("author", "topic"):
+        if key in quiz_data and not isinstance(quiz_data[key], str):
+            errors.append(f'"{key}" must be text.')
+    if "id" in quiz_data and (isinstance(quiz_data["id"], bool) or not isinstance(quiz_data["id"], (str, int))):
+        errors.append('"id" must be text or a whole number.')
+    time_limit = quiz_data.get("time_limit", 0)
+    if isinstance(time_limit, bool) or not isinstance(time_limit, (int, float)) or not 0 <= time_limit <= MAX_TIME_LIMIT:
+        errors.append(f'"time_limit" must be a number of minutes from 0 to {MAX_TIME_LIMIT}.')
+    questions = quiz_data.get("questions")
+    if not isinstance(questions, list) or not questions:
+        errors.append('"questions" must be a non-empty list.')
+        return errors
+    for number, q in enumerate(questions, start=1):
+        if not isinstance(q, dict):
+            errors.append(f"Question {number} must be an object.")
+            continue
+        if not isinstance(q.get("question"), str) or not q["question"].strip():
+            errors.append(f'Question {number}: "question" must be non-empty text.')
+        answer = q.get("answer")
+        if not isinstance(answer, str) or not answer.strip():
+            errors.append(f'Question {number}: "answer" must be non-empty text.')
+        options = q.get("options", [])
+        if not isinstance(options, list) or not all(isinstance(option, str) for option in options):
+            errors.append(f'Question {number}: "options" must be a list of text.')
+        elif options and isinstance(answer, str) and \
+                answer.strip().lower() not in {option.strip().lower() for option in options}:
+            errors.append(f"Question {number}: the answer is not one of the options.")
+        if q.get("image") is not None and not isinstance(q["image"], str):
+            errors.append(f'Question {number}: "image" must be a file path.')
+    return errors
+
+def check_quiz_file(filepath):
+    """
+    Reads and validates a quiz file. Returns (quiz, []) for a valid quiz or
+    (None, problems) otherwise; raises OSError if the file cannot be read.
+    """
+    try:
+        quiz_data = _read_quiz_file(filepath)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return None, [f"Not valid JSON: {e}"]
+    errors = validate_quiz(quiz_data)
+    return (None if errors else quiz_data), errors
+
+def quarantine_quiz_file(filepath, errors):
+    """
+    Moves an invalid quiz file into QUIZ_DIR/quarantine and writes a report
+    next to it. Returns the new path, or None if the file could not be moved.
+    """
+    folder = os.path.join(QUIZ_DIR, QUARANTINE_DIR)
+    name = os.path.basename(filepath)
+    dest_path = os.path.join(folder, name)
+    now = datetime.datetime.now()
+    if os.path.exists(dest_path):
+        stem, ext = os.path.splitext(name)
+        dest_path = os.path.join(folder, f"{stem}_{now:%Y%m%d%H%M%S}{ext}")
+    try:
+        os.makedirs(folder, exist_ok=True)
+        shutil.move(filepath, dest_path)
+        with open(dest_path + ".report.txt", "w", encoding="utf-8") as f:
+            f.write(f"{name} was moved out of the quiz folder on {now:%Y-%m-%d %H:%M:%S} because:\n")
+            f.writelines(f"  - {error}\n" for error in errors)
+    except OSError as e:
+        print(f"Could not quarantine quiz file {name}: {e}")
+        return None
+    print(f"Quarantined quiz file {name}: {'; '.join(errors)}")
+    return dest_path
+
+def _compile(quiz_data):
+    # JSON rather than pickle: users.db may sit on a shared drive, and
+    # unpickling what someone else wrote there would run their code.
+    return json.dumps({"version": COMPILED_VERSION, "quiz": quiz_data}, separators=(",", ":"))
+
+def _catalogue_row(filepath, stat, quiz_data):
+    # Everything the Quiz Browser shows, so listing never needs the questions,
+    # plus the compiled quiz for launching it.
+    if not isinstance(quiz_data, dict):
+        return (filepath, stat.st_mtime_ns, stat.st_size, 0, None, None, None, None, None, None)
+    questions = quiz_data.get("questions", [])
+    return (filepath, stat.st_mtime_ns, stat.st_size, 1,
+            quiz_data.get("id"), quiz_data.get("name"), quiz_data.get("author"),
+            len(questions) if isinstance(questions, list) else 0, quiz_data.get("time_limit"),
+            _compile(quiz_data))
+
+def _search_text(quiz_data):
+    questions = quiz_data.get("questions", [])
+    if not isinstance(questions, list):
+        questions = []
+    question_text = " ".join(str(q.get("question", "")) for q in questions if isinstance(q, dict))
+    return (str(quiz_data.get("name", "")), str(quiz_data.get("author", "")),
+            str(quiz_data.get("topic", "")), question_text)
+
+def has_search_index(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'quiz_search'").fetchone() is not None
+
+def _remove_entry(conn, filepath, search_index):
+    if search_index:
+        conn.execute("DELETE FROM quiz_search WHERE rowid = (SELECT rowid FROM quiz_catalogue WHERE file_path = ?)",
+                     (filepath,))
+    conn.execute("DELETE FROM quiz_catalogue WHERE file_path = ?", (filepath,))
+
+def _store_entry(conn, filepath, stat, quiz_data, search_index):
+    _remove_entry(conn, filepath, search_index)
+    cursor = conn.execute("""
+    INSERT INTO quiz_catalogue
+        (file_path, mtime_ns, size, valid, quiz_id, name, author, question_count, time_limit, compiled)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, _catalogue_row(filepath, stat, quiz_data))
+    if search_index and isinstance(quiz_data, dict):
+        conn.execute("INSERT INTO quiz_search (rowid, name, author, topic, questions) VALUES (?, ?, ?, ?, ?)",
+                     (cursor.lastrowid,) + _search_text(quiz_data))
+
+@timed("quizzes.refresh_catalogue")
+def refresh_catalogue(quarantine=True):
+    """
+    Brings the quiz_catalogue table (and its search index) in line with QUIZ_DIR.
+    Only files whose mtime or size changed since the last refresh are parsed and
+    validated; invalid ones are quarantined (or, if that fails, remembered as
+    invalid until they change). With quarantine=False, as for read-only
+    commands, invalid files are left where they are and kept out of the
+    catalogue, so the next normal refresh still quarantines them.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return
+    ensure_quiz_dir()
+    known = {row[0]: (row[1], row[2]) for row in
+             conn.execute("SELECT file_path, mtime_ns, size FROM quiz_catalogue")}
+    seen = set()
+    changed = []
+    broken = []
+    with os.scandir(QUIZ_DIR) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".json") or not entry.is_file():
+                continue
+            filepath = os.path.join(QUIZ_DIR, entry.name)
+            seen.add(filepath)
+            stat = entry.stat()
+            if known.get(filepath) == (stat.st_mtime_ns, stat.st_size):
+                continue
+            try:
+                quiz_data, errors = check_quiz_file(filepath)
+            except OSError:
+                continue
+            if errors:
+                broken.append((filepath, stat, errors))
+            else:
+                changed.append((filepath, stat, quiz_data))
+    for filepath, stat, errors in broken:
+        if not quarantine:
+            seen.discard(filepath)
+        elif quarantine_quiz_file(filepath, errors):
+            # Moved out of QUIZ_DIR, so it is dropped like a deleted file.
+            seen.discard(filepath)
+        else:
+            changed.append((filepath, stat, None))
+    removed = [path for path in known if path not in seen]
+    if not changed and not removed:
+        return
+    search_index = has_search_index(conn)
+    with conn:
+        for filepath, stat, quiz_data in changed:
+            _store_entry(conn, filepath, stat, quiz_data, search_index)
+        for filepath in removed:
+            _remove_entry(conn, filepath, search_index)
+
+def index_quiz_file(filepath):
+    """
+    Validates, compiles and adds (or updates) a single quiz file in the
+    catalogue, e.g. right after upload. An invalid file is quarantined.
+    Returns the list of problems found, empty on success.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return ["Unable to connect to database."]
+    try:
+        stat = os.stat(filepath)
+        quiz_data, errors = check_quiz_file(filepath)
+    except OSError as e:
+        print(f"Error reading quiz file {filepath}: {e}")
+        return [str(e)]
+    search_index = has_search_index(conn)
+    if errors and quarantine_quiz_file(filepath, errors):
+        with conn:
+            _remove_entry(conn, filepath, search_index)
+        return errors
+    with conn:
+        _store_entry(conn, filepath, stat, quiz_data, search_index)
+    return errors
+
+def _quiz_from_row(row):
+    # Missing values are left out so callers can keep using quiz.get(key, default).
+    return {field: value for field, value in zip(CATALOGUE_FIELDS, row) if value is not None}
+
+@timed("quizzes.get_all")
+def get_all_quizzes():
+    """
+    Returns the metadata of every readable quiz in QUIZ_DIR (without questions).
+    Use load_quiz() to get the full quiz when it is launched.
+    """
+    refresh_catalogue()
+    conn = get_db_connection()
+    if conn is None:
+        return []
+    rows = conn.execute("""
+    SELECT file_path, quiz_id, name, author, question_count, time_limit
+    FROM quiz_catalogue
+    WHERE valid = 1
+    ORDER BY file_path;
+    """).fetchall()
+    return [_quiz_from_row(row) for row in rows]
+
+def count_quizzes():
+    # Reads the catalogue as it is, like get_quizzes_page().
+    conn = get_db_connection()
+    if conn is None:
+        return 0
+    return conn.execute("SELECT COUNT(*) FROM quiz_catalogue WHERE valid = 1").fetchone()[0]
+
+def get_quizzes_page(after=None, limit=PAGE_SIZE):
+    """
+    Same quizzes as get_all_quizzes(), `limit` at a time, continuing after the
+    last quiz of the previous page. Reads the catalogue as it is; call
+    refresh_catalogue() first (off the Tk thread) to pick up changed files.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return []
+    rows = conn.execute("""
+    SELECT file_path, quiz_id, name, author, question_count, time_limit
+    FROM quiz_catalogue
+    WHERE valid = 1
+      AND file_path > ?
+    ORDER BY file_path
+    LIMIT ?;
+    """, (after["file_path"] if after else "", limit)).fetchall()
+    return [_quiz_from_row(row) for row in rows]
+
+def _match_expression(search_query):
+    # Every word must match, each as a prefix: "cap fra" -> "cap"* "fra"*
+    terms = re.findall(r"\w+", search_query.lower())
+    return " ".join(f'"{term}"*' for term in terms)
+
+def search_quizzes(search_query, after=None, limit=PAGE_SIZE):
+    """
+    Returns quizzes whose name, author, topic or question text match every word
+    of the query as a prefix, best matches first, `limit` at a time and
+    continuing after the last quiz of the previous page (each result carries
+    its "search_rank" for this). The catalogue is not rescanned here
+    (get_all_quizzes() and index_quiz_file() keep it current), so a search
+    never touches QUIZ_DIR.
+    """
+    match = _match_expression(search_query)
+    if not match:
+        return get_quizzes_page(after, limit)
+    conn = get_db_connection()
+    if conn is None:
+        return []
+    if not has_search_index(conn):
+        pattern = f"%{search_query.strip()}%"
+        rows = conn.execute("""
+        SELECT file_path, quiz_id, name, author, question_count, time_limit
+        FROM quiz_catalogue
+        WHERE valid = 1
+          AND (name LIKE ? OR author LIKE ?)
+          AND file_path > ?
+        ORDER BY file_path
+        LIMIT ?;
+        """, (pattern, pattern, after["file_path"] if after else "", limit)).fetchall()
+        return [_quiz_from_row(row) for row in rows]
+    # Ties on rank are broken by file path, so every quiz has one place in the order.
+    params = [match]
+    keyset = ""
+    if after is not None and after.get("search_rank") is not None:
+        keyset = "WHERE (search_rank, file_path) > (?, ?)"
+        params += [after["search_rank"], after["file_path"]]
+    rows = conn.execute(f"""
+    SELECT * FROM (
+        SELECT c.file_path, c.quiz_id, c.name, c.author, c.question_count, c.time_limit,
+               bm25(quiz_search, {", ".join(map(str, SEARCH_WEIGHTS))}) AS search_rank
+        FROM quiz_search
+        JOIN quiz_catalogue AS c ON c.rowid = quiz_search.rowid
+        WHERE quiz_search MATCH ?
+          AND c.valid = 1
+    )
+    {keyset}
+    ORDER BY search_rank, file_path
+    LIMIT ?;
+    """, params + [limit]).fetchall()
+    quizzes = []
+    for row in rows:
+        quiz = _quiz_from_row(row[:-1])
+        quiz["search_rank"] = row[-1]
+        quizzes.append(quiz)
+    return quizzes
+
+def _load_compiled(conn, filepath):
+    # The compiled quiz, if the file has not changed since it was compiled.
+    row = conn.execute("SELECT mtime_ns, size, compiled FROM quiz_catalogue WHERE file_path = ? AND valid = 1",
+                       (filepath,)).fetchone()
+    if row is None or row[2] is None:
+        return None
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    if (stat.st_mtime_ns, stat.st_size) != (row[0], row[1]):
+        return None
+    return _parse_compiled(row[2])
+
+def _parse_compiled(text):
+    try:
+        compiled = json.loads(text)
+    except (ValueError, TypeError):
+        return None  # Includes entries pickled by older versions.
+    if not isinstance(compiled, dict) or compiled.get("version") != COMPILED_VERSION:
+        return None
+    quiz_data = compiled.get("quiz")
+    return quiz_data if isinstance(quiz_data, dict) else None
+
+def get_stored_quizzes(file_paths):
+    """
+    Returns {file_path: quiz} for the given files as compiled at the last
+    catalogue refresh, without reading the files, so nothing is written.
+    Files with no usable compiled quiz are left out.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return {}
+    file_paths = list(file_paths)
+    quizzes = {}
+    for start in range(0, len(file_paths), 500):
+        chunk = file_paths[start:start + 500]
+        rows = conn.execute(f"""
+        SELECT file_path, compiled FROM quiz_catalogue
+        WHERE valid = 1 AND compiled IS NOT NULL AND file_path IN ({", ".join("?" * len(chunk))});
+        """, chunk)
+        for file_path, compiled in rows:
+            quiz_data = _parse_compiled(compiled)
+            if quiz_data is not None:
+                quizzes[file_path] = quiz_data
+    return quizzes
+
+@timed("quizzes.load")
+def load_quiz(quiz):
+    """
+    Returns the full quiz (including questions) for a catalogue entry, from its
+    compiled form when that is current, otherwise by reading and validating the
+    file again. Returns None if the file can no longer be read or is invalid.
+    """
+    filepath = quiz["file_path"]
+    conn = get_db_connection()
+    quiz_data = _load_compiled(conn, filepath) if conn is not None else None
+    if quiz_data is None:
+        try:
+            stat = os.stat(filepath)
+            quiz_data, errors = check_quiz_file(filepath)
+        except OSError as e:
+            print(f"Error reading quiz file {filepath}: {e}")
+            return None
+        if errors:
+            print(f"Quiz file {filepath} is invalid: {'; '.join(errors)}")
+            return None
+        if conn is not None:
+            with conn:
+                conn.execute("UPDATE quiz_catalogue SET compiled = ? WHERE file_path = ? AND mtime_ns = ? AND size = ?",
+                             (_compile(quiz_data), filepath, stat.st_mtime_ns, stat.st_size))
+    quiz_data["file_path"] = filepath
+    return quiz_data
@@ -0,0 +1,60 @@
+"""
+Countdown timer for timed quizzes.
+"""
+import math
+import time
+
+def format_remaining(seconds):
+    mins, secs = divmod(int(seconds), 60)
+    return f"{mins:02d}:{secs:02d}"
+
+class QuizTimer:
+    """
+    Counts down to a deadline on time.monotonic(), so changes to the wall clock
+    have no effect. Each tick is scheduled with widget.after() for the moment
+    the remaining time crosses the next whole second. A stalled Tk loop delays
+    a tick but loses no time: the next tick shows the true remaining time and
+    re-aligns to the second boundary after it.
+
+    on_tick(seconds_left) is called with the whole seconds still to go (rounded
+    up) on every tick; on_expire() is called once when the time runs out.
+    """
+    def __init__(self, widget, seconds, on_tick, on_expire, clock=time.monotonic):
+        self.widget = widget
+        self.clock = clock
+        self.on_tick = on_tick
+        self.on_expire = on_expire
+        self.deadline = clock() + seconds
+        self.after_id = None
+        self.running = False
+
+    def remaining(self):
+        return max(0.0, self.deadline - self.clock())
+
+    def start(self):
+        self.running = True
+        self.tick()
+
+    def stop(self):
+        self.running = False
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+
+    def tick(self):
+        self.after_id = None
+        if not self.running:
+            return
+        remaining = self.remaining()
+        # A millisecond of slack so a tick that lands exactly on a boundary
+        # shows that second rather than the one before it.
+        seconds_left = max(0, math.ceil(remaining - 0.001))
+        self.on_tick(seconds_left)
+        if seconds_left == 0:
+            self.running = False
+            self.on_expire()
+            return
+        # after() never fires early, so rounding the delay up keeps ticks on or
+        # just past each boundary.
+        delay_ms = math.ceil((remaining - (seconds_left - 1)) * 1000)
+        self.after_id = self.widget.after(max(1, delay_ms), self.tick)
@@ -0,0 +1,125 @@
+"""
+Answer marking, independent of the quiz window.
+
+An answer is correct when it equals the question's "answer" after .strip().lower().
+Answers are turned into integer codes (each distinct answer is normalised once)
+so whole batches are marked with one NumPy comparison.
+"""
+import numpy as np
+
+from database import get_db_connection, rebuild_daily_stats, rebuild_item_stats, bump_data_version
+
+# Stored answers are read back from the database this many rows at a time.
+REMARK_FETCH_SIZE = 100_000
+
+def normalise_answer(answer):
+    return str(answer).strip().lower()
+
+def answer_key(quiz):
+    """
+    The normalised correct answers of a quiz, in question order.
+    """
+    return [normalise_answer(q.get("answer", "")) for q in quiz.get("questions", [])]
+
+def mark(given_answers, question_indexes, key):
+    """
+    Marks given_answers[i] against key[question_indexes[i]] for every i and
+    returns a bool array. Indexes outside the key are marked wrong.
+    """
+    # Codes for the normalised key answers; the extra -1 slot is for
+    # question indexes the key does not have.
+    codes = {}
+    for answer in key:
+        codes.setdefault(answer, len(codes))
+    key_codes = np.array([codes[answer] for answer in key] + [-1], dtype=np.int64)
+
+    # Each distinct raw answer is normalised once; -2 never matches the key.
+    raw_codes = {}
+    given_codes = np.fromiter((raw_codes.setdefault(answer, len(raw_codes)) for answer in given_answers),
+                              dtype=np.int64, count=len(given_answers))
+    raw_to_key = np.array([codes.get(normalise_answer(answer), -2) for answer in raw_codes], dtype=np.int64)
+
+    question_indexes = np.asarray(question_indexes, dtype=np.int64)
+    in_range = (question_indexes >= 0) & (question_indexes < len(key))
+    question_indexes = np.where(in_range, question_indexes, len(key))
+    if not len(given_codes):
+        return np.zeros(0, dtype=bool)
+    return raw_to_key[given_codes] == key_codes[question_indexes]
+
+def score_submissions(quiz, submissions):
+    """
+    Marks a batch of submissions for one quiz. Each submission is a list of
+    answers in question order, or a dict of {question_index: answer}; missing
+    answers count as wrong. Returns a bool array of shape
+    (len(submissions), number of questions).
+    """
+    key = answer_key(quiz)
+    count = len(key)
+    given = []
+    for submission in submissions:
+        if isinstance(submission, dict):
+            given.extend(submission.get(i, "") for i in range(count))
+        else:
+            given.extend(list(submission[:count]) + [""] * (count - len(submission)))
+    question_indexes = np.tile(np.arange(count), len(submissions))
+    return mark(given, question_indexes, key).reshape(len(submissions), count)
+
+def score_answers(quiz, answers):
+    """
+    Marks a single submission; returns a list of bools, one per question.
+    """
+    return score_submissions(quiz, [answers])[0].tolist()
+
+def remark_quiz(quiz_file, quiz):
+    """
+    Re-marks every stored answer for `quiz_file` against the quiz's current
+    answer key, e.g. after a wrong answer has been corrected. Updates
+    result_answers, each affected result's correct_count, the daily stats and
+    the quiz's item stats.
+    Returns (answers changed, results changed).
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return 0, 0
+    key = answer_key(quiz)
+    cursor = conn.execute("""
+    SELECT a.result_id, a.question_index, a.given_answer, a.is_correct
+    FROM result_answers AS a
+    JOIN results AS r ON r.id = a.result_id
+    WHERE r.quiz_file = ?;
+    """, (quiz_file,))
+    updates = []
+    while True:
+        rows = cursor.fetchmany(REMARK_FETCH_SIZE)
+        if not rows:
+            break
+        result_ids, question_indexes, given, old = zip(*rows)
+        result_ids = np.array(result_ids, dtype=np.int64)
+        question_indexes = np.array(question_indexes, dtype=np.int64)
+        new = mark(given, question_indexes, key)
+        changed = new != np.array(old, dtype=bool)
+        updates.extend(zip(new[changed].astype(int).tolist(), result_ids[changed].tolist(),
+                           question_indexes[changed].tolist()))
+    if not updates:
+        return 0, 0
+
+    changed_results = sorted({result_id for _, result_id, _ in updates})
+    with conn:
+        conn.executemany("UPDATE result_answers SET is_correct = ? WHERE result_id = ? AND question_index = ?",
+                         updates)
+        user_ids = set()
+        for start in range(0, len(changed_results), 500):
+            chunk = changed_results[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            conn.execute(f"""
+            UPDATE results
+            SET correct_count = (SELECT COUNT(*) FROM result_answers
+                                 WHERE result_id = results.id AND is_correct = 1)
+            WHERE id IN ({placeholders});
+            """, chunk)
+            user_ids.update(row[0] for row in conn.execute(
+                f"SELECT DISTINCT user_id FROM results WHERE id IN ({placeholders})", chunk))
+        rebuild_daily_stats(conn, user_ids)
+        rebuild_item_stats(conn, [quiz_file])
+    bump_data_version()
+    return len(updates), len(changed_results)
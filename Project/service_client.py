@@ -0,0 +1,131 @@
+"""
+Client for data_service.py.
+
+ServiceClient.call(op, *args) runs the database or catalogue function of that
+name on the server; backend.RemoteBackend wraps it for the app. Each thread
+keeps its own connection, so calls from the Tk thread and the background
+workers do not wait on each other.
+
+The app runs in client mode when QUIZ_SERVER is set to the server's
+HOST:PORT. The session token from a successful authenticate is sent with
+every later request, on all of the client's connections.
+"""
+import os
+import socket
+import sqlite3
+import threading
+import itertools
+
+from data_service import DEFAULT_PORT, dump_message, load_message
+
+SERVER_ENV = "QUIZ_SERVER"
+
+# Seconds to wait for the server to answer a request.
+REQUEST_TIMEOUT = 30
+
+class ServiceError(Exception):
+    pass
+
+def parse_address(text):
+    """
+    "host:port", "host" or ":port" -> (host, port).
+    """
+    host, _, port = text.strip().rpartition(":") if ":" in text else (text.strip(), "", "")
+    return host or "127.0.0.1", int(port) if port else DEFAULT_PORT
+
+class ServiceClient:
+    def __init__(self, host, port, timeout=REQUEST_TIMEOUT):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.ids = itertools.count(1)
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self.session = None
+
+    def _connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = self.local.conn = (sock, sock.makefile("rb"))
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self.local, "conn", None)
+        self.local.conn = None
+        if conn is not None:
+            with self.lock:
+                if conn in self.connections:
+                    self.connections.remove(conn)
+            _close_connection(conn)
+
+    def call(self, op, *args):
+        """
+        Runs `op` on the server and returns its result. Errors raised there come
+        back as ServiceError, except sqlite3.IntegrityError (a taken username),
+        which callers already handle. Requests are not retried, so a failed
+        write is never applied twice.
+        """
+        request_id = next(self.ids)
+        try:
+            sock, reader = self._connection()
+            request = {"id": request_id, "op": op, "args": list(args)}
+            if self.session is not None:
+                request["session"] = self.session
+            sock.sendall(dump_message(request))
+            line = reader.readline()
+        except OSError as e:
+            self._drop_connection()
+            raise ServiceError(f"Data service unavailable: {e}")
+        if not line:
+            self._drop_connection()
+            raise ServiceError("Data service closed the connection.")
+        response = load_message(line)
+        if response.get("id") != request_id:
+            self._drop_connection()
+            raise ServiceError("Data service sent an unexpected response.")
+        if not response["ok"]:
+            if response.get("type") == "IntegrityError":
+                raise sqlite3.IntegrityError(response["error"])
+            raise ServiceError(response["error"])
+        if "session" in response:
+            self.session = response["session"]
+        return response["result"]
+
+    def logout(self):
+        """
+        Ends the session on the server, so the next user has to log in again.
+        """
+        token = self.session
+        if token is None:
+            return
+        try:
+            self.call("logout")
+        finally:
+            # Unless someone has logged in again meanwhile.
+            if self.session == token:
+                self.session = None
+
+    def close(self):
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for conn in connections:
+            _close_connection(conn)
+
+def _close_connection(conn):
+    # The socket stays open until the file reading from it is closed too.
+    sock, reader = conn
+    reader.close()
+    sock.close()
+
+def connect_from_environment():
+    """
+    Returns a ServiceClient for QUIZ_SERVER, or None when it is not set.
+    """
+    address = os.environ.get(SERVER_ENV)
+    if not address:
+        return None
+    return ServiceClient(*parse_address(address))
@@ -0,0 +1,154 @@
+"""
+Seeded synthetic data for capacity planning and benchmarks.
+
+generate() creates users, quiz files in QUIZ_DIR and results spread over the
+days leading up to SIMULATED_DATE. The same seed always gives the same data.
+Rows are inserted with executemany() in chunked transactions, so millions of
+results take seconds rather than one commit each.
+"""
+import os
+import json
+import random
+import datetime
+
+import quiz_catalogue
+from database import (
+    SIMULATED_DATE, get_db_connection, rebuild_daily_stats, rebuild_item_stats, bump_data_version, to_timestamp,
+)
+
+# Rows inserted per transaction.
+CHUNK_SIZE = 50_000
+
+# Every synthetic account has this password; it is hashed once per run.
+SYNTHETIC_PASSWORD = "password"
+
+# One teacher for every this many students.
+STUDENTS_PER_TEACHER = 30
+
+TOPICS = ["Algorithms", "Networks", "Databases", "Boolean Logic", "Data Types", "Programming",
+          "Computer Systems", "Ethics", "Software Development", "Web Technologies"]
+WORDS = ["binary", "queue", "stack", "packet", "protocol", "recursion", "index", "hash", "array",
+         "compiler", "register", "cache", "graph", "tree", "search", "sort", "key", "table"]
+
+def _chunks(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def generate_users(conn, count, rng):
+    """
+    Inserts `count` accounts named synthetic_000001, ... and returns their ids.
+    """
+    import auth
+    password_hash = auth.hash_password(SYNTHETIC_PASSWORD)
+    start = conn.execute("SELECT COUNT(*) FROM users WHERE username LIKE 'synthetic\\_%' ESCAPE '\\'").fetchone()[0]
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]
+    rows = ((f"synthetic_{start + i + 1:06d}", password_hash,
+             "Teacher" if rng.randrange(STUDENTS_PER_TEACHER + 1) == 0 else "Student")
+            for i in range(count))
+    for chunk in _chunks(rows):
+        with conn:
+            conn.executemany("INSERT INTO users (username, password, account_type) VALUES (?, ?, ?)", chunk)
+    return [row[0] for row in conn.execute("SELECT id FROM users WHERE id > ? ORDER BY id", (last_id,))]
+
+def make_quiz(number, rng, questions=10):
+    quiz_questions = []
+    for q in range(questions):
+        options = rng.sample(WORDS, 4)
+        quiz_questions.append({
+            "question": f"Question {q + 1}: which term matches {' '.join(rng.sample(WORDS, 3))}?",
+            # Roughly one question in five is free text.
+            "options": options if rng.random() < 0.8 else [],
+            "answer": rng.choice(options),
+        })
+    return {
+        "id": f"synthetic{number}",
+        "name": f"Synthetic Quiz {number}",
+        "author": f"Teacher {rng.choice('ABCDEFGH')}",
+        "topic": rng.choice(TOPICS),
+        "time_limit": rng.choice([5, 10, 15, 20]),
+        "questions": quiz_questions,
+    }
+
+def generate_quizzes(count, rng, questions=10):
+    """
+    Writes `count` quiz files into QUIZ_DIR, refreshes the catalogue and
+    returns [(file name, quiz)].
+    """
+    quiz_catalogue.ensure_quiz_dir()
+    quizzes = []
+    for number in range(1, count + 1):
+        quiz = make_quiz(number, rng, questions)
+        name = f"synthetic_{number:06d}.json"
+        with open(os.path.join(quiz_catalogue.QUIZ_DIR, name), "w", encoding="utf-8") as f:
+            json.dump(quiz, f)
+        quizzes.append((name, quiz))
+    # Leaves invalid files already in QUIZ_DIR where they are; only the
+    # generated ones need indexing.
+    quiz_catalogue.refresh_catalogue(quarantine=False)
+    return quizzes
+
+def generate_results(conn, count, user_ids, quizzes, rng, days=30, end=None, answers=True):
+    """
+    Inserts `count` results for random users and quizzes, with attempt times
+    spread over the `days` days up to `end` (SIMULATED_DATE by default), then
+    rebuilds the daily stats of the users and the item stats of the quizzes
+    involved.
+    """
+    end_ts = to_timestamp(end or SIMULATED_DATE or datetime.datetime.now())
+    start_ts = end_ts - days * 86400
+    # Each simulated user gets a fixed ability so scores are not pure noise.
+    ability = {user_id: rng.uniform(0.3, 0.95) for user_id in user_ids}
+    next_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM results").fetchone()[0] + 1
+
+    def rows():
+        for result_id in range(next_id, next_id + count):
+            user_id = rng.choice(user_ids)
+            quiz_file, quiz = rng.choice(quizzes)
+            given = []
+            for q in quiz["questions"]:
+                correct = rng.random() < ability[user_id]
+                if correct or not q["options"]:
+                    given.append((q["answer"] if correct else rng.choice(WORDS), correct))
+                else:
+                    given.append((rng.choice(q["options"]), False))
+            yield (result_id, user_id, rng.randint(start_ts, end_ts), sum(c for _, c in given),
+                   len(given), quiz_file), given
+
+    for chunk in _chunks(rows()):
+        with conn:
+            conn.executemany("""
+            INSERT INTO results (id, user_id, attempt_ts, correct_count, total_questions, quiz_file)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """, [result for result, _ in chunk])
+            if answers:
+                conn.executemany("""
+                INSERT INTO result_answers (result_id, question_index, given_answer, is_correct)
+                VALUES (?, ?, ?, ?)
+                """, [(result[0], i, given, int(correct))
+                      for result, answer_list in chunk for i, (given, correct) in enumerate(answer_list)])
+    with conn:
+        rebuild_daily_stats(conn, user_ids)
+        if answers:
+            rebuild_item_stats(conn, [quiz_file for quiz_file, _ in quizzes])
+    bump_data_version()
+
+def generate(users, quizzes, results, seed=0, days=30, end=None, answers=True):
+    """
+    Creates `users` accounts, `quizzes` quiz files and `results` results.
+    Returns {"users": [ids], "quizzes": [(file name, quiz)]}.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        raise RuntimeError("Unable to connect to database.")
+    rng = random.Random(seed)
+    user_ids = generate_users(conn, users, rng)
+    quiz_list = generate_quizzes(quizzes, rng)
+    if results and user_ids and quiz_list:
+        generate_results(conn, results, user_ids, quiz_list, rng, days, end, answers)
+    return {"users": user_ids, "quizzes": quiz_list}
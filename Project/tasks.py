@@ -0,0 +1,51 @@
+import tkinter
+from concurrent.futures import ThreadPoolExecutor
+
+# Worker threads for anything slow (bcrypt, database queries, scanning the quiz
+# folder) so the Tk main loop never waits on it. Each worker thread gets its own
+# database connection from database.get_db_connection().
+MAX_WORKERS = 4
+
+# How often the main loop checks whether a background task has finished.
+POLL_INTERVAL_MS = 25
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="worker")
+
+def _report_error(error):
+    print("Background task failed:", error)
+
+def run_in_background(widget, func, *args, on_done=None, on_error=None):
+    """
+    Runs func(*args) on a worker thread. When it finishes, on_done(result) or
+    on_error(exception) is called on the Tk thread through widget.after(), so
+    the callbacks may update the UI. Nothing is called if the widget has been
+    destroyed in the meantime.
+    """
+    future = _executor.submit(func, *args)
+
+    def check():
+        try:
+            if not widget.winfo_exists():
+                return
+        except tkinter.TclError:
+            return
+        if not future.done():
+            widget.after(POLL_INTERVAL_MS, check)
+            return
+        error = future.exception()
+        if error is not None:
+            (on_error or _report_error)(error)
+        elif on_done is not None:
+            on_done(future.result())
+
+    widget.after(POLL_INTERVAL_MS, check)
+    return future
+
+def submit(func, *args):
+    """
+    Runs func(*args) on a worker thread without reporting back to the UI.
+    """
+    return _executor.submit(func, *args)
+
+def shutdown():
+    _executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+import database
+import quiz_catalogue
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """
+    A new, fully migrated database and an empty quiz folder, both under
+    tmp_path. Returns the connection.
+    """
+    monkeypatch.setattr(quiz_catalogue, "QUIZ_DIR", str(tmp_path / "quizzes"))
+    old_path = database.DB_PATH
+    database.set_database_path(str(tmp_path / "test.db"))
+    database.create_database()
+    yield database.get_db_connection()
+    database.set_database_path(old_path)
+
+@pytest.fixture
+def student(db):
+    # Passwords are never checked here, so any text will do.
+    with db:
+        db.execute("INSERT INTO users (username, password, account_type) VALUES ('student1', 'x', 'Student')")
+    return db.execute("SELECT id FROM users WHERE username = 'student1'").fetchone()[0]
@@ -0,0 +1,77 @@
+import datetime
+
+import pytest
+
+import database
+import ingest
+from export import export_results
+
+USER_IDS = {1, 2}
+USERNAMES = {"student1": 1, "student2": 2}
+
+def row(**fields):
+    result = {"username": "student1", "attempt_ts": 1_700_000_000, "correct_count": 1, "total_questions": 2}
+    result.update(fields)
+    return result
+
+def validate(result):
+    return ingest._validate(result, USER_IDS, USERNAMES)
+
+def test_accepts_a_minimal_row():
+    assert validate(row()) == (1, 1_700_000_000, 1, 2, None, None, None)
+
+def test_accepts_csv_strings_and_dates():
+    result = validate({"user_id": "2", "attempt_date": "2024-01-02 03:04:05", "correct_count": "2",
+                       "total_questions": "2", "quiz_file": "q.json", "result_id": "17"})
+    expected_ts = (datetime.datetime(2024, 1, 2, 3, 4, 5) - ingest.EPOCH) // ingest.ONE_SECOND
+    assert result == (2, expected_ts, 2, 2, "q.json", None, 17)
+
+def test_username_wins_over_a_user_id_from_another_database():
+    assert validate(row(user_id=99))[0] == 1
+
+def test_accepts_answers_that_match_the_score():
+    answers = validate(row(answers=[["Paris", True], ["4", 0]]))[5]
+    assert answers == [("Paris", True), ("4", False)]
+
+@pytest.mark.parametrize("result, reason", [
+    (row(username="nobody"), "unknown username"),
+    (row(username="", user_id=99), "unknown user_id"),
+    (row(username=None), "missing username"),
+    ({"username": "student1", "attempt_ts": 1, "total_questions": 2}, "missing correct_count"),
+    ({"username": "student1", "correct_count": 1, "total_questions": 2}, "missing attempt_date"),
+    (row(correct_count=3), "out of range"),
+    (row(correct_count=-1), "out of range"),
+    (row(correct_count="one"), "invalid literal"),
+    (row(answers=[["Paris", True]]), "does not match total_questions"),
+    (row(answers=[["Paris", True], ["4", True]]), "does not match correct_count"),
+    (row(answers="Paris"), "answers must be a list"),
+    (["student1", 1, 2], "not a result object"),
+    (ValueError("invalid JSON"), "invalid JSON"),
+])
+def test_rejects_bad_rows(result, reason):
+    with pytest.raises(ValueError, match=reason):
+        validate(result)
+
+def test_export_can_be_ingested_once(db, student, tmp_path):
+    database.record_quiz_result(student, 1, 2, [("Paris", True), ("4", False)], "capitals.json")
+    database.record_quiz_result(student, 2, 2, None, "capitals.json")
+    path = str(tmp_path / "results.csv")
+    export_results(path)
+
+    # Into the database it came from: every row is already there.
+    report = ingest.ingest_results(ingest.read_results_file(path))
+    assert (report["inserted"], report["rejected"]) == (0, 2)
+
+    # Into another database, where the user has a different id: stored once,
+    # then skipped.
+    database.set_database_path(str(tmp_path / "other.db"))
+    database.create_database()
+    other = database.get_db_connection()
+    with other:
+        other.execute("INSERT INTO users (id, username, password, account_type) VALUES (42, 'student1', 'x', 'Student')")
+    report = ingest.ingest_results(ingest.read_results_file(path))
+    assert (report["inserted"], report["rejected"]) == (2, 0)
+    assert other.execute("SELECT user_id, correct_count FROM results ORDER BY attempt_ts, id").fetchall() == [(42, 1), (42, 2)]
+    report = ingest.ingest_results(ingest.read_results_file(path))
+    assert (report["inserted"], report["rejected"]) == (0, 2)
+    assert report["errors"][0][1].endswith("already ingested")
@@ -0,0 +1,54 @@
+import os
+import shutil
+import sqlite3
+
+import database
+
+SHIPPED_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "users.db")
+
+def test_shipped_database_is_unmigrated():
+    conn = sqlite3.connect(f"file:{SHIPPED_DB}?mode=ro", uri=True)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    finally:
+        conn.close()
+
+def test_shipped_database_migrates_in_place(tmp_path):
+    path = str(tmp_path / "users.db")
+    shutil.copyfile(SHIPPED_DB, path)
+    old_path = database.DB_PATH
+    database.set_database_path(path)
+    try:
+        database.create_database()
+        conn = database.get_db_connection()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == database.SCHEMA_VERSION
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+
+        # Every user and result survives, with the score parsed out of the
+        # old JSON correct_list and the date turned into epoch seconds.
+        assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 5
+        rows = conn.execute("""
+        SELECT id, user_id, attempt_ts, correct_count, total_questions FROM results ORDER BY id
+        """).fetchall()
+        assert len(rows) == 7
+        assert rows[0] == (168, 6, 1742301046, 0, 2)
+        assert rows[4] == (172, 38, 1742337075, 4, 5)
+
+        # The daily rollup is backfilled from the same rows.
+        stats = conn.execute("""
+        SELECT user_id, day, attempts, correct, total_questions FROM daily_user_stats ORDER BY user_id
+        """).fetchall()
+        assert stats == [(6, "2025-03-18", 4, 5, 8), (38, "2025-03-18", 1, 4, 5), (39, "2025-03-18", 2, 4, 6)]
+
+        # Running it again changes nothing.
+        database.create_database()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == database.SCHEMA_VERSION
+        assert conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 7
+    finally:
+        database.set_database_path(old_path)
+
+def test_new_database_gets_every_migration(db):
+    assert db.execute("PRAGMA user_version").fetchone()[0] == database.SCHEMA_VERSION
+    columns = {row[1] for row in db.execute("PRAGMA table_info(results)")}
+    assert {"attempt_ts", "correct_count", "quiz_file", "source_result_id"} <= columns
@@ -0,0 +1,45 @@
+import database
+import scoring
+
+QUIZ = {
+    "name": "Capitals",
+    "questions": [
+        {"question": "Capital of France?", "options": ["Paris", "Lyon"], "answer": "Paris"},
+        {"question": "2 + 2?", "answer": "5"},
+    ],
+}
+
+def test_mark_ignores_case_and_surrounding_space():
+    key = scoring.answer_key(QUIZ)
+    marked = scoring.mark(["  paris ", "PARIS", "Lyon", "5"], [0, 0, 0, 1], key)
+    assert marked.tolist() == [True, True, False, True]
+
+def test_mark_treats_unknown_questions_as_wrong():
+    key = scoring.answer_key(QUIZ)
+    assert scoring.mark(["Paris", "Paris"], [-1, 2], key).tolist() == [False, False]
+    assert scoring.mark([], [], key).tolist() == []
+
+def test_score_answers_counts_missing_answers_as_wrong():
+    assert scoring.score_answers(QUIZ, {0: "Paris"}) == [True, False]
+    assert scoring.score_answers(QUIZ, ["Lyon"]) == [False, False]
+
+def test_score_submissions_marks_a_batch():
+    marked = scoring.score_submissions(QUIZ, [["Paris", "5"], {1: "5"}, []])
+    assert marked.tolist() == [[True, True], [False, True], [False, False]]
+
+def test_remark_quiz_updates_scores_and_stats(db, student):
+    # Two results marked against the wrong key ("5").
+    database.record_quiz_result(student, 1, 2, [("Paris", True), ("4", False)], "capitals.json")
+    database.record_quiz_result(student, 2, 2, [("Paris", True), ("5", True)], "capitals.json")
+
+    corrected = dict(QUIZ, questions=[QUIZ["questions"][0], dict(QUIZ["questions"][1], answer="4")])
+    assert scoring.remark_quiz("capitals.json", corrected) == (2, 2)
+
+    assert [row[0] for row in db.execute("SELECT correct_count FROM results ORDER BY id")] == [2, 1]
+    assert db.execute("SELECT SUM(correct) FROM daily_user_stats WHERE user_id = ?", (student,)).fetchone()[0] == 3
+    assert db.execute("""
+    SELECT attempts, correct FROM question_stats WHERE quiz_file = 'capitals.json' AND question_index = 1
+    """).fetchone() == (2, 1)
+
+    # Nothing left to change the second time.
+    assert scoring.remark_quiz("capitals.json", corrected) == (0, 0)
@@ -0,0 +1,54 @@
+import json
+import os
+
+import quiz_catalogue
+
+def write_quiz(name, **fields):
+    quiz = {"name": name, "author": "Teacher A", "topic": "Maths",
+            "questions": [{"question": "What is 2 + 2?", "answer": "4"}]}
+    quiz.update(fields)
+    quiz_catalogue.ensure_quiz_dir()
+    with open(os.path.join(quiz_catalogue.QUIZ_DIR, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump(quiz, f)
+
+def pages(query, limit):
+    after = None
+    while True:
+        page = quiz_catalogue.search_quizzes(query, after, limit)
+        if not page:
+            return
+        yield page
+        after = page[-1]
+
+def test_search_pages_cover_every_match_once(db):
+    # Names alone rank "algebra" matches in different orders; several tie.
+    for number in range(7):
+        write_quiz(f"algebra{number}")
+    for number in range(4):
+        write_quiz(f"geometry{number}", topic="Algebra and geometry")
+    write_quiz("history", topic="History", questions=[{"question": "When?", "answer": "1066"}])
+    quiz_catalogue.refresh_catalogue()
+
+    everything = quiz_catalogue.search_quizzes("alg", limit=100)
+    assert len(everything) == 11
+    ranks = [(quiz["search_rank"], quiz["file_path"]) for quiz in everything]
+    assert ranks == sorted(ranks)
+
+    paged = [quiz["file_path"] for page in pages("alg", 3) for quiz in page]
+    assert paged == [quiz["file_path"] for quiz in everything]
+    assert [len(page) for page in pages("alg", 3)] == [3, 3, 3, 2]
+
+def test_search_needs_every_word(db):
+    write_quiz("algebra1")
+    write_quiz("algebra2", author="Teacher B")
+    quiz_catalogue.refresh_catalogue()
+    assert [quiz["name"] for quiz in quiz_catalogue.search_quizzes("algebra teacher b")] == ["algebra2"]
+    assert quiz_catalogue.search_quizzes("nothing matches") == []
+
+def test_empty_search_pages_the_whole_catalogue(db):
+    for number in range(5):
+        write_quiz(f"quiz{number}")
+    quiz_catalogue.refresh_catalogue()
+    paged = [quiz["name"] for page in pages("", 2) for quiz in page]
+    assert sorted(paged) == [f"quiz{number}" for number in range(5)]
+    assert len(set(paged)) == 5